@@ -10,22 +10,43 @@ waren ..." or the start of the session "Beginn ..."
 
 When imported use function "mk_agenda_list_w_speakers(period, index)" to get
 the agenda (will be dict).
+parse_data.py calls "parse_agenda(paragraphs)" on the already parsed HTML
+and stores the agenda in the protocol JSON (key "agenda"), so the HTML
+does not have to be parsed again.
+"mk_agenda_list_w_speakers" caches the agendas in AGENDA_CACHE_DIR. Cache
+entries are only used if the SHA-256 hash of the HTML file and
+AGENDA_VERSION match; the hash is only computed again if the stat data of
+the HTML file (protocol_store.signature()) changed; increase AGENDA_VERSION when changing the rules
+below, so that all cached and stored agendas are rebuilt.
+The agenda functions work on the list of (text, classes) tuples of all
+p tags in the protocol as returned by "parse_data.all_paragraphs(soup)".
 I tried to do the processing of the html files like Marc did and named the
 functions accordingly.
 """
-import bs4
 import os
 import re
 import sys
 
-from parse_data import create_parser
-from parse_data import clean_tag_text
+import batch
+import load_data
+import parse_data
+import protocol_store
 from settings import (
+    AGENDA_CACHE_DIR,
     PROTOCOL_DIR,
     PROTOCOL_FILE_TEMPLATE,
     )
 
 
+# Version of the agenda parsing rules, stored with cached agendas
+AGENDA_VERSION = 1
+
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
+
+# Agenda cache hit/miss counters of mk_agenda_list_w_speakers()
+cache_stats = {'hits': 0, 'misses': 0}
+
 # RE for find_start() actually ENDS the agenda!
 BEGIN_RE = re.compile(r'Beginn:|Beginn \d\d[:\.]\d\d|Seite 3427')
 # RE for attachments
@@ -49,60 +70,56 @@ PARTIES = ["(AfD)", "(CDU)", "(FDP)", "(GRÜNE)", "(PIRATEN)", "(SPD)",
            "(fraktionslos)"]
 
 
-def find_agenda_start(soup: bs4.BeautifulSoup) -> bs4.element.Tag:
+def find_agenda_start(paragraphs: list, interactive: bool = True) -> int:
     """
+    Return the index of the first agenda paragraph in paragraphs or None.
+
     Special cases:
         - "Regierungserklärung" (16/7)
         - no speeches (16/10)
         - only one TOP without number (17/138)
         - only one TOP with number (17/139)
     """
-    agenda_end_index = find_agenda_end(soup)
-    paragraphs = soup.find_all('p')[:agenda_end_index]
+    agenda_end_index = find_agenda_end(paragraphs)
+    paragraphs = paragraphs[:agenda_end_index]
 
-    for i, p in enumerate(paragraphs):
-        if p.text.split() and p.text.split()[0] == "1":
-            agenda_start = p
-            return agenda_start
+    for i, (text, classes) in enumerate(paragraphs):
+        if text.split() and text.split()[0] == "1":
+            return i
 
-    for i, p in enumerate(paragraphs):
-        if "Regierungserklärung" in p.text:
-            agenda_start = p
-            return agenda_start
+    for i, (text, classes) in enumerate(paragraphs):
+        if "Regierungserklärung" in text:
+            return i
 
     # if no agenda start was found, try without number:
-    agenda_start = find_agenda_start_wo_number(paragraphs)
+    agenda_start = find_agenda_start_wo_number(paragraphs, interactive)
     return agenda_start
 
 
-def find_agenda_end(soup: bs4.BeautifulSoup) -> int:
-    paragraphs = soup.find_all('p')
-    for i, p in enumerate(paragraphs):
-        if "Anlage" in p.text and "siehe Anlage" not in p.text:
+def find_agenda_end(paragraphs: list) -> int:
+    for i, (text, classes) in enumerate(paragraphs):
+        if "Anlage" in text and "siehe Anlage" not in text:
             return i
-        elif "Entschuldigt" in p.text:
+        elif "Entschuldigt" in text:
             return i
-        elif "Beginn:" in p.text:
+        elif "Beginn:" in text:
             return i
 
     print("Did not find proper ending for agenda, return default index: 30")
     return 30
 
 
-def find_agenda_start_wo_number(paragraphs: list) -> bs4.element.Tag:  # noqa
+def find_agenda_start_wo_number(paragraphs: list,
+                                interactive: bool = True) -> int:
     classes_w_agenda_items = ["MsoToc9", "MsoToc7", "MsoToc1"]
-    for p in paragraphs:
-        try:
-            class_ = p['class'][0]
-            if class_ in classes_w_agenda_items:
-                agenda_start = p
-                # print("found agenda start wo number:", agenda_start)
-                return agenda_start
-        except KeyError:
-            pass
+    for i, (text, classes) in enumerate(paragraphs):
+        if classes and classes[0] in classes_w_agenda_items:
+            # print("found agenda start wo number:", text)
+            return i
 
     print("Did not find agenda start wo number")
-    continue_()
+    if interactive:
+        continue_()
 
 
 def is_numbered_agenda_item(text: str) -> bool:
@@ -132,8 +149,8 @@ def is_numbered_agenda_item(text: str) -> bool:
 
 def process_protocol(html_filename: str) -> dict:
     # Parse file
-    soup = create_parser(html_filename)
-    agenda = parse_agenda(soup)
+    soup = parse_data.create_parser(html_filename)
+    agenda = parse_agenda(parse_data.all_paragraphs(soup))
 
     if 1:
         print("process protocol")
@@ -156,16 +173,23 @@ def mk_html_filename(period=None, index=None) -> str:
     return html_filename
 
 
-def parse_agenda(soup: bs4.BeautifulSoup) -> dict:
+def parse_agenda(paragraphs: list, interactive: bool = True) -> dict:
+    """
+    Parse the agenda from the (text, classes) tuples of all p tags of a
+    protocol.
+
+    With interactive=False, the function does not wait for user input
+    when no agenda can be found (used by parse_data.py).
+    """
     session_agenda = {}
     speakers = []
     actual_key = None
     found_agenda_item = False
-    agenda_start = find_agenda_start(soup)
+    agenda_start = find_agenda_start(paragraphs, interactive)
     # print("agenda_start:", agenda_start)
-    agenda_start_text = clean_tag_text(agenda_start)
 
-    if agenda_start:
+    if agenda_start is not None:
+        agenda_start_text = parse_data.clean_text(paragraphs[agenda_start][0])
         if 0:
             print("item:", agenda_start_text)
             print("agenda_start:", agenda_start)
@@ -174,15 +198,16 @@ def parse_agenda(soup: bs4.BeautifulSoup) -> dict:
         session_agenda[actual_key] = speakers
     else:
         print("no agenda found!")
-        continue_()
+        if interactive:
+            continue_()
         return None
 
-    for tag in agenda_start.find_all_next('p'):
+    for text, classes in paragraphs[agenda_start + 1:]:
         if 0:
             print("agenda:")
             print(session_agenda)
             continue_()
-        tag_text = clean_tag_text(tag)
+        tag_text = parse_data.clean_text(text)
         # print("tag_text:", tag_text)
         if not tag_text:
             continue
@@ -234,16 +259,16 @@ def parse_agenda(soup: bs4.BeautifulSoup) -> dict:
     return session_agenda
 
 
-def parse_agenda_wo_numbers(soup: bs4.BeautifulSoup) -> dict:
+def parse_agenda_wo_numbers(paragraphs: list) -> dict:
     session_agenda = {}
     speakers = []
-    agenda_start = find_agenda_start_wo_number(soup)
-    agenda_start_text = clean_tag_text(agenda_start)
+    agenda_start = find_agenda_start_wo_number(paragraphs)
+    agenda_start_text = parse_data.clean_text(paragraphs[agenda_start][0])
     only_item = agenda_start_text  # no numbering means that there is only one item  # noqa
 
-    for tag in agenda_start.find_all_next('p'):
+    for text, classes in paragraphs[agenda_start + 1:]:
         # print(session_agenda)
-        tag_text = clean_tag_text(tag)
+        tag_text = parse_data.clean_text(text)
         # print("tag_text:", tag_text)
         if not tag_text:
             continue
@@ -277,14 +302,69 @@ def parse_agenda_wo_numbers(soup: bs4.BeautifulSoup) -> dict:
     return session_agenda
 
 
-def mk_agenda_list_w_speakers(period: str, index: str) -> dict:
+def agenda_cache_filename(period, index) -> str:
+    return os.path.join(
+        AGENDA_CACHE_DIR,
+        PROTOCOL_FILE_TEMPLATE % (int(period), int(index), 'json'))
+
+
+def load_cache_entry(cache_filename: str) -> dict:
+    """
+    Return the agenda cache entry built using the current AGENDA_VERSION,
+    None otherwise.
+    """
+    try:
+        entry = protocol_store.load_json(cache_filename)
+    except (FileNotFoundError, ValueError):
+        return None
+    if entry.get("agenda_version") != AGENDA_VERSION:
+        return None
+    return entry
+
+
+def mk_agenda_list_w_speakers(period: str, index: str,
+                              interactive: bool = True) -> dict:
+    """
+    Return the agenda of protocol period-index, from the agenda cache if
+    possible.
+
+    With interactive=False, the function does not wait for user input
+    when no agenda can be found (used in batch mode).
+    """
     html_filename = mk_html_filename(period, index)
-    agenda = process_protocol(html_filename)
+    html_signature = protocol_store.signature(html_filename)
+    cache_filename = agenda_cache_filename(period, index)
+
+    # unchanged HTML file: no need to read and hash it
+    entry = load_cache_entry(cache_filename)
+    if entry is not None and entry.get("html_signature") == html_signature:
+        cache_stats['hits'] += 1
+        return entry["agenda"]
+
+    html = protocol_store.read(html_filename)
+    html_hash = load_data.content_hash(html)
+    if entry is not None and entry.get("html_sha256") == html_hash:
+        # e.g. touched or recompressed HTML file
+        cache_stats['hits'] += 1
+        agenda = entry["agenda"]
+    else:
+        cache_stats['misses'] += 1
+        soup = parse_data.create_lxml_tree(html)
+        agenda = parse_agenda(parse_data.all_paragraphs(soup), interactive)
+    os.makedirs(AGENDA_CACHE_DIR, exist_ok=True)
+    protocol_store.dump_json({
+        "html_sha256": html_hash,
+        "html_signature": html_signature,
+        "agenda_version": AGENDA_VERSION,
+        "agenda": agenda,
+        }, cache_filename)
 
     return agenda
 
 
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+    Batch mode support for the analysis scripts.
+
+    The analysis scripts (mk_paragraphs_to_sents.py, tagger_speech_analysis.py,
+    summarize_speeches.py, visualize_agenda_and_speakers.py) were written to
+    be stepped through interactively.  In batch mode they never wait for
+    user input, so that they can be run from cron or in worker processes,
+    and their diagnostic output goes to a leveled logger instead of stdout.
+
+    Each script has a module flag batch_mode, which is set by its command
+    line option --batch; its continue_() returns immediately in batch mode
+    or if stdin is not a terminal.  The log level is set with --log-level;
+    "off" disables the diagnostic output completely.
+
+    The modules used by the scripts (agenda_and_speaker_list.py,
+    collect_speeches.py, speech_analysis.py,
+    sentiment_speech_analysis_w_bert.py) gate their continue_() the same
+    way; agendas are rebuilt with interactive=can_prompt(batch_mode).
+
+"""
+import sys
+import logging
+
+### Globals
+
+# Log levels accepted by --log-level
+LOG_LEVELS = ('debug', 'info', 'warning', 'error', 'off')
+
+# Default log level
+LOG_LEVEL = 'info'
+
+# Format of the log messages
+LOG_FORMAT = '%(asctime)s %(name)s %(levelname)s: %(message)s'
+
+###
+
+def add_arguments(parser):
+
+    """ Add the batch mode command line options to the argparse parser.
+
+    """
+    parser.add_argument('--batch', action='store_true',
+                        help='never wait for user input')
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default=LOG_LEVEL,
+                        help=f'level of the diagnostic output '
+                             f'(default: {LOG_LEVEL})')
+
+def setup_logging(level=LOG_LEVEL):
+
+    """ Route the log messages of level (one of LOG_LEVELS) and above to
+        stderr; level "off" disables logging.
+
+    """
+    if level == 'off':
+        logging.disable(logging.CRITICAL)
+        return
+    logging.disable(logging.NOTSET)
+    logging.basicConfig(level=getattr(logging, level.upper()),
+                        format=LOG_FORMAT, stream=sys.stderr)
+
+def can_prompt(batch_mode):
+
+    """ Return True, if a script not in batch_mode may wait for user input,
+        i.e. stdin is a terminal.
+
+    """
+    if batch_mode:
+        return False
+    try:
+        return sys.stdin.isatty()
+    except (AttributeError, ValueError):
+        # stdin replaced or closed
+        return False
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+    Benchmark building the OpenSearch bulk payload of protocols.
+
+    Usage: bench_feed_documents.py [<protocol dir>] [<repeat>]
+
+    Compares feed_opensearch.bulk_insert_lines() with serializing the
+    merged paragraph dictionaries of bulk_insert_generator().  All parsed
+    JSON protocols of the directory (default: PROTOCOL_DIR) are used; if
+    there are none, a synthetic protocol with 20000 paragraphs is built.
+    Reports throughput and peak memory (tracemalloc) per implementation.
+
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import context  # noqa
+import feed_opensearch
+import protocol_store
+from settings import PROTOCOL_DIR
+
+
+def synthetic_protocol(paragraphs=20000):
+    agenda = {str(i): {'title': f'Tagesordnungspunkt {i}' * 5,
+                       'speakers': [f'Redner {j}' for j in range(10)]}
+              for i in range(20)}
+    return {
+        'protocol_date': '2021-11-10',
+        'protocol_title': 'Plenarprotokoll 17/150',
+        'protocol_period': 17,
+        'protocol_index': 150,
+        'protocol_url': 'https://www.landtag.nrw.de/portal/WWW/'
+                        'dokumentenarchiv/Dokument/MMP17-150.pdf',
+        'agenda': agenda,
+        'agenda_version': 1,
+        'content': [
+            {'speech': f'Das ist der Absatz Nummer {i} der Rede. ' * 5,
+             'speaker_name': 'André Kuper',
+             'speaker_party': None,
+             'speaker_ministry': None,
+             'speaker_role': 'president',
+             'speaker_role_descr': 'Präsident',
+             'speaker_is_chair': True,
+             'html_classes': ['astandardabsatz'],
+             'flow_index': i + 1,
+             'speaker_flow_index': i + 1}
+            for i in range(paragraphs)],
+    }
+
+
+def merged_lines(protocol):
+    for action in feed_opensearch.bulk_insert_generator(protocol, 'bench'):
+        yield feed_opensearch.serialize_bulk_action(action)
+
+
+def lean_lines(protocol):
+    for doc_id, data in feed_opensearch.bulk_insert_lines(protocol, 'bench'):
+        yield data
+
+
+def bench(protocols, lines, repeat):
+    size = 0
+    start = time.perf_counter()
+    for i in range(repeat):
+        for protocol in protocols:
+            for data in lines(protocol):
+                size += len(data)
+    duration = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    for protocol in protocols:
+        for data in lines(protocol):
+            pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return duration, size // repeat, peak
+
+
+def main():
+    dirname = sys.argv[1] if len(sys.argv) > 1 else PROTOCOL_DIR
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    protocols = []
+    if os.path.isdir(dirname):
+        protocols = [
+            protocol_store.load_json(os.path.join(dirname, name))
+            for name in protocol_store.listdir(dirname)
+            if name.endswith('.json') and name.startswith('protocol-')]
+    if not protocols:
+        print(f'No parsed protocols found in {dirname}, using a synthetic '
+              f'protocol')
+        protocols = [synthetic_protocol()]
+    docs = sum(len(protocol['content']) for protocol in protocols)
+    print(f'{len(protocols)} protocols, {docs} paragraphs')
+
+    if list(merged_lines(protocols[0])) != list(lean_lines(protocols[0])):
+        print('ERROR: payloads differ')
+    print(f'{"builder":10s} {"docs/s":>10s} {"MB/s":>8s} {"peak KB":>9s}')
+    results = {}
+    for label, lines in (('merged', merged_lines), ('lean', lean_lines)):
+        duration, size, peak = bench(protocols, lines, repeat)
+        results[label] = duration
+        print(f'{label:10s} {docs / duration:10.0f} '
+              f'{size / duration / 2**20:8.1f} {peak / 1024:9.1f}')
+    print(f'speedup: {results["merged"] / results["lean"]:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
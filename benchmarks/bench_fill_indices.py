@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+    Benchmark mk_paragraphs_to_sents.fill_indices_w_text() against the
+    former implementation scanning all paragraphs per flow index.
+
+    Usage: bench_fill_indices.py [<period>]
+
+    Runs both implementations on synthetic sessions of growing size to
+    show the scaling.  If a period is given, the longest parsed protocol
+    of the period is benchmarked as well.
+
+"""
+import os
+import sys
+import time
+
+# Use the tests' context module, which also sets up the package path, so
+# that the reference implementation can be imported from the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+import context  # noqa
+import mk_paragraphs_to_sents
+import build_manifest
+from test_mk_paragraphs_to_sents import (  # noqa
+    reference_fill_indices_w_text,
+    synthetic_session,
+    )
+
+
+def bench(function, session, speeches):
+    start = time.perf_counter()
+    result = function(session, speeches)
+    return result, time.perf_counter() - start
+
+
+def compare(label, session, speeches):
+    reference, reference_duration = bench(
+        reference_fill_indices_w_text, session, speeches)
+    result, duration = bench(
+        mk_paragraphs_to_sents.fill_indices_w_text, session, speeches)
+    status = '' if result == reference else '  MISMATCH'
+    print(f'{label:>20s} {len(session.content):8d} '
+          f'{reference_duration * 1e3:10.1f} {duration * 1e3:8.2f} '
+          f'{reference_duration / duration:8.0f}x{status}')
+
+
+def longest_protocol(period):
+    longest = None
+    for index in build_manifest.period_indices(period):
+        try:
+            data = mk_paragraphs_to_sents.load_json_file(period, index)
+        except FileNotFoundError:
+            continue
+        if longest is None or len(data['content']) > len(longest['content']):
+            longest = data
+    return longest
+
+
+def main():
+    print(f'{"session":>20s} {"paras":>8s} {"scan ms":>10s} '
+          f'{"map ms":>8s} {"speedup":>9s}')
+    for count in (1000, 2000, 4000, 8000, 16000):
+        session, speeches = synthetic_session(count)
+        compare('synthetic', session, speeches)
+
+    if len(sys.argv) > 1:
+        period = int(sys.argv[1])
+        data = longest_protocol(period)
+        if data is None:
+            print(f'No parsed protocols found for period {period}')
+            return
+        session = mk_paragraphs_to_sents.mk_session(data)
+        speeches = mk_paragraphs_to_sents.collect_speech_indices(
+            session.content, session.agenda)
+        compare(f'protocol {session.protocol_no}', session, speeches)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+    Benchmark the BS4 and lxml backends of parse_data.parse_protocol().
+
+    Usage: bench_parse_backends.py [<protocol dir>] [<repeat>]
+
+    All HTML protocols of the directory (default: PROTOCOL_DIR) are parsed
+    with both backends; the results are checked for equality and the
+    time per protocol is reported.
+
+"""
+import os
+import sys
+import time
+
+import context  # noqa
+import parse_data
+import protocol_store
+from settings import PROTOCOL_DIR
+
+
+def parse(html, backend):
+    if backend == 'lxml':
+        soup = parse_data.create_lxml_tree(html)
+    else:
+        soup = parse_data.bs4.BeautifulSoup(html, 'lxml')
+    try:
+        return parse_data.parse_protocol(soup)
+    except parse_data.ParserError as error:
+        return str(error)
+
+
+def bench_backend(contents, backend, repeat):
+    results = []
+    start = time.perf_counter()
+    for i in range(repeat):
+        results = [parse(html, backend) for html in contents]
+    duration = (time.perf_counter() - start) / repeat
+    return results, duration
+
+
+def main():
+    dirname = sys.argv[1] if len(sys.argv) > 1 else PROTOCOL_DIR
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    filenames = [name for name in protocol_store.listdir(dirname)
+                 if name.endswith('.html')]
+    if not filenames:
+        print(f'No HTML protocols found in {dirname}')
+        return
+    contents = [protocol_store.read(os.path.join(dirname, name))
+                for name in filenames]
+
+    # Silence the parser warnings during the runs
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        bs4_results, bs4_duration = bench_backend(contents, 'bs4', repeat)
+        lxml_results, lxml_duration = bench_backend(contents, 'lxml', repeat)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    mismatches = [name for name, a, b in
+                  zip(filenames, bs4_results, lxml_results) if a != b]
+    print(f'{len(filenames)} protocols, {len(mismatches)} mismatches')
+    for name in mismatches:
+        print(f'  results differ: {name}')
+    print(f'{"backend":10s} {"ms/protocol":>12s}')
+    for label, duration in (('bs4', bs4_duration), ('lxml', lxml_duration)):
+        print(f'{label:10s} {duration / len(filenames) * 1e3:12.2f}')
+    print(f'speedup: {bs4_duration / lxml_duration:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
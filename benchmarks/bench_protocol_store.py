@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+    Benchmark disk footprint vs. read latency of the protocol store formats.
+
+    Usage: bench_protocol_store.py [<protocol dir>]
+
+    All protocol files of the directory (default: PROTOCOL_DIR) are copied
+    to temporary directories using each storage format, then read back
+    once.
+
+"""
+import os
+import sys
+import time
+import tempfile
+
+import context  # noqa
+import protocol_store
+from settings import PROTOCOL_DIR
+
+
+def disk_usage(dirname):
+    return sum(entry.stat().st_size for entry in os.scandir(dirname))
+
+
+def bench_format(filenames, contents, compression, archive):
+    with tempfile.TemporaryDirectory() as dirname:
+        for name, content in zip(filenames, contents):
+            protocol_store.write(os.path.join(dirname, name), content,
+                                 compression)
+        if archive:
+            protocol_store.migrate(dirname, archive=True)
+        footprint = disk_usage(dirname)
+        start = time.perf_counter()
+        for name in filenames:
+            protocol_store.read(os.path.join(dirname, name))
+        duration = time.perf_counter() - start
+        protocol_store.close_archives()
+    return footprint, duration
+
+
+def main():
+    dirname = sys.argv[1] if len(sys.argv) > 1 else PROTOCOL_DIR
+    filenames = protocol_store.listdir(dirname)
+    if not filenames:
+        print(f'No protocol files found in {dirname}')
+        return
+    contents = [protocol_store.read(os.path.join(dirname, name))
+                for name in filenames]
+    formats = [('plain', None, False), ('gzip', 'gzip', False)]
+    if protocol_store.zstandard is not None:
+        formats.append(('zstd', 'zstd', False))
+    formats.append(('archive', None, True))
+
+    plain_size = sum(len(content) for content in contents)
+    print(f'{len(filenames)} files, {plain_size / 1e6:.1f} MB uncompressed')
+    print(f'{"format":10s} {"MB":>8s} {"ratio":>6s} {"ms/file":>8s}')
+    for label, compression, archive in formats:
+        footprint, duration = bench_format(filenames, contents,
+                                           compression, archive)
+        print(f'{label:10s} {footprint / 1e6:8.2f} '
+              f'{footprint / plain_size:6.2f} '
+              f'{duration / len(filenames) * 1e3:8.3f}')
+
+
+if __name__ == '__main__':
+    main()
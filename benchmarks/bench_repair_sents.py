@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+    Benchmark mk_paragraphs_to_sents.repair_sents() against the former
+    recursive sentence repair functions.
+
+    Usage: bench_repair_sents.py [<sentences per speech>]
+
+    Speeches of growing length are built from the sentence parts of the
+    tests, many of which need to be reconnected or split.
+
+"""
+import os
+import sys
+import time
+import random
+
+# Use the tests' context module, which also sets up the package path, so
+# that the reference implementation can be imported from the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+import context  # noqa
+import mk_paragraphs_to_sents
+from test_mk_paragraphs_to_sents import (  # noqa
+    SENTENCE_PARTS,
+    reference_reconnect_sents_w_lower_first_letter,
+    reference_repair_sents,
+    )
+
+
+def long_speech(count, rng):
+    # Start w a sentence which never gets reconnected
+    sentences = ['Herr Präsident!']
+    sentences.extend(rng.choice(SENTENCE_PARTS) for i in range(count - 1))
+    return sentences
+
+
+def reference(sentences):
+    sentences = reference_repair_sents(sentences)
+    return reference_reconnect_sents_w_lower_first_letter(sentences)
+
+
+def bench(function, sentences):
+    start = time.perf_counter()
+    result = function(sentences)
+    return result, time.perf_counter() - start
+
+
+def main():
+    counts = [int(sys.argv[1])] if len(sys.argv) > 1 else [
+        100, 200, 400, 800, 1600]
+    # The former implementation recurses once per reconnect
+    sys.setrecursionlimit(100000)
+    rng = random.Random(3)
+    print(f'{"sentences":>10s} {"recursive ms":>13s} {"stream ms":>10s} '
+          f'{"speedup":>8s}')
+    for count in counts:
+        sentences = long_speech(count, rng)
+        expected, reference_duration = bench(reference, sentences)
+        result, duration = bench(
+            lambda s: list(mk_paragraphs_to_sents.repair_sents(s)),
+            sentences)
+        status = '' if result == expected else '  MISMATCH'
+        print(f'{count:10d} {reference_duration * 1e3:13.1f} '
+              f'{duration * 1e3:10.2f} '
+              f'{reference_duration / duration:7.0f}x{status}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+    Benchmark replaying exported bulk files against a local stand-in for
+    an OpenSearch server.
+
+    Usage: bench_replay.py <bulk file> ... [--workers N,...]
+
+    The stand-in accepts bulk requests on localhost and answers them
+    without indexing anything, so the benchmark measures the client side
+    throughput of feed_opensearch.replay_bulk_files() (reading, chunking
+    and sending) for the given numbers of workers (default: 1,2,4,8).
+
+"""
+import sys
+import json
+import threading
+import http.server
+
+import opensearchpy
+
+import context  # noqa
+import feed_opensearch
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        items = []
+        for line in body.splitlines():
+            if line.startswith(b'{"index"'):
+                items.append({'index': {'status': 201}})
+            elif line.startswith(b'{"delete"'):
+                items.append({'delete': {'status': 200}})
+        response = json.dumps({'errors': False, 'items': items}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    args = sys.argv[1:]
+    workers = [1, 2, 4, 8]
+    if '--workers' in args:
+        pos = args.index('--workers')
+        workers = [int(n) for n in args[pos + 1].split(',')]
+        del args[pos:pos + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = opensearchpy.OpenSearch(
+        hosts=[{'host': '127.0.0.1', 'port': server.server_port}],
+        pool_maxsize=max(workers))
+    try:
+        print(f'{"workers":>8s} {"docs/s":>10s} {"requests":>9s}')
+        for count in workers:
+            stats = feed_opensearch.BulkStats()
+            feed_opensearch.replay_bulk_files(
+                client, args, stats, workers=count, max_in_flight=2 * count)
+            print(f'{count:8d} {stats.docs_per_second():10.0f} '
+                  f'{stats.requests:9d}')
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+    Benchmark mk_paragraphs_to_sents.collect_speech_indices(), which uses
+    speech_segmentation.segment_speeches(), against the former walker.
+
+    Usage: bench_segmentation.py [<period>]
+
+    Runs both implementations on synthetic sessions of growing size.  If a
+    period is given, all parsed protocols of the period are benchmarked as
+    well.
+
+"""
+import os
+import sys
+import time
+
+# Use the tests' context module, which also sets up the package path, so
+# that the reference implementation can be imported from the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+import context  # noqa
+import mk_paragraphs_to_sents
+import build_manifest
+from test_speech_segmentation import (  # noqa
+    reference_collect_speech_indices,
+    synthetic_protocol,
+    )
+
+
+def bench(function, protocols, repeat=5):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = [function(paragraphs, agenda)
+                  for paragraphs, agenda in protocols]
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return result, best
+
+
+def compare(label, protocols):
+    reference, reference_duration = bench(
+        reference_collect_speech_indices, protocols)
+    result, duration = bench(
+        mk_paragraphs_to_sents.collect_speech_indices, protocols)
+    status = '' if result == reference else '  MISMATCH'
+    paragraphs = sum(len(paragraphs) for paragraphs, agenda in protocols)
+    print(f'{label:>20s} {paragraphs:8d} '
+          f'{reference_duration * 1e3:10.1f} {duration * 1e3:10.1f} '
+          f'{reference_duration / duration:8.2f}x{status}')
+
+
+def period_protocols(period):
+    protocols = []
+    for index in build_manifest.period_indices(period):
+        try:
+            data = mk_paragraphs_to_sents.load_json_file(period, index)
+        except FileNotFoundError:
+            continue
+        protocols.append((data['content'], data['agenda']))
+    return protocols
+
+
+def main():
+    print(f'{"protocols":>20s} {"paras":>8s} {"former ms":>10s} '
+          f'{"engine ms":>10s} {"speedup":>9s}')
+    for topics in (5, 20, 80, 320):
+        # Topics with less than two notified speakers end the lineup
+        protocols = [synthetic_protocol(topics, seed, (2, 3, 4, 5, 6))
+                     for seed in range(10)]
+        compare(f'synthetic {topics} TOPs', protocols)
+
+    if len(sys.argv) > 1:
+        period = int(sys.argv[1])
+        protocols = period_protocols(period)
+        if not protocols:
+            print(f'No parsed protocols found for period {period}')
+            return
+        compare(f'period {period}', protocols)
+
+
+if __name__ == '__main__':
+    main()
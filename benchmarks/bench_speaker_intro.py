@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+    Benchmark parse_data.parse_speaker_intro() against the former
+    implementation matching each RE separately.
+
+    Usage: bench_speaker_intro.py [<number of intro lines>]
+
+    The intro lines are generated by the corpus helper of the tests.
+
+"""
+import os
+import sys
+import time
+
+# Use the tests' context module, which also sets up the package path, so
+# that the reference implementation can be imported from the tests
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+import context  # noqa
+import parse_data
+from test_parse_data import (  # noqa
+    parse_intro_or_error,
+    reference_parse_speaker_intro,
+    speaker_intro_corpus,
+    )
+
+
+def bench(function, lines):
+    start = time.perf_counter()
+    results = [parse_intro_or_error(function, line) for line in lines]
+    return results, time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    lines = speaker_intro_corpus(count)
+
+    # Silence the parser warnings during the runs
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        expected, reference = bench(reference_parse_speaker_intro, lines)
+        results, combined = bench(
+            lambda text: parse_data.parse_speaker_intro(None, text), lines)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    assert results == expected
+
+    print(f'{len(lines)} intro lines')
+    print(f'separate REs: {reference / len(lines) * 1e6:8.2f} us/paragraph')
+    print(f'combined RE:  {combined / len(lines) * 1e6:8.2f} us/paragraph')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+    Benchmark parse_data.typo_fixes() against the former linear scan.
+
+    Usage: bench_typo_fixes.py [<number of fixes>]
+
+    The TYPO_FIXES table is extended with generated name typos to the
+    given size (default: 5000), then both implementations are run over
+    a set of speaker intros and speech paragraphs.
+
+"""
+import sys
+import time
+import random
+
+import context  # noqa
+import parse_data
+
+
+def linear_typo_fixes(text, fixes):
+    match = text.startswith
+    for typo, fix in fixes.items():
+        if match(typo):
+            text = fix + text[len(typo):]
+    return text
+
+
+def generated_fixes(count, rng):
+    fixes = dict(parse_data.TYPO_FIXES)
+    while len(fixes) < count:
+        name = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz')
+                       for i in range(rng.randint(4, 12))).title()
+        fixes[f'{name} SPD):'] = f'{name} (SPD):'
+    return fixes
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = random.Random(1)
+    fixes = generated_fixes(count, rng)
+    tree = parse_data.build_typo_fixes_tree(fixes)
+    typos = list(fixes)
+    texts = ['Ich danke Ihnen für die Aufmerksamkeit.',
+             'Präsident André Kuper: Vielen Dank.',
+             '(Beifall von der SPD)'] * 300
+    texts += [rng.choice(typos) + ' Text' for i in range(100)]
+
+    start = time.perf_counter()
+    expected = [linear_typo_fixes(text, fixes) for text in texts]
+    linear = time.perf_counter() - start
+    start = time.perf_counter()
+    result = [parse_data.typo_fixes(text, tree) for text in texts]
+    indexed = time.perf_counter() - start
+    assert result == expected
+
+    print(f'{len(fixes)} fixes, {len(texts)} paragraphs')
+    print(f'linear scan: {linear / len(texts) * 1e6:8.2f} us/paragraph')
+    print(f'prefix tree: {indexed / len(texts) * 1e6:8.2f} us/paragraph')
+
+
+if __name__ == '__main__':
+    main()
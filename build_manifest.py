@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+    Build manifest for the protocol processing stages.
+
+    For each period, the manifest records per stage and protocol the
+    SHA-256 hashes of the stage's input and output files and the version
+    of the stage code which produced the outputs.  The period entry points
+    of the stages use it to only reprocess protocols whose inputs, outputs
+    or stage version changed.
+
+    The manifest is stored in PROTOCOL_DIR/build-<period>.json:
+
+    {
+        "<stage>": {
+            "<index>": {
+                "version": "<stage version>",
+                "inputs": {"<filename>": "<sha256>", ...},
+                "outputs": {"<filename>": "<sha256>", ...}
+            },
+            ...
+        },
+        ...
+    }
+
+    Stages which process a whole period at once use the key "period"
+    instead of a protocol index.
+
+    Command line interface:
+
+    build_manifest.py <period>
+
+        Print a summary of the manifest of the period.
+
+"""
+import os
+import sys
+import json
+
+import load_data
+import protocol_store
+from settings import (
+    PROTOCOL_DIR,
+    PROTOCOL_FILE_TEMPLATE,
+    BUILD_MANIFEST_TEMPLATE,
+    TAGGER_FILE_TEMPLATE,
+    NLTK_DIR,
+    BERT_DIR,
+    TAGGER_DIR,
+    )
+
+### Globals
+
+# Verbosity
+verbose = 0
+
+# Input and output files of the per-protocol stages: stage -> (inputs,
+# outputs), each a list of (directory, extension) tuples
+STAGE_FILES = {
+    'parse': ([(PROTOCOL_DIR, 'html')], [(PROTOCOL_DIR, 'json')]),
+    'nltk': ([(PROTOCOL_DIR, 'json')], [(NLTK_DIR, 'json')]),
+    'bert': ([(NLTK_DIR, 'json')], [(BERT_DIR, 'json')]),
+    'feed': ([(PROTOCOL_DIR, 'json')], []),
+}
+
+# Manifest key used for stages processing a whole period
+PERIOD_KEY = 'period'
+
+###
+
+def manifest_filename(period):
+
+    """ Return the file name of the build manifest for period.
+
+    """
+    return os.path.join(PROTOCOL_DIR, BUILD_MANIFEST_TEMPLATE % period)
+
+def load_manifest(period):
+
+    """ Load the build manifest of period.
+
+        If the file does not exist, an empty manifest is returned.
+
+    """
+    filename = manifest_filename(period)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_manifest(period, manifest):
+
+    """ Save the build manifest of period atomically.
+
+    """
+    protocol_store.write_atomic(
+        manifest_filename(period),
+        json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+def stage_files(stage, period, index):
+
+    """ Return the (inputs, outputs) tuple of file name lists for stage
+        and protocol period-index.
+
+    """
+    inputs, outputs = STAGE_FILES[stage]
+    return (
+        [os.path.join(dirname, PROTOCOL_FILE_TEMPLATE % (period, index, ext))
+         for dirname, ext in inputs],
+        [os.path.join(dirname, PROTOCOL_FILE_TEMPLATE % (period, index, ext))
+         for dirname, ext in outputs])
+
+def tagger_files(period, indices):
+
+    """ Return the (inputs, outputs) tuple of file name lists for the
+        tagger stage, which processes all protocols indices of period at
+        once.
+
+    """
+    inputs = [stage_files('nltk', period, index)[1][0] for index in indices]
+    outputs = [os.path.join(TAGGER_DIR, TAGGER_FILE_TEMPLATE % period)]
+    return inputs, outputs
+
+def hash_files(filenames):
+
+    """ Return a dictionary mapping the filenames to the SHA-256 hash of
+        their content, or None for files which don't exist.
+
+    """
+    hashes = {}
+    for filename in filenames:
+        try:
+            hashes[filename] = load_data.file_hash(filename)
+        except FileNotFoundError:
+            hashes[filename] = None
+    return hashes
+
+def is_up_to_date(manifest, stage, key, inputs, outputs, version):
+
+    """ Return True, if the manifest entry of stage for key shows that the
+        outputs were built from the current inputs using version and the
+        outputs were not changed since.
+
+    """
+    entry = manifest.get(stage, {}).get(str(key))
+    if entry is None or entry['version'] != str(version):
+        return False
+    if entry['inputs'] != hash_files(inputs):
+        return False
+    return entry['outputs'] == hash_files(outputs)
+
+def record(manifest, stage, key, inputs, outputs, version):
+
+    """ Record in the manifest, that stage built outputs from inputs for
+        key using version.
+
+        This has to be called after the outputs were written.  Versions
+        are stored as strings.
+
+    """
+    manifest.setdefault(stage, {})[str(key)] = {
+        'version': str(version),
+        'inputs': hash_files(inputs),
+        'outputs': hash_files(outputs),
+    }
+
+def outdated_protocols(manifest, stage, period, indices, version):
+
+    """ Return the list of protocol indices of period which stage has to
+        process, since their inputs, outputs or the stage version changed.
+
+    """
+    outdated = []
+    for index in indices:
+        inputs, outputs = stage_files(stage, period, index)
+        if not is_up_to_date(manifest, stage, index, inputs, outputs,
+                             version):
+            outdated.append(index)
+    if verbose:
+        print (f'{stage}: {len(outdated)} of {len(indices)} protocols '
+               f'of period {period} are outdated')
+    return outdated
+
+def record_protocol(manifest, stage, period, index, version):
+
+    """ Record that stage processed protocol period-index using version.
+
+    """
+    inputs, outputs = stage_files(stage, period, index)
+    record(manifest, stage, index, inputs, outputs, version)
+
+def period_indices(period):
+
+    """ Return the sorted list of protocol indices of period, which were
+        downloaded as HTML files.
+
+    """
+    data = load_data.load_period_data(period)
+    return sorted(
+        protocol['index']
+        for filename, protocol in data.items()
+        if os.path.splitext(filename)[1] == '.html')
+
+def main():
+
+    period = int(sys.argv[1])
+    manifest = load_manifest(period)
+    if not manifest:
+        print (f'No build manifest for period {period}')
+        return
+    for stage, entries in sorted(manifest.items()):
+        versions = sorted(set(entry['version'] for entry in entries.values()))
+        print (f'{stage}: {len(entries)} entries, '
+               f'versions {", ".join(versions)}')
+
+###
+
+if __name__ == '__main__':
+    main()
@@ -2,20 +2,29 @@
 """
 Visualize agenda and speakers.
 """
-import json
 import os
 import sys
 
 from collections import namedtuple
+from typing import Iterator
 
+from agenda_and_speaker_list import AGENDA_VERSION
 from agenda_and_speaker_list import mk_agenda_list_w_speakers
+import batch
+import protocol_store
+from speech_segmentation import segment_speeches
 from settings import (
     PROTOCOL_DIR,
     PROTOCOL_FILE_TEMPLATE,
     )
 
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
+
 
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
@@ -29,11 +38,13 @@ def load_json_file(period: str, index: str) -> dict:
         PROTOCOL_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        data = json.load(json_file)
+    data = protocol_store.load_json(json_filename)
 
-    agenda = mk_agenda_list_w_speakers(period, index)
-    data["agenda"] = agenda
+    # the agenda is stored by parse_data.py; older protocol files or
+    # agendas built with outdated rules are taken from the agenda cache
+    if data.get("agenda_version") != AGENDA_VERSION:
+        data["agenda"] = mk_agenda_list_w_speakers(
+            period, index, interactive=batch.can_prompt(batch_mode))
     return data
 
 
@@ -89,75 +100,23 @@ def agenda_topics_and_speaker_list(meta_session: tuple,
     return agenda
 
 
-def mk_notified_speaker_list(agenda: dict) -> list:
-    speakers = []
-    for key, val in agenda.items():
-        speakers.append(f"new topic ;;; {key}")
-        speaker_list = val
-        for speaker in speaker_list:
-            speakers.append(speaker)
-
-    return speakers
-
-
 def generate_speaker_flow_indices(session: namedtuple,
-                                  speakers: list) -> list:
-
-    paragraphs = session.content
-    new_topic = speakers[0]
-    current_speaker = None
-    flow_indices = []
+                                  agenda: dict) -> Iterator[list]:
+    """
+    Generator yielding the flow indices of the speeches of the notified
+    speakers of the agenda, in the order of the lineup.
+    """
+    for span in segment_speeches(session.content, agenda, interposed=False):
+        if span.flow_indices:
+            yield span.flow_indices
 
-    new_topic = new_topic.split(" ;;; ")[-1]
-    speakers = speakers[1:]
 
-    # if topic without speakers
-    if len(speakers) > 0:
-        next_listed_speaker = speakers[0]
-    else:
-        next_listed_speaker = None
-
-    print(new_topic)
-    current_topic = new_topic
-
-    for paragraph in paragraphs:
-        flow_index = paragraph['flow_index']
-        speaker = paragraph['speaker_name']
-        if current_speaker and speaker in current_speaker:
-            flow_indices.append(flow_index)
-        elif current_topic != new_topic:
-            if next_listed_speaker and speaker in next_listed_speaker:
-                flow_indices.append(flow_index)
-                current_topic = new_topic
-                current_speaker = next_listed_speaker
-                speakers = speakers[1:]
-                if speakers:
-                    next_listed_speaker = speakers[0]
-                else:
-                    next_listed_speaker = None
-        elif next_listed_speaker and speaker in next_listed_speaker:
-            flow_indices.append(flow_index)
-            yield flow_indices
-            flow_indices = []
-            current_speaker = next_listed_speaker
-            speakers = speakers[1:]
-            if speakers:
-                next_listed_speaker = speakers[0]
-                if "new topic" in next_listed_speaker:
-                    new_topic = next_listed_speaker.split(" ;;; ")[-1]
-                    speakers = speakers[1:]
-                    next_listed_speaker = speakers[0]
-            else:
-                next_listed_speaker = None
-
-
-
-def process_single_json_file(period, index) -> None:
+def process_single_json_file(period, index) -> list:
     data = load_json_file(period, index)
     session = mk_session(data)
     meta_session = (session.date, session.protocol_no, session.agenda)
     agenda = agenda_topics_and_speaker_list(meta_session, show=False)
-    notified_speakers = mk_notified_speaker_list(agenda)
+    return list(generate_speaker_flow_indices(session, agenda))
 
 
 def main():
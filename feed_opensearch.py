@@ -8,6 +8,16 @@
 import sys
 import os
 import json
+import gzip
+import time
+import hashlib
+import tempfile
+import weakref
+import threading
+import argparse
+import contextlib
+import collections
+import concurrent.futures
 
 # It would be better to use ES Python client, since this is more
 # up-to-date than the OpenSearch one, but the ES client fails with an
@@ -23,12 +33,25 @@ import opensearchpy
 import opensearchpy.helpers
 import sys
 
-import load_data
+import protocol_store
+import build_manifest
 from settings import (
     PROTOCOL_DIR,
     PROTOCOL_FILE_TEMPLATE,
     OPENSEARCH_HOSTS,
     OPENSEARCH_AUTH,
+    BULK_WORKERS,
+    BULK_MAX_IN_FLIGHT,
+    BULK_CHUNK_DOCS,
+    BULK_CHUNK_BYTES,
+    BULK_MAX_RETRIES,
+    BULK_INITIAL_BACKOFF,
+    BULK_MAX_BACKOFF,
+    FEED_FINGERPRINTS_TEMPLATE,
+    CHECKPOINT_INTERVAL,
+    BULK_EXPORT_DIR,
+    BULK_FILE_TEMPLATE,
+    BULK_PERIOD_FILE_TEMPLATE,
     )
 
 ### Globals
@@ -36,17 +59,40 @@ from settings import (
 # Name of the main index in OS
 INDEX_NAME = 'nrw_landtag_protocols'
 
+# Version of the feeding code; increase when changing the indexed data, so
+# that build_manifest.py triggers a refeed
+FEED_VERSION = 2
+
+# Number of primary shards and replicas of the index (the docker-compose.yml
+# setup runs two nodes)
+INDEX_SHARDS = 2
+INDEX_REPLICAS = 1
+
+# Index settings used while bulk loading, see bulk_load_settings()
+BULK_LOAD_SETTINGS = {
+    'refresh_interval': '-1',
+    'number_of_replicas': 0,
+}
+
 # Index template to use
 INDEX_TEMPLATE = json.dumps({
     'index_patterns': [INDEX_NAME],
     'template': {
+        'settings': {
+            'index': {
+                'number_of_shards': INDEX_SHARDS,
+                'number_of_replicas': INDEX_REPLICAS,
+            }
+        },
         'mappings': {
             'properties': {
                 'protocol_date': { 'type': 'date' },
                 'protocol_title': { 'type': 'text' },
                 'protocol_period': { 'type': 'integer' },
                 'protocol_index': { 'type': 'integer' },
-                'protocol_url': { 'type': 'url' },
+                'protocol_url': { 'type': 'keyword' },
+                'agenda': { 'type': 'object', 'enabled': False },
+                'agenda_version': { 'type': 'integer' },
                 'speaker_name': { 'type': 'keyword' },
                 'speaker_party': { 'type': 'keyword' },
                 'speaker_ministry': { 'type': 'keyword' },
@@ -56,7 +102,7 @@ INDEX_TEMPLATE = json.dumps({
                 'speech': { 'type': 'text' },
                 'annotation': { 'type': 'text' },
                 'citation': { 'type': 'text' },
-                'html_class': { 'type': 'keyword' },
+                'html_classes': { 'type': 'keyword' },
                 'flow_index': { 'type': 'integer' },
                 'speaker_flow_index': { 'type': 'integer' },
             }
@@ -67,6 +113,16 @@ INDEX_TEMPLATE = json.dumps({
 # Verbosity
 verbose = 0
 
+# HTTP status codes of bulk requests/items rejected by an overloaded
+# cluster, which are retried with backoff
+RETRY_STATUS = {429, 503}
+
+# OS client shared by all feeds of this process, see shared_client()
+_client = None
+
+# Index templates registered per client by setup_index_template()
+_registered_templates = weakref.WeakKeyDictionary()
+
 ###
 
 def load_json_protocol(period, index):
@@ -77,7 +133,7 @@ def load_json_protocol(period, index):
     filename = os.path.join(
         PROTOCOL_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
-    data = json.load(open(filename, 'r', encoding='utf-8'))
+    data = protocol_store.load_json(filename)
     return data
 
 def bulk_insert_generator(protocol, index_name):
@@ -124,7 +180,485 @@ def opensearch_client():
     )
     return client
 
-def process_protocol(period, index, os_index_name=INDEX_NAME):
+def shared_client():
+
+    """ Return the OS client shared by all feeds of this process.
+
+        The client is created on first use and keeps its connection pool
+        open, so that feeding many protocols doesn't pay for a new TLS
+        connection per protocol.
+
+    """
+    global _client
+    if _client is None:
+        _client = opensearch_client()
+    return _client
+
+def setup_index_template(client, os_index_name=INDEX_NAME):
+
+    """ Create/update the index template for os_index_name, which provides
+        the settings and mappings to be used for the index.
+
+        This is only done once per client and index name.
+
+    """
+    registered = _registered_templates.setdefault(client, set())
+    if os_index_name in registered:
+        return
+    template = INDEX_TEMPLATE
+    if os_index_name != INDEX_NAME:
+        template = json.loads(template)
+        template['index_patterns'] = [os_index_name]
+    client.indices.put_index_template(
+        name=os_index_name,
+        body=template,
+    )
+    registered.add(os_index_name)
+
+@contextlib.contextmanager
+def bulk_load_settings(client, os_index_name=INDEX_NAME):
+
+    """ Context manager switching the index os_index_name to
+        BULK_LOAD_SETTINGS (no refreshes and replicas) while loading
+        large amounts of data.
+
+        The original settings are restored and the index is refreshed
+        on exit, even if loading fails.  The index is created, if needed.
+
+    """
+    if not client.indices.exists(index=os_index_name):
+        client.indices.create(index=os_index_name)
+    response = client.indices.get_settings(index=os_index_name)
+    index_settings = response[os_index_name]['settings']['index']
+    # Settings not given in the index use the defaults, which are restored
+    # by setting them to None
+    original_settings = {
+        name: index_settings.get(name)
+        for name in BULK_LOAD_SETTINGS}
+    if verbose:
+        print (f'Switching index {os_index_name} to bulk load settings '
+               f'{BULK_LOAD_SETTINGS} (was {original_settings})')
+    client.indices.put_settings(
+        index=os_index_name,
+        body={'index': BULK_LOAD_SETTINGS})
+    try:
+        yield
+    finally:
+        client.indices.put_settings(
+            index=os_index_name,
+            body={'index': original_settings})
+        client.indices.refresh(index=os_index_name)
+        if verbose:
+            print (f'Restored index {os_index_name} settings')
+
+class BulkStats:
+
+    """ Counters of a bulk indexing run, updated by the bulk workers.
+
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start = time.perf_counter()
+        self.end = None
+        self.docs = 0
+        self.failed = 0
+        self.bytes = 0
+        self.requests = 0
+        self.rejected = 0
+        self.retried = 0
+        # Delta indexing counters, see delta_actions()
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.deleted = 0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    def docs_per_second(self):
+        duration = (self.end or time.perf_counter()) - self.start
+        if duration <= 0:
+            return 0.0
+        return self.docs / duration
+
+    def report(self):
+        print (f'Indexed {self.docs} documents '
+               f'({self.docs_per_second():.1f} docs/sec) in '
+               f'{self.requests} bulk requests '
+               f'({self.bytes / 2**20:.1f} MB): '
+               f'{self.failed} failed, {self.rejected} rejected, '
+               f'{self.retried} retried')
+        if self.new or self.changed or self.unchanged or self.deleted:
+            print (f'Paragraphs: {self.new} new, {self.changed} changed, '
+                   f'{self.unchanged} unchanged, {self.deleted} deleted')
+
+def serialize_bulk_action(action):
+
+    """ Return the NDJSON lines of the bulk request for action as bytes.
+
+        action uses the format of opensearchpy.helpers.streaming_bulk():
+        the keys starting with "_" are meta data, the others are the
+        document source.
+
+    """
+    op_type = action.get('_op_type', 'index')
+    meta = {}
+    source = {}
+    for key, value in action.items():
+        if key == '_op_type':
+            continue
+        if key[:1] == '_':
+            meta[key] = value
+        else:
+            source[key] = value
+    lines = json.dumps({op_type: meta}, separators=(',', ':')) + '\n'
+    if op_type != 'delete':
+        lines += json.dumps(source, separators=(',', ':')) + '\n'
+    return lines.encode('utf-8')
+
+def bulk_insert_lines(protocol, index_name):
+
+    """ Generator for inserting protocol paragraphs into OS, yielding
+        (document ID, serialized bulk action) tuples.
+
+        The result is the same as serializing the actions of
+        bulk_insert_generator() with serialize_bulk_action(), but the
+        global protocol attributes are only serialized once per protocol
+        and spliced into the JSON of each paragraph, instead of merging
+        them into a new dictionary per paragraph.
+
+    """
+    global_attributes = {
+        k: v for k, v in protocol.items() if k != 'content'}
+    period = protocol['protocol_period']
+    index = protocol['protocol_index']
+    shared = json.dumps(global_attributes, separators=(',', ':'))[1:-1]
+    shared = shared.encode('utf-8')
+    action_prefix = json.dumps(
+        {'index': {'_index': index_name, '_id': ''}},
+        separators=(',', ':'))[:-3].encode('utf-8')
+    for paragraph in protocol['content']:
+        doc_id = 'p-%i-%i-%i' % (period, index, paragraph['flow_index'])
+        if not shared or global_attributes.keys() & paragraph.keys():
+            # Paragraph attributes override global ones; use the
+            # standard serialization, since JSON objects must not have
+            # duplicate keys
+            yield doc_id, serialize_bulk_action({
+                '_op_type': 'index',
+                '_index': index_name,
+                '_id': doc_id,
+                **global_attributes,
+                **paragraph,
+            })
+            continue
+        source = json.dumps(paragraph, separators=(',', ':'))
+        if source == '{}':
+            source = '}'
+        else:
+            source = ',' + source[1:]
+        yield doc_id, b''.join((
+            action_prefix, doc_id.encode('ascii'), b'"}}\n{',
+            shared, source.encode('utf-8'), b'\n'))
+
+def chunk_bulk_actions(actions, chunk_docs=BULK_CHUNK_DOCS,
+                       chunk_bytes=BULK_CHUNK_BYTES):
+
+    """ Split the iterable actions into chunks of at most chunk_docs
+        actions and chunk_bytes bytes of bulk request.
+
+        actions may already be serialized using serialize_bulk_action().
+        Yields lists of serialized actions.  Actions larger than
+        chunk_bytes are sent in a chunk of their own.
+
+    """
+    chunk = []
+    size = 0
+    for action in actions:
+        if isinstance(action, bytes):
+            data = action
+        else:
+            data = serialize_bulk_action(action)
+        if chunk and (len(chunk) >= chunk_docs or
+                      size + len(data) > chunk_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(data)
+        size += len(data)
+    if chunk:
+        yield chunk
+
+def send_bulk_chunk(client, chunk, stats,
+                    max_retries=BULK_MAX_RETRIES,
+                    initial_backoff=BULK_INITIAL_BACKOFF,
+                    max_backoff=BULK_MAX_BACKOFF):
+
+    """ Send the serialized actions chunk to OS in a bulk request.
+
+        Requests and items rejected with one of RETRY_STATUS are resent
+        up to max_retries times, waiting initial_backoff seconds before
+        the first retry and doubling that up to max_backoff.
+
+        Returns the list of (ok, item) results for the actions.
+
+    """
+    results = [None] * len(chunk)
+    todo = list(range(len(chunk)))
+    for attempt in range(max_retries + 1):
+        body = b''.join(chunk[i] for i in todo)
+        try:
+            response = client.bulk(body=body)
+        except opensearchpy.TransportError as error:
+            if (error.status_code not in RETRY_STATUS or
+                attempt == max_retries):
+                raise
+            stats.add(requests=1, rejected=len(todo), retried=len(todo))
+        else:
+            retry = []
+            docs = failed = 0
+            for i, item in zip(todo, response['items']):
+                op_type, info = next(iter(item.items()))
+                status = info.get('status', 500)
+                if status in RETRY_STATUS and attempt < max_retries:
+                    retry.append(i)
+                    continue
+                # Deleting documents which are already gone is fine
+                ok = (200 <= status < 300 or
+                      (op_type == 'delete' and status == 404))
+                if ok:
+                    docs += 1
+                else:
+                    failed += 1
+                results[i] = (ok, item)
+            stats.add(requests=1, bytes=len(body), docs=docs, failed=failed,
+                      rejected=len(retry), retried=len(retry))
+            todo = retry
+            if not todo:
+                break
+        backoff = min(max_backoff, initial_backoff * 2**attempt)
+        if verbose:
+            print (f'Bulk request rejected, retrying {len(todo)} documents '
+                   f'in {backoff} seconds')
+        time.sleep(backoff)
+    return results
+
+def parallel_bulk(client, actions, stats=None,
+                  workers=BULK_WORKERS,
+                  max_in_flight=BULK_MAX_IN_FLIGHT,
+                  chunk_docs=BULK_CHUNK_DOCS,
+                  chunk_bytes=BULK_CHUNK_BYTES,
+                  **retry_options):
+
+    """ Send the iterable actions to OS using up to workers parallel bulk
+        requests.
+
+        At most max_in_flight requests are sent or waiting to be sent at
+        any time, so that the actions are only read as fast as OS accepts
+        them.  See chunk_bulk_actions() for chunk_docs and chunk_bytes
+        and send_bulk_chunk() for the retry_options.
+
+        Yields (ok, item) results in the order of actions.  The counters
+        of the run are added to stats, if given.
+
+    """
+    if stats is None:
+        stats = BulkStats()
+    max_in_flight = max(max_in_flight, workers)
+    in_flight = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        try:
+            for chunk in chunk_bulk_actions(actions, chunk_docs, chunk_bytes):
+                if len(in_flight) >= max_in_flight:
+                    yield from in_flight.popleft().result()
+                in_flight.append(executor.submit(
+                    send_bulk_chunk, client, chunk, stats, **retry_options))
+            while in_flight:
+                yield from in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+    stats.finish()
+
+def fingerprints_filename(period):
+
+    """ Return the file name of the fingerprint store for period.
+
+    """
+    return os.path.join(PROTOCOL_DIR, FEED_FINGERPRINTS_TEMPLATE % period)
+
+def load_fingerprints(period):
+
+    """ Load the fingerprint store of period.
+
+        The store maps OS index names to dictionaries mapping protocol
+        indices (as strings) to {document ID: fingerprint} of the
+        documents of the protocol currently stored in the OS index.
+
+        Fingerprints saved with another FEED_VERSION are dropped: the
+        document IDs are kept with a fingerprint of None, so that all
+        documents are sent again and removed paragraphs still get
+        deleted.
+
+    """
+    filename = fingerprints_filename(period)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        store = json.load(f)
+    if 'feed_version' not in store:
+        # Store written before the feed version was recorded
+        store = {'feed_version': None, 'indices': store}
+    fingerprints = store['indices']
+    if store['feed_version'] != FEED_VERSION:
+        for index_fingerprints in fingerprints.values():
+            for index, protocol_fingerprints in index_fingerprints.items():
+                index_fingerprints[index] = dict.fromkeys(
+                    protocol_fingerprints)
+    return fingerprints
+
+def save_fingerprints(period, fingerprints):
+
+    """ Save the fingerprint store of period atomically, together with
+        the FEED_VERSION.
+
+    """
+    store = {
+        'feed_version': FEED_VERSION,
+        'indices': fingerprints,
+    }
+    protocol_store.write_atomic(
+        fingerprints_filename(period),
+        json.dumps(store, sort_keys=True).encode('utf-8'))
+
+def delta_actions(protocol, index_name, old_fingerprints, delta=True,
+                  stats=None):
+
+    """ Return (actions, fingerprints) for the protocol, given the
+        {document ID: fingerprint} dictionary old_fingerprints of the
+        protocol's documents in the OS index index_name.
+
+        actions is the list of serialized bulk actions needed to update
+        the index: index actions for new and (with delta) only for changed
+        paragraphs and delete actions for documents of paragraphs which
+        no longer exist.  fingerprints is the dictionary of the protocol's
+        documents after running the actions.
+
+        The counts of new, changed, unchanged and deleted paragraphs are
+        added to stats, if given.
+
+    """
+    actions = []
+    fingerprints = {}
+    new = changed = unchanged = 0
+    for doc_id, data in bulk_insert_lines(protocol, index_name):
+        fingerprint = hashlib.sha256(data).hexdigest()
+        fingerprints[doc_id] = fingerprint
+        old_fingerprint = old_fingerprints.get(doc_id)
+        if old_fingerprint is None:
+            new += 1
+        elif old_fingerprint != fingerprint:
+            changed += 1
+        else:
+            unchanged += 1
+            if delta:
+                continue
+        actions.append(data)
+    deleted = sorted(old_fingerprints.keys() - fingerprints.keys())
+    for doc_id in deleted:
+        actions.append(serialize_bulk_action({
+            '_op_type': 'delete',
+            '_index': index_name,
+            '_id': doc_id,
+        }))
+    if stats is not None:
+        stats.add(new=new, changed=changed, unchanged=unchanged,
+                  deleted=len(deleted))
+    return actions, fingerprints
+
+def period_bulk_generator(period, indices, index_name, pending,
+                          fingerprints=None, delta=False, stats=None):
+
+    """ Generator for inserting the paragraphs of the protocols indices of
+        period into OS, using bulk_insert_lines().
+
+        Before generating the actions of a protocol, a [index, number of
+        actions, errors, fingerprints] entry is appended to the deque
+        pending, so that the caller can track which protocols were
+        completely sent.
+
+        If the fingerprint store of the period is given, the actions are
+        determined using delta_actions() and the entry holds the new
+        fingerprints of the protocol, otherwise None.
+
+    """
+    if fingerprints is not None:
+        index_fingerprints = fingerprints.get(index_name, {})
+    for index in indices:
+        protocol = load_json_protocol(period, index)
+        if fingerprints is None:
+            pending.append([index, len(protocol['content']), [], None])
+            for doc_id, data in bulk_insert_lines(protocol, index_name):
+                yield data
+            continue
+        actions, protocol_fingerprints = delta_actions(
+            protocol, index_name, index_fingerprints.get(str(index), {}),
+            delta, stats)
+        pending.append([index, len(actions), [], protocol_fingerprints])
+        yield from actions
+
+def feed_protocols(client, period, indices, os_index_name=INDEX_NAME,
+                   stats=None, fingerprints=None, delta=False,
+                   **bulk_options):
+
+    """ Load the paragraphs of the protocols indices of period into OS,
+        streaming them through a single bulk pipeline using client.
+
+        Yields (index, errors) for each protocol once all its paragraphs
+        were processed by OS; errors is the list of failed bulk items.
+
+        If the fingerprint store of the period is given, paragraphs which
+        no longer exist are deleted from OS and, with delta, unchanged
+        paragraphs are not sent.  The store is updated for the protocols
+        loaded without errors.
+
+        stats and bulk_options are passed to parallel_bulk().
+
+    """
+    if stats is None:
+        stats = BulkStats()
+    pending = collections.deque()
+
+    def finished_protocols():
+        while pending and pending[0][1] == 0:
+            index, count, errors, protocol_fingerprints = pending.popleft()
+            if protocol_fingerprints is not None and not errors:
+                fingerprints.setdefault(os_index_name, {})[str(index)] = (
+                    protocol_fingerprints)
+            yield index, errors
+
+    for ok, item in parallel_bulk(
+            client,
+            period_bulk_generator(period, indices, os_index_name, pending,
+                                  fingerprints, delta, stats),
+            stats,
+            **bulk_options):
+        if verbose > 1:
+            print (f'Result from OS insert: {item}')
+        # Protocols without actions don't get results
+        yield from finished_protocols()
+        pending[0][1] -= 1
+        if not ok:
+            pending[0][2].append(item)
+        yield from finished_protocols()
+    yield from finished_protocols()
+
+def process_protocol(period, index, os_index_name=INDEX_NAME, client=None,
+                     **bulk_options):
 
     """ Load paragraphs of protocol period-index into OS
 
@@ -132,39 +666,281 @@ def process_protocol(period, index, os_index_name=INDEX_NAME):
         using p-<period>-<index>-<flow_index>, so that repeated loads
         will create new versions in OS.
 
+        client defaults to the shared_client() of the process.  See
+        parallel_bulk() for the bulk_options.
+
+    """
+    if client is None:
+        client = shared_client()
+    setup_index_template(client, os_index_name)
+    for index, errors in feed_protocols(client, period, [index],
+                                        os_index_name, **bulk_options):
+        if errors:
+            raise opensearchpy.helpers.BulkIndexError(
+                f'{len(errors)} document(s) failed to index.', errors)
+
+def process_period(period, force=False, indices=None,
+                   os_index_name=INDEX_NAME, bulk_load=False, delta=False,
+                   **bulk_options):
+
+    """ Load all protocols of period into OS, which are outdated according
+        to the build manifest (or all of them, if force is true).
+
+        indices defaults to all downloaded protocols of the period.  All
+        protocols are fed through one client and bulk pipeline, see
+        parallel_bulk() for the bulk_options.  With bulk_load, the index
+        uses bulk_load_settings() while loading.
+
+        The fingerprint store of the period keeps track of the documents
+        in OS, so that documents of removed paragraphs are deleted.  With
+        delta, only new and changed paragraphs are sent.
+
+        Returns the list of protocol indices which failed to load.
+
+    """
+    manifest = build_manifest.load_manifest(period)
+    if indices is None:
+        indices = build_manifest.period_indices(period)
+    if not force:
+        indices = build_manifest.outdated_protocols(
+            manifest, 'feed', period, indices, FEED_VERSION)
+    if not indices:
+        return []
+    print (f'Feeding {len(indices)} protocols of period {period} '
+           f'to OpenSearch')
+    failed = []
+    stats = BulkStats()
+    fingerprints = load_fingerprints(period)
+    fed = 0
+    with contextlib.ExitStack() as stack:
+        client = stack.enter_context(opensearch_client())
+        setup_index_template(client, os_index_name)
+        if bulk_load:
+            stack.enter_context(bulk_load_settings(client, os_index_name))
+        try:
+            for index, errors in feed_protocols(client, period, indices,
+                                                os_index_name, stats,
+                                                fingerprints, delta,
+                                                **bulk_options):
+                if errors:
+                    print (f'ERROR: {len(errors)} paragraphs of protocol '
+                           f'{period}-{index} failed to load')
+                    failed.append(index)
+                    continue
+                if verbose:
+                    print (f'Fed protocol {period}-{index}')
+                build_manifest.record_protocol(
+                    manifest, 'feed', period, index, FEED_VERSION)
+                fed += 1
+                if fed % CHECKPOINT_INTERVAL == 0:
+                    save_fingerprints(period, fingerprints)
+                    build_manifest.save_manifest(period, manifest)
+        finally:
+            # The fingerprints have to be saved first, so that the manifest
+            # never records protocols missing in the store
+            save_fingerprints(period, fingerprints)
+            build_manifest.save_manifest(period, manifest)
+    stats.report()
+    return failed
+
+def write_bulk_file(filename, lines):
+
+    """ Write the iterable of serialized bulk actions lines to the gzip
+        compressed NDJSON file filename.
+
+        The file is written to a temporary file first, so that readers
+        never see partial files.  Returns the number of actions written.
+
+    """
+    dirname, basename = os.path.split(filename)
+    fd, temp_filename = tempfile.mkstemp(
+        dir=dirname or '.', prefix='.' + basename + '.',
+        suffix=protocol_store.TEMP_SUFFIX)
+    count = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            with gzip.GzipFile(fileobj=f, mode='wb', mtime=0) as gz:
+                for data in lines:
+                    gz.write(data)
+                    count += 1
+        os.replace(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+    return count
+
+def read_bulk_file(filename):
+
+    """ Generator reading the serialized bulk actions from the gzip
+        compressed NDJSON file filename, as written by write_bulk_file().
+
     """
-    with opensearch_client() as client:
+    with gzip.open(filename, 'rb') as f:
+        for line in f:
+            if line.startswith(b'{"delete"'):
+                # Deletes have no source line
+                yield line
+            else:
+                yield line + next(f)
+
+def export_period(period, indices=None, dirname=BULK_EXPORT_DIR,
+                  os_index_name=INDEX_NAME, per_period=False):
+
+    """ Export the bulk actions for loading the protocols indices of period
+        (default: all downloaded protocols) into OS as gzip compressed
+        NDJSON files in dirname.
+
+        One file per protocol is written, or one file for the whole
+        period if per_period is true.  This doesn't need an OS cluster;
+        the files can be loaded using replay_bulk_files().
+
+        Returns the list of written file names.
+
+    """
+    if indices is None:
+        indices = build_manifest.period_indices(period)
+    os.makedirs(dirname, exist_ok=True)
+
+    def protocol_lines(index):
         protocol = load_json_protocol(period, index)
-        # Create/update an index template for the index, which provides the
-        # mappings to be used for the index
-        client.indices.put_template(
-            name=os_index_name,
-            body=INDEX_TEMPLATE,
-        )
-        for result in opensearchpy.helpers.streaming_bulk(
-                client,
-                bulk_insert_generator(protocol, index_name=os_index_name),
-            ):
-            if verbose > 1:
-                print (f'Result from OS insert: {result}')
+        for doc_id, data in bulk_insert_lines(protocol, os_index_name):
+            yield data
+
+    if per_period:
+        filename = os.path.join(dirname, BULK_PERIOD_FILE_TEMPLATE % period)
+        count = write_bulk_file(
+            filename,
+            (data for index in indices for data in protocol_lines(index)))
+        print (f'Exported {count} documents of period {period} '
+               f'to {filename}')
+        return [filename]
+    filenames = []
+    for index in indices:
+        filename = os.path.join(
+            dirname, BULK_FILE_TEMPLATE % (period, index))
+        count = write_bulk_file(filename, protocol_lines(index))
+        if verbose:
+            print (f'Exported {count} documents of protocol '
+                   f'{period}-{index} to {filename}')
+        filenames.append(filename)
+    print (f'Exported {len(indices)} protocols of period {period} '
+           f'to {dirname}')
+    return filenames
+
+def replay_bulk_files(client, filenames, stats=None, **bulk_options):
+
+    """ Load the bulk files filenames written by export_period() into OS
+        using client.
+
+        The actions are sent as stored, so no JSON processing is needed.
+        See parallel_bulk() for stats and the bulk_options.
+
+        Returns the list of failed bulk items.
+
+    """
+    def actions():
+        for filename in filenames:
+            if verbose:
+                print (f'Replaying {filename}')
+            yield from read_bulk_file(filename)
+
+    return [item
+            for ok, item in parallel_bulk(client, actions(), stats,
+                                          **bulk_options)
+            if not ok]
 
 def main():
 
-    period = int(sys.argv[1])
-    if len(sys.argv) > 2:
+    """ Command line interface:
+
+        feed_opensearch.py [--force] [--delta] [--bulk-load] [--workers N]
+                           [--chunk-docs N] [--chunk-bytes N]
+                           <period> [<index>]
+        feed_opensearch.py --export [--per-period] [--output-dir DIR]
+                           <period> [<index>]
+        feed_opensearch.py --replay [--bulk-load] [--workers N]
+                           [--chunk-docs N] [--chunk-bytes N] <file> ...
+
+        Loads all protocols of the period or just the one with index into
+        OpenSearch.  Protocols which were already loaded according to the
+        build manifest are skipped, unless --force is given.  The bulk
+        requests are sent by N parallel workers.
+
+        With --delta, only new and changed paragraphs of the protocols
+        are sent.  Paragraphs removed from protocols are always deleted
+        from OpenSearch when feeding a period.
+
+        --bulk-load disables refreshes and replicas of the index while
+        loading a period, which speeds up large backfills.  The index
+        should not be used for searching meanwhile.
+
+        --export writes the bulk requests for the protocols to gzip
+        compressed NDJSON files per protocol (or per period) instead,
+        which --replay loads into OpenSearch without further processing.
+
+    """
+    parser = argparse.ArgumentParser(
+        description='Load parsed NRW Landtag protocols into OpenSearch')
+    parser.add_argument('args', nargs='+', metavar='period|file',
+                        help='period [index] or bulk files for --replay')
+    parser.add_argument('--force', action='store_true',
+                        help='load protocols even if up to date')
+    parser.add_argument('--delta', action='store_true',
+                        help='only send new and changed paragraphs')
+    parser.add_argument('--bulk-load', action='store_true',
+                        help='disable refreshes and replicas while loading')
+    parser.add_argument('--workers', type=int, default=BULK_WORKERS,
+                        help='number of parallel bulk requests')
+    parser.add_argument('--chunk-docs', type=int, default=BULK_CHUNK_DOCS,
+                        help='max. number of documents per bulk request')
+    parser.add_argument('--chunk-bytes', type=int, default=BULK_CHUNK_BYTES,
+                        help='max. size of a bulk request in bytes')
+    parser.add_argument('--export', action='store_true',
+                        help='write bulk files instead of loading')
+    parser.add_argument('--per-period', action='store_true',
+                        help='export one bulk file per period')
+    parser.add_argument('--output-dir', default=BULK_EXPORT_DIR,
+                        help='directory for exported bulk files')
+    parser.add_argument('--replay', action='store_true',
+                        help='load exported bulk files')
+    args = parser.parse_args()
+    bulk_options = dict(
+        workers=args.workers,
+        max_in_flight=max(BULK_MAX_IN_FLIGHT, 2 * args.workers),
+        chunk_docs=args.chunk_docs,
+        chunk_bytes=args.chunk_bytes,
+    )
+
+    if args.replay:
+        stats = BulkStats()
+        with contextlib.ExitStack() as stack:
+            client = stack.enter_context(opensearch_client())
+            setup_index_template(client)
+            if args.bulk_load:
+                stack.enter_context(bulk_load_settings(client))
+            failed = replay_bulk_files(client, args.args, stats,
+                                       **bulk_options)
+        stats.report()
+        if failed:
+            sys.exit(1)
+        return
+
+    if len(args.args) > 2:
+        parser.error('expected <period> [<index>]')
+    period = int(args.args[0])
+    index = int(args.args[1]) if len(args.args) > 1 else None
+    if args.export:
+        export_period(period, None if index is None else [index],
+                      dirname=args.output_dir, per_period=args.per_period)
+    elif index is not None:
         # Process just one protocl
-        index = int(sys.argv[2])
-        process_protocol(period, index)
+        process_protocol(period, index, **bulk_options)
     else:
         # Process all available documents
-        data = load_data.load_period_data(period)
-        for filename, protocol in sorted(data.items()):
-            if os.path.splitext(filename)[1] != '.html':
-                continue
-            index = protocol['index']
-            print ('-' * 72)
-            print (f'Feeding protocol {period}-{index} to OpenSearch')
-            process_protocol(period, index)
+        process_period(period, force=args.force,
+                       bulk_load=args.bulk_load, delta=args.delta,
+                       **bulk_options)
 
 ###
 
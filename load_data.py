@@ -9,17 +9,30 @@
 """
 import sys
 import os
+import argparse
+import collections
+import hashlib
+import concurrent.futures
+import threading
 import urllib.parse
 import requests
+import requests.adapters
 import sys
 import json
 
+import protocol_store
+from protocol_store import write_atomic, TEMP_SUFFIX
 from settings import (
     BASE_URL,
     PROTOCOL_DIR,
     PROTOCOL_FILE_TEMPLATE,
     PERIOD_FILE_TEMPLATE,
+    DISCOVERY_FILE_TEMPLATE,
+    CHECKPOINT_INTERVAL,
     MAX_FAILURES,
+    DOWNLOAD_WORKERS,
+    MAX_HOST_CONNECTIONS,
+    DISCOVERY_LOOKAHEAD,
     )
 
 ### Globals
@@ -27,6 +40,13 @@ from settings import (
 # Verbosity
 verbose = 0
 
+# Period data key, which held the discovery state in former versions
+LEGACY_DISCOVERY_KEY = 'discovery'
+
+# Semaphores limiting the number of concurrent requests per host
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
 ###
 
 def protocol_url(period, index, extension='html'):
@@ -50,19 +70,266 @@ def load_period_data(period):
     if not os.path.exists(filename):
         return {}
     with open(filename, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        data = json.load(f)
+    # Drop the discovery state stored by former versions, so that the
+    # period data only holds file entries; the discovery starts over
+    data.pop(LEGACY_DISCOVERY_KEY, None)
+    return data
 
 def save_period_data(period, data):
 
     """ Save the period data to a JSON file
 
+        The file is replaced atomically, so it can be used for
+        checkpointing long running downloads.
+
     """
     filename = os.path.join(PROTOCOL_DIR, PERIOD_FILE_TEMPLATE % period)
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f)
+    write_atomic(filename, json.dumps(data).encode('utf-8'))
+
+def load_discovery_data(period):
+
+    """ Load the discovery state of the period: a dictionary mapping the
+        extensions to the last protocol index found.
+
+        If the file does not exist an empty dictionary is returned.
+
+    """
+    filename = os.path.join(PROTOCOL_DIR, DISCOVERY_FILE_TEMPLATE % period)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_discovery_data(period, discovered):
+
+    """ Save the discovery state of the period to a JSON file
+
+    """
+    filename = os.path.join(PROTOCOL_DIR, DISCOVERY_FILE_TEMPLATE % period)
+    write_atomic(filename, json.dumps(discovered).encode('utf-8'))
+
+def rebuild_period_data(period, data=None,
+                        extensions=('html', 'pdf', 'docx', 'doc')):
+
+    """ Rebuild the period data from the protocol files found on disk.
+
+        This is used to resume downloads after a crash: files which are
+        not yet in data get an entry with their size and hash (their
+        HTTP validators are not known).  Files whose size or hash does
+        not match their entry in data lose the entry, so that they are
+        downloaded again.  Left-over temporary files are removed.
+
+        Returns the updated data and updates data parameter dictionary
+        in-place, if given.
+
+    """
+    if data is None:
+        data = {}
+    for name in os.listdir(PROTOCOL_DIR):
+        if name.startswith('.') and name.endswith(TEMP_SUFFIX):
+            os.remove(os.path.join(PROTOCOL_DIR, name))
+    for name in protocol_store.listdir(PROTOCOL_DIR):
+        filename = os.path.join(PROTOCOL_DIR, name)
+        match = protocol_store.PROTOCOL_FILE_RE.match(name)
+        if match is None:
+            # Period output files, e.g. of the tagger stage
+            continue
+        file_period, index, extension = match.groups()
+        if int(file_period) != period or extension not in extensions:
+            continue
+        content = protocol_store.read(filename)
+        size = len(content)
+        sha256 = content_hash(content)
+        entry = data.get(filename)
+        if entry is not None:
+            if (entry.get('size', size) != size or
+                entry.get('sha256', sha256) != sha256):
+                print (f' Protocol file {filename} does not match '
+                       f'the period data')
+                del data[filename]
+            else:
+                entry['size'] = size
+                entry['sha256'] = sha256
+            continue
+        index = int(index)
+        data[filename] = {
+            'period': period,
+            'index': index,
+            'url': protocol_url(period, index, extension),
+            'etag': None,
+            'last_modified': None,
+            'size': size,
+            'sha256': sha256,
+            'changed': True,
+            }
+    return data
+
+def http_session(pool_size=MAX_HOST_CONNECTIONS):
+
+    """ Create a requests session using a pool of keep-alive connections.
+
+        pool_size determines the number of connections kept open per
+        host.  The session can be shared by several download threads.
+
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def host_slot(url, max_connections=MAX_HOST_CONNECTIONS):
+
+    """ Return the semaphore limiting concurrent requests to the host of
+        url to max_connections.
+
+    """
+    key = (urllib.parse.urlsplit(url).netloc, max_connections)
+    with _host_slots_lock:
+        slot = _host_slots.get(key)
+        if slot is None:
+            slot = threading.BoundedSemaphore(max_connections)
+            _host_slots[key] = slot
+    return slot
+
+def fetch_url(session, url, max_connections=MAX_HOST_CONNECTIONS,
+              headers=None):
+
+    """ Fetch url using session and return the response.
+
+        At most max_connections requests are run against the same host at
+        any time.  headers are passed on to the request, if given.
+
+    """
+    with host_slot(url, max_connections):
+        return session.get(url, allow_redirects=True, headers=headers)
+
+def protocol_exists(session, url, max_connections=MAX_HOST_CONNECTIONS):
+
+    """ Return True, if the document at url exists.
+
+        A HEAD request is used, falling back to a streamed GET (without
+        reading the body) for servers which don't support HEAD.
+
+    """
+    with host_slot(url, max_connections):
+        response = session.head(url, allow_redirects=True)
+        if response.status_code in (405, 501):
+            response = session.get(url, allow_redirects=True, stream=True)
+            response.close()
+    if verbose:
+        print (f' Probed {url}: {response.status_code}')
+    return response.status_code == 200
+
+def discover_last_index(period, extension='html', start=0,
+                        max_document=300, session=None,
+                        max_connections=MAX_HOST_CONNECTIONS,
+                        lookahead=DISCOVERY_LOOKAHEAD):
+
+    """ Find the highest protocol index available for extension in the
+        given period.
+
+        start is an index known to exist (e.g. from a previous run), 0
+        if not known.  The search probes start + 1, 2, 4, ... until a
+        missing index is found and then bisects the remaining interval.
+        Since single protocols may be missing, lookahead indices beyond
+        the result are checked as well before accepting it.  Indices
+        at or above max_document are not probed.
+
+        Returns 0 in case no protocol could be found.
+
+    """
+    if session is None:
+        session = http_session(max_connections)
+
+    def exists(index):
+        if index >= max_document:
+            return False
+        url = protocol_url(period, index, extension)
+        return protocol_exists(session, url, max_connections)
+
+    last = start
+    while True:
+        # Exponential probing
+        step = 1
+        while exists(last + step):
+            last += step
+            step *= 2
+        missing = last + step
+
+        # Binary search in between
+        while missing - last > 1:
+            middle = (last + missing) // 2
+            if exists(middle):
+                last = middle
+            else:
+                missing = middle
+
+        # Check for gaps
+        for index in range(missing + 1, missing + 1 + lookahead):
+            if exists(index):
+                last = index
+                break
+        else:
+            return last
+
+def content_hash(content):
+
+    """ Return the SHA-256 hex digest of the bytes content.
+
+    """
+    return hashlib.sha256(content).hexdigest()
+
+def file_hash(filename):
+
+    """ Return the SHA-256 hex digest of the stored file filename.
+
+    """
+    return content_hash(protocol_store.read(filename))
+
+def conditional_headers(entry):
+
+    """ Return the conditional request headers for a manifest entry.
+
+        Entries without validators result in an empty dictionary, so that
+        the file is downloaded again.
+
+    """
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def protocol_entry(period, index, url, response):
+
+    """ Create the manifest entry for a downloaded protocol.
+
+        Besides the protocol location, the entry stores the HTTP
+        validators (ETag, Last-Modified), the byte size and the SHA-256
+        hash of the content.
+
+    """
+    content = response.content
+    return {
+        'period': period,
+        'index': index,
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'size': len(content),
+        'sha256': content_hash(content),
+        }
 
 def download_period(period, max_document=300,
-                    data=None, extensions=('html', 'pdf', 'docx', 'doc')):
+                    data=None, extensions=('html', 'pdf', 'docx', 'doc'),
+                    workers=1, max_connections=MAX_HOST_CONNECTIONS,
+                    session=None, refresh=False, discover=False,
+                    checkpoint=None):
 
     """ Download all protocol documents in the given period.
 
@@ -70,63 +337,193 @@ def download_period(period, max_document=300,
         tried per default, giving a complete picture of the available
         formats, but it's possible to limit this to a subset.
 
+        Up to workers downloads are run in parallel threads, sharing the
+        keep-alive connections of session (a new one is created, if not
+        given) and using at most max_connections connections per host.
+        Responses are processed in index order, so that the end of the
+        period is detected after MAX_FAILURES consecutive failures, just
+        like for sequential downloads.
+
+        Files which were already downloaded are skipped, unless refresh is
+        true.  In that case, they are requested again using conditional
+        GETs, so that unchanged files only cost a 304 response.  New and
+        changed files get their manifest entry flagged with 'changed' for
+        downstream re-parsing.
+
+        If discover is true, the last available index is determined per
+        extension using discover_last_index() first, starting from the
+        result of a previous run (see load_discovery_data()).  Only the
+        missing indices up to that one are then requested.
+
+        If checkpoint is given, the period data is saved after every
+        checkpoint downloaded files.
+
         Returns the downloaded data as dictionary and updates data
         parameter dictionary in-place, if given.
 
     """
     if data is None:
         data = {}
-    for extension in extensions:
-        print (f'Downloading {extension} files for period {period}')
-        failures = 0
-        for i in range(1, max_document):
-            filename = os.path.join(
-                PROTOCOL_DIR,
-                PROTOCOL_FILE_TEMPLATE % (period, i, extension))
-            if os.path.exists(filename) and filename in data:
-                # No need to download the file again
-                continue
-            url = protocol_url(period, i, extension)
-            if verbose:
-                print (f'Working on protocol {i}')
-            response = requests.get(url, allow_redirects=True)
-            if response.status_code != 200:
-                failures += 1
-                if failures == 1 or verbose:
-                    print (f' Could not download protocol {url}: '
-                           f'{response.status_code}')
-                if failures > MAX_FAILURES:
-                    print (f' No additional files found.')
-                    break
-                continue
+    if session is None:
+        session = http_session(max_connections)
+    # Number of requests to have in flight at any time
+    window = max(workers, 1) * 2
+    downloaded = 0
+    with concurrent.futures.ThreadPoolExecutor(max(workers, 1)) as executor:
+        for extension in extensions:
+            print (f'Downloading {extension} files for period {period}')
+            failures = 0
+            unchanged = 0
+            pending = collections.deque()
+            if discover:
+                discovered = load_discovery_data(period)
+                last = discover_last_index(
+                    period, extension,
+                    start=discovered.get(extension, 0),
+                    max_document=max_document,
+                    session=session,
+                    max_connections=max_connections)
+                print (f' Last available {extension} protocol: {last}')
+                discovered[extension] = last
+                save_discovery_data(period, discovered)
+                indices = iter(range(1, last + 1))
+                # All indices are expected to exist
+                max_failures = None
             else:
-                failures = 0
-            with open(filename, 'wb') as f:
-                f.write(response.content)
-            data[filename] = {
-                'period': period,
-                'index': i,
-                'url': url,
-                }
+                indices = iter(range(1, max_document))
+                max_failures = MAX_FAILURES
+            while True:
+                # Queue up the next requests
+                for i in indices:
+                    filename = os.path.join(
+                        PROTOCOL_DIR,
+                        PROTOCOL_FILE_TEMPLATE % (period, i, extension))
+                    headers = None
+                    if filename in data and protocol_store.exists(filename):
+                        if not refresh:
+                            # No need to download the file again
+                            continue
+                        headers = conditional_headers(data[filename])
+                    url = protocol_url(period, i, extension)
+                    future = executor.submit(
+                        fetch_url, session, url, max_connections, headers)
+                    pending.append((i, filename, url, future))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+
+                # Process the responses in index order
+                i, filename, url, future = pending.popleft()
+                if verbose:
+                    print (f'Working on protocol {i}')
+                response = future.result()
+                if response.status_code == 304:
+                    # Protocol was not changed
+                    failures = 0
+                    unchanged += 1
+                    continue
+                elif response.status_code != 200:
+                    failures += 1
+                    if failures == 1 or verbose:
+                        print (f' Could not download protocol {url}: '
+                               f'{response.status_code}')
+                    if max_failures is not None and failures > max_failures:
+                        print (f' No additional files found.')
+                        break
+                    continue
+                else:
+                    failures = 0
+                entry = protocol_entry(period, i, url, response)
+                old_entry = data.get(filename)
+                if (old_entry is not None and
+                    protocol_store.exists(filename)):
+                    old_hash = old_entry.get('sha256') or file_hash(filename)
+                    if old_hash == entry['sha256']:
+                        # Server does not support conditional GETs, but the
+                        # content is the same
+                        entry['changed'] = old_entry.get('changed', False)
+                        data[filename] = entry
+                        unchanged += 1
+                        continue
+                    print (f' Protocol {url} was changed')
+                entry['changed'] = True
+                protocol_store.write(filename, response.content)
+                data[filename] = entry
+                downloaded += 1
+                if checkpoint and downloaded % checkpoint == 0:
+                    save_period_data(period, data)
+
+            # Drop requests queued beyond the end of the period
+            for i, filename, url, future in pending:
+                future.cancel()
+            if refresh:
+                print (f' {unchanged} {extension} files unchanged')
     return data
 
+def changed_protocols(data, extension='html'):
+
+    """ Return the sorted list of (filename, entry) tuples of all protocols
+        in data which are flagged as changed.
+
+        Only files with the given extension are returned.
+
+    """
+    return [
+        (filename, entry)
+        for filename, entry in sorted(data.items())
+        if (entry.get('changed') and
+            os.path.splitext(filename)[1] == '.' + extension)
+        ]
+
 def main():
 
     """ Command line interface:
 
-        load_data.py <period> [<max_document>]
+        load_data.py [--workers N] [--max-connections N] [--refresh]
+                     [--discover] [--resume] [--checkpoint N]
+                     <period> [<max_document>]
 
         Loads all documents in the given period, up to index max_document.
+        With --refresh, already downloaded documents are checked for
+        updates as well.  With --discover, the last available document
+        is looked up first and only the missing ones are requested.
+        The period data is saved every --checkpoint documents and on
+        exit.  With --resume, it is rebuilt from the documents on disk
+        first, e.g. after a crash.
 
     """
-    period = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        max_document = int(sys.argv[2])
-    else:
-        max_document = 300
-    data = load_period_data(period)
-    data = download_period(period, max_document, data=data)
-    save_period_data(period, data)
+    parser = argparse.ArgumentParser(
+        description='Load NRW Landtag protocols of a period')
+    parser.add_argument('period', type=int)
+    parser.add_argument('max_document', type=int, nargs='?', default=300)
+    parser.add_argument('-w', '--workers', type=int, default=DOWNLOAD_WORKERS,
+                        help='number of parallel downloads')
+    parser.add_argument('--max-connections', type=int,
+                        default=MAX_HOST_CONNECTIONS,
+                        help='max. number of concurrent requests per host')
+    parser.add_argument('--refresh', action='store_true',
+                        help='check downloaded documents for updates')
+    parser.add_argument('--discover', action='store_true',
+                        help='probe for the last available document first')
+    parser.add_argument('--resume', action='store_true',
+                        help='rebuild period data from the documents on disk')
+    parser.add_argument('--checkpoint', type=int, default=CHECKPOINT_INTERVAL,
+                        help='save period data every N documents')
+    args = parser.parse_args()
+
+    data = load_period_data(args.period)
+    if args.resume:
+        rebuild_period_data(args.period, data)
+    try:
+        download_period(args.period, args.max_document, data=data,
+                        workers=args.workers,
+                        max_connections=args.max_connections,
+                        refresh=args.refresh,
+                        discover=args.discover,
+                        checkpoint=args.checkpoint)
+    finally:
+        save_period_data(args.period, data)
 
 ###
 
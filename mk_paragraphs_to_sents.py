@@ -24,6 +24,7 @@ inventory:
     - reduce_entry_to_name(speaker: str, speaker_list: list) -> list
     - generate_agenda_topics_and_speaker_list(meta_session: tuple) -> dict
     - collect_speech_indices(session: namedtuple) -> list
+    - paragraphs_by_flow_index(paragraphs: list) -> dict
     - fill_indices_w_text(session: namedtuple, speeches: list) -> list
     - role_of_speaker(paragraph: dict) -> str
     - update_speech(sentences: list, meta: tuple) -> namedtuple
@@ -31,23 +32,43 @@ inventory:
 
 
 """
-import json
 import os
 import sys
+import time
+import logging
+import argparse
+import concurrent.futures
 
 from collections import namedtuple
-from nltk.tokenize import sent_tokenize
+from typing import Callable, Iterable, Iterator
 
 from load_data import load_period_data
-from agenda_and_speaker_list import mk_agenda_list_w_speakers
-from visualize_agenda_and_speakers import mk_notified_speaker_list
+import batch
+import build_manifest
+from agenda_and_speaker_list import AGENDA_VERSION, mk_agenda_list_w_speakers
+from speech_segmentation import is_speech, segment_speeches
+import protocol_store
 from settings import (
     PROTOCOL_DIR,
     PROTOCOL_FILE_TEMPLATE,
     NLTK_DIR,
+    CHECKPOINT_INTERVAL,
     )
 
 
+# Version of the sentence building; increase when changing the output, so
+# that build_manifest.py triggers a rebuild of the NLTK files
+SENTENCES_VERSION = 1
+
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
+
+logger = logging.getLogger(__name__)
+
+# German Punkt sentence tokenizer, loaded on first use by sent_tokenizer()
+_sent_tokenizer = None
+
+
 class DataMismatchError(BaseException):
     """
     Exception raised if period and index of protocol does not match period and
@@ -61,36 +82,41 @@ class DataMismatchError(BaseException):
         self.message = message
 
 
-def load_json_file(period: str, index: str) -> dict:
+def load_json_file(period: str, index: str,
+                   interactive: bool = True) -> dict:
     """
     Marc's loading function using a template.
+    With interactive=False, a stale agenda is rebuilt without waiting for
+    user input, as in batch mode.
     """
     json_filename = os.path.join(
         PROTOCOL_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        data = json.load(json_file)
+    data = protocol_store.load_json(json_filename)
 
     passed = True
     for key, val in data.items():
         # check that we have the requested protocol
         if key == "protocol_period":
             if str(val) != str(period):
-                print(val, period)
+                logger.warning(f"{json_filename}: period {val} != {period}")
                 passed = False
         elif key == "protocol_index":
             if str(val) != str(index):
-                print(val, index)
+                logger.warning(f"{json_filename}: index {val} != {index}")
                 passed = False
 
     if not passed:
         message = f"Could not collect date and protocol_no for {json_filename}"
         DataMismatchError(message)
     else:
-        # add agenda of a session with topics and speaker lineup
-        agenda = mk_agenda_list_w_speakers(period, index)
-        data["agenda"] = agenda
+        # add agenda of a session with topics and speaker lineup, unless
+        # already stored by parse_data.py using the current agenda rules
+        if data.get("agenda_version") != AGENDA_VERSION:
+            data["agenda"] = mk_agenda_list_w_speakers(
+                period, index,
+                interactive=interactive and batch.can_prompt(batch_mode))
 
         return data
 
@@ -243,165 +269,38 @@ def generate_agenda_topics_and_speaker_list(meta_session: tuple) -> dict:
     return agenda
 
 
-def update_speeches(speech: dict,
-                    speeches: list,
-                    flow_indices: str,
-                    current_speaker: str,
-                    current_topic) -> list:
-
-    speech[current_speaker] = flow_indices
-    speech["topic"] = current_topic
-    speeches.append(speech)
-
-    return speeches
-
-
-def speaker_is_in_current_lineup(speaker: str, agenda: dict, topic) -> bool:
-    for name in agenda[topic]:
-        if speaker in name:
-            return True
-    return False
-
-
 def collect_speech_indices(paragraphs: list, agenda: dict) -> list:
     """
     Aim of collect_speech_indices is to collect all and only those indices of
     the paragraphs that are part of a speech.
     Interruptions like applause or questions are edited out.
-    Using the speaker_list from agenda is needed to recognize if a paragraph
-    is part of a speech or just a question coming from another member of
-    parliament.
-    This also allows to assign each speaker and his/her speech to its topic.
+    The speeches are segmented by speech_segmentation.segment_speeches();
+    a speech still running at the end of the session is dropped.
+    Returns a list of dicts mapping the speaker to the flow indices of the
+    speech and "topic" to its topic.
     """
-    # initialize ######################
-    speech = {}
     speeches = []
-    flow_indices = []
-    speakers = mk_notified_speaker_list(agenda)
-    first_topic = speakers[0]
-    next_topic = first_topic.split(" ;;; ")[-1]
-    current_topic = next_topic  # current topic is both first and next topic
-    end_of_session = False
-
-    current_speaker = None  # first speaker will be "next" speaker in list
-    speakers = speakers[1:]  # first entry was first topic
-
-    # if topic without speakers
-    if len(speakers) > 0:
-        next_listed_speaker = speakers[0]
-    else:
-        next_listed_speaker = None
-
-    # end of initialization ###########
-
-    for paragraph in paragraphs:
-        flow_index = paragraph['flow_index']
-        speaker = paragraph['speaker_name']
-        if current_speaker and speaker in current_speaker:
-            # same speaker for same topic
-            flow_indices.append(flow_index)
-            end_of_session = False
-        elif current_topic != next_topic:
-            if next_listed_speaker and speaker in next_listed_speaker:
-                # first speaker for new topic
-                # save the indices of last speaker
-                speeches = update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
-
-                # reset
-                flow_indices = []
-                speech = {}
-
-                flow_indices.append(flow_index)
-                current_topic = next_topic
-                current_speaker = next_listed_speaker
-                # speech[current_speaker] = []
-                speakers = speakers[1:]
-                if speakers:
-                    next_listed_speaker = speakers[0]
-                else:
-                    next_listed_speaker = None
-            elif next_topic and next_listed_speaker is None:
-                if paragraph['speaker_is_chair']:
-                    end_of_session = True
-                elif speaker and speaker != current_speaker:
-                    # interposing question
-                    end_of_session = True
-                else:
-                    end_of_session = True
-            elif not next_topic and not next_listed_speaker and paragraph['speaker_is_chair']:  # noqa
-                end_of_session = True
-        elif next_listed_speaker and speaker in next_listed_speaker:
-            # new speaker for same topic
-            # save the indices of last speaker - for the first speaker there
-            # is no current_speaker, so this needs to be caught with "if"
-            if current_speaker:
-                speeches = update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
-
-            # reset
-            flow_indices = []
-            speech = {}
-
-            current_speaker = next_listed_speaker
-            flow_indices.append(flow_index)
-            speakers = speakers[1:]
-            if speakers:
-                next_listed_speaker = speakers[0]
-                if "new topic" in next_listed_speaker:
-                    next_topic = next_listed_speaker.split(" ;;; ")[-1]
-                    speakers = speakers[1:]
-                    if speakers:
-                        next_listed_speaker = speakers[0]
-                    else:
-                        next_listed_speaker = None
-            else:
-                next_listed_speaker = None
-                next_topic = None
-        elif next_listed_speaker and speaker not in next_listed_speaker:
-            if speaker_is_in_current_lineup(speaker, agenda, current_topic):
-                # weed out questions w function "is_speech"
-                if is_speech(paragraph):
-                    text = paragraph["speech"]
-                    if is_not_interposed_question(text):
-                        speeches = update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
-                        # reset
-                        flow_indices = []
-                        speech = {}
-
-                        current_speaker = speaker
-                        flow_indices.append(flow_index)
-
-    if end_of_session:
-        speeches = update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
+    for span in segment_speeches(paragraphs, agenda):
+        if span.complete:
+            speeches.append({span.speaker: span.flow_indices,
+                             "topic": span.topic})
 
     return speeches
 
 
-def is_not_interposed_question(text: str) -> bool:
+def paragraphs_by_flow_index(paragraphs: list) -> dict:
     """
-    To make sure that it's indeed a speech and not a question, a counter adds
-    the occurences of speech elements like addressing the chair, the colleagues
-    or the audience and lowering the weight if the text passage ends with a
-    question mark.
+    Return a dict mapping the flow indices to the paragraphs (the first one,
+    if a flow index should occur more than once).
     """
-    counter = 0
-    if text.endswith("?"):
-        counter -= 1
-    text = text.split()
-    for i, word in enumerate(text):
-        if "Herren!" in word:
-            counter += 1
-        elif "räsident" in word:
-            counter += 1
-        elif "Kolleginnen" in word:
-            counter += 1
-
-    if counter > 1:
-        return True
-    return False
+    flow_index_map = {}
+    for paragraph in paragraphs:
+        flow_index_map.setdefault(paragraph['flow_index'], paragraph)
+    return flow_index_map
 
 
 def fill_indices_w_text(session: namedtuple, speeches: list) -> list:
-    paragraphs = session.content
+    paragraphs = paragraphs_by_flow_index(session.content)
     updated_speech = {}
     updated_speeches = []
     token_speech = False
@@ -417,20 +316,18 @@ def fill_indices_w_text(session: namedtuple, speeches: list) -> list:
             else:
                 token_speech = True
                 indices = val
-                text = ""
+                texts = []
                 for index in indices:
-                    paragraph = [p for p in paragraphs if p['flow_index'] == index][0]  # noqa
+                    paragraph = paragraphs[index]
                     if is_speech(paragraph):
-                        speech = paragraph['speech']
-                        text = text + speech + ' '
+                        texts.append(paragraph['speech'])
                     elif is_citation(paragraph):
-                        speech = paragraph['citation']
-                        text = text + speech + ' '
+                        texts.append(paragraph['citation'])
                 updated_speech["speaker"] = paragraph["speaker_name"]
                 updated_speech["party"] = paragraph["speaker_party"]
                 if paragraph["speaker_party"] is None:
                     updated_speech["ministry"] = paragraph["speaker_ministry"]
-                updated_speech["content"] = text.strip()
+                updated_speech["content"] = ' '.join(texts).strip()
 
             if token_topic and token_speech:
                 updated_speech["agenda_item"] = topic
@@ -504,15 +401,9 @@ def is_citation(paragraph: dict) -> bool:
         return False
 
 
-def is_speech(paragraph: dict) -> bool:
-    try:
-        if paragraph['speech'] is not None:
-            return True
-    except KeyError:
-        return False
-
-
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
@@ -549,80 +440,124 @@ def show_reconnect(index_before, index, sent_before, sent) -> None:
     print()
 
 
+def sent_tokenizer():
+    """
+    Return the German Punkt sentence tokenizer of nltk; it is only loaded
+    once per process (nltk's sent_tokenize() looks it up on every call).
+    """
+    global _sent_tokenizer
+    if _sent_tokenizer is None:
+        try:
+            from nltk.tokenize import PunktTokenizer
+        except ImportError:
+            # nltk < 3.8.2
+            import nltk.data
+            _sent_tokenizer = nltk.data.load('tokenizers/punkt/german.pickle')
+        else:
+            _sent_tokenizer = PunktTokenizer('german')
+    return _sent_tokenizer
+
+
 def mk_single_sents_in_speech(sentences: str, meta: tuple) -> list:
     if not isinstance(sentences, str):
-        print(sentences)
+        logger.warning(f"No speech text for {meta}: {sentences!r}")
         continue_()
-    sentences = sent_tokenize(sentences, language='german')
+    sentences = sent_tokenizer().tokenize(sentences)
     check_occurences("sent_starts_w_lower_letter", sentences, meta, check=False)  # noqa
-    sentences = reconnect_sents_w_first_letter_is_numeric(sentences)
+    sentences = list(repair_sents(sentences))
     check_occurences("sent_starts_w_numerated_item", sentences, meta, check=False)  # noqa
-    sentences = reconnect_sents_w_first_word_can_be_numerated(sentences)
-    sentences = split_sents_w_citation_start(sentences)
-    sentences = split_sents_w_citation_end(sentences)
-    sentences = reconnect_sents_w_lower_first_letter(sentences)
     check_occurences("sent_starts_w_numeral", sentences, meta, check=False)
 
     speech = update_speech(sentences, meta)
     return speech
 
 
-def reconnect_sents_w_lower_first_letter(sentences: list) -> list:
-    corrected_sentences = []
-    token = True
-    for i, sent in enumerate(sentences):
-        if token and first_letter_of_sent_is_lower(sent):
-            sent_before = sentences[i-1]
-            if sent_before.endswith('?') or sent_before.endswith("?“ "):
+def repair_sents(sentences: list) -> Iterator[str]:
+    """
+    Repair the sentences split by nltk in a single streaming pass; yields
+    the repaired sentences.
+    The repair stages are chained generators, applied in this order:
+        - reconnect sentences starting w a numeral to a sentence before
+          ending w an abbreviation (e.g. "ca. 3 Mio.")
+        - reconnect sentences starting w a word that can be numerated to a
+          sentence before ending w a number (e.g. "3. Kapitel")
+        - split sentences at the start and end of citations
+        - reconnect sentences starting w a lower letter to the sentence
+          before
+    Each stage only holds back the last sentence, so that a following
+    sentence can still be reconnected to it. A first sentence matching a
+    reconnect rule is kept as is, since there is no sentence before it
+    (the former recursive implementation reconnected it to the last
+    sentence of the speech instead).
+    """
+    sentences = reconnect_sents(sentences, starts_w_numeral_after_abbr)
+    sentences = reconnect_sents(sentences, starts_w_numerated_word_after_number)  # noqa
+    sentences = split_sents_at_citations(sentences)
+    sentences = reconnect_sents(sentences, starts_w_lower_letter,
+                                strip_question_mark=True)
+    return sentences
+
+
+def reconnect_sents(sentences: Iterable[str],
+                    can_reconnect: Callable[[str, str], bool],
+                    strip_question_mark: bool = False) -> Iterator[str]:
+    """
+    Reconnect each sentence to the sentence before, if
+    can_reconnect(sent_before, sent) is true; yields the resulting
+    sentences. With strip_question_mark, a question mark ending the
+    sentence before is removed first.
+    """
+    sent_before = None
+    for sent in sentences:
+        if sent_before is not None and can_reconnect(sent_before, sent):
+            if strip_question_mark and (sent_before.endswith('?') or
+                                        sent_before.endswith("?“ ")):
                 sent_before = sent_before[:-1]
-            reconnected_sent = sent_before.strip() + ' ' + sent.strip()
-            if len(corrected_sentences) > 0:
-                del corrected_sentences[-1]
-            corrected_sentences.append(reconnected_sent)
-            if 0:
-                show_reconnect(i-1, i, sent_before, sent)
-            token = False
-        else:
-            corrected_sentences.append(sent)
+            sent_before = sent_before.strip() + ' ' + sent.strip()
+            continue
+        if sent_before is not None:
+            yield sent_before
+        sent_before = sent
+    if sent_before is not None:
+        yield sent_before
 
-    if not token:
-        corrected_sentences = reconnect_sents_w_lower_first_letter(corrected_sentences)  # noqa
 
-    return corrected_sentences
+def starts_w_numeral_after_abbr(sent_before: str, sent: str) -> bool:
+    return (first_letter_of_sent_is_numeric(sent) and bool(sent_before) and
+            sent_ends_w_abbr(sent_before))
 
 
-def split_sents_w_citation_start(sentences: list) -> list:
-    corrected_sentences = []
-    for i, sent in enumerate(sentences):
-        if citation_start_in_sentence(sent):
-            sents = sent.split(": „")
-            sent_quote = sents[0] + ":"
-            quote_start = "„" + sents[-1]
-            corrected_sentences.append(sent_quote)
-            corrected_sentences.append(quote_start)
-        else:
-            corrected_sentences.append(sent)
+def starts_w_numerated_word_after_number(sent_before: str, sent: str) -> bool:
+    return (sent_starts_w_word_that_can_be_numerated(sent) and
+            sent_ends_with_number(sent_before))
 
-    return corrected_sentences
 
+def starts_w_lower_letter(sent_before: str, sent: str) -> bool:
+    return first_letter_of_sent_is_lower(sent)
 
-def split_sents_w_citation_end(sentences: list) -> list:
-    corrected_sentences = []
-    for i, sent in enumerate(sentences):
-        if citation_end_in_sentence(sent):
-            if ".“ " in sent:
-                sents = sent.split(".“ ")
-            else:
-                sents = sent.split("?“ ")
 
-            quote_end = sents[0] + ".“"
-            new_sent = sents[-1]
-            corrected_sentences.append(quote_end)
-            corrected_sentences.append(new_sent)
+def split_sents_at_citations(sentences: Iterable[str]) -> Iterator[str]:
+    """
+    Split sentences containing the start of a citation (': „') before the
+    citation and then sentences containing the end of a citation ('.“ ' or
+    '?“ ') after it; yields the resulting sentences.
+    """
+    for sent in sentences:
+        if citation_start_in_sentence(sent):
+            sents = sent.split(": „")
+            parts = (sents[0] + ":", "„" + sents[-1])
         else:
-            corrected_sentences.append(sent)
-
-    return corrected_sentences
+            parts = (sent,)
+        for part in parts:
+            if citation_end_in_sentence(part):
+                if ".“ " in part:
+                    sents = part.split(".“ ")
+                else:
+                    sents = part.split("?“ ")
+                yield sents[0] + ".“"
+                yield sents[-1]
+            else:
+                yield part
 
 
 def citation_start_in_sentence(sent: str) -> bool:
@@ -669,30 +604,6 @@ def sent_ends_w_abbr(sent: str) -> bool:
     return False
 
 
-def reconnect_sents_w_first_letter_is_numeric(sentences: list) -> list:
-    corrected_sentences = []
-    token = True
-    for i, sent in enumerate(sentences):
-        if first_letter_of_sent_is_numeric(sent):
-            sent_before = sentences[i-1]
-            if token and sent_before and sent_ends_w_abbr(sent_before):
-                reconnected_sent = sent_before.strip() + ' ' + sent.strip()
-                del corrected_sentences[-1]
-                corrected_sentences.append(reconnected_sent)
-                if 0:
-                    show_reconnect(i-1, i, sent_before, sent)
-                token = False
-            else:
-                corrected_sentences.append(sent)
-        else:
-            corrected_sentences.append(sent)
-
-    if not token:
-        corrected_sentences = reconnect_sents_w_first_letter_is_numeric(corrected_sentences)  # noqa
-
-    return corrected_sentences
-
-
 def sent_ends_w_comma(sent: str) -> bool:
     if sent.strip().endswith(","):
         return True
@@ -734,30 +645,6 @@ def sent_ends_with_number(sent: str) -> bool:
     return False
 
 
-def reconnect_sents_w_first_word_can_be_numerated(sentences: list) -> list:
-    corrected_sentences = []
-    token = True
-    for i, sent in enumerate(sentences):
-        if sent_starts_w_word_that_can_be_numerated(sent):
-            sent_before = sentences[i-1]
-            if token and sent_ends_with_number(sent_before):
-                reconnected_sent = sent_before.strip() + ' ' + sent.strip()
-                del corrected_sentences[-1]
-                corrected_sentences.append(reconnected_sent)
-                if 0:
-                    show_reconnect(i-1, i, sent_before, sent)
-                token = False
-            else:
-                corrected_sentences.append(sent)
-        else:
-            corrected_sentences.append(sent)
-
-    if not token:
-        corrected_sentences = reconnect_sents_w_first_word_can_be_numerated(corrected_sentences)  # noqa
-
-    return corrected_sentences
-
-
 def mk_correct_single_sents(speeches: list, date: str, protocol_no: str) -> list:  # noqa
     speeches_w_corrected_sents = []
     for speech in speeches:
@@ -795,17 +682,30 @@ def save_json_protocol(period, index, protocol):
     filename = os.path.join(
         NLTK_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
-    json.dump(protocol, open(filename, 'w', encoding='utf-8'))
+    protocol_store.dump_json(protocol, filename)
 
 
-def process_single_json_file(period, index) -> None:
+def process_single_json_file(period, index) -> dict:
+    """
+    Build the sentences of protocol period-index, showing the intermediate
+    results unless in batch mode. Returns the session with the speeches.
+    """
     data = load_json_file(period, index)
-    if 1:
+    if not batch_mode:
         walk_through_original_data(data)
-    collect_speeches_w_whole_sents(data)
+    return collect_speeches_w_whole_sents(data)
 
 
-def collect_speeches_w_whole_sents(data: dict) -> None:
+def collect_speeches_w_whole_sents(data: dict,
+                                   interactive: bool = None) -> dict:
+    """
+    Build the speeches with whole sentences for the protocol data.
+    With interactive=False, the intermediate results are not shown and no
+    user input is needed (used for batch runs); the default is interactive
+    unless in batch mode.
+    """
+    if interactive is None:
+        interactive = not batch_mode
     if 0:
         walk_through_original_data(data)
         continue_()
@@ -814,13 +714,13 @@ def collect_speeches_w_whole_sents(data: dict) -> None:
     date, protocol_no, agenda = session.date, session.protocol_no, session.agenda  # noqa
     paragraphs = session.content
     speech_indices = collect_speech_indices(paragraphs, agenda)
-    if 1:
+    if interactive:
         walk_through_speech_indices(speech_indices)
         continue_()
 
     speeches = fill_indices_w_text(session, speech_indices)
     speeches_w_corrected_sents = mk_correct_single_sents(speeches, date, protocol_no)  # noqa
-    if 1:
+    if interactive:
         walk_through_speeches(speeches_w_corrected_sents)
         continue_()
 
@@ -831,32 +731,139 @@ def collect_speeches_w_whole_sents(data: dict) -> None:
     return final_session
 
 
-def process_whole_period(period) -> None:
-    file_data = load_period_data(period)
+def process_protocol(period, index) -> dict:
+    """
+    Build and save the sentences of protocol period-index without user
+    interaction (used by pipeline.py). Returns the session with the speeches.
+    """
+    session_data = load_json_file(period, index)
+    final_session = collect_speeches_w_whole_sents(session_data,
+                                                   interactive=False)
+    save_json_protocol(period, index, final_session)
+    return final_session
 
-    for filename, protocol in sorted(file_data.items()):
-        if os.path.splitext(filename)[1] != '.html':
-            continue
-        index = protocol['index']
-        file_name = os.path.splitext(filename)[0] + '.json'
-        file_name = file_name.split('/')[-1]
-        file_name = os.path.join(NLTK_DIR, file_name)
-        print('-' * 72)
-        print(f'Processing {period}-{index}: {file_name}')
-        session_data = load_json_file(period, index)
-        final_session = collect_speeches_w_whole_sents(session_data)
-        # print("save?")
-        # continue_()
+
+def segment_protocol(period, index) -> tuple:
+    """
+    Build and save the sentences of protocol period-index without user
+    interaction; used for the period mode.
+    Returns (index, number of sentences, error message or None).
+    """
+    try:
+        session_data = load_json_file(period, index, interactive=False)
+        final_session = collect_speeches_w_whole_sents(session_data,
+                                                       interactive=False)
         save_json_protocol(period, index, final_session)
+    except Exception as error:
+        return index, 0, f'{error.__class__.__name__}: {error}'
+    sentences = sum(len(speech.speech) for speech in final_session['content'])
+    return index, sentences, None
+
+
+def init_worker() -> None:
+    """
+    Load the sentence tokenizer once when starting a worker process; worker
+    processes never wait for user input (segment_protocol() also rebuilds
+    stale agendas with interactive=False).
+    """
+    global batch_mode
+    batch_mode = True
+    sent_tokenizer()
+
+
+def process_whole_period(period, force: bool = False, jobs: int = 1) -> dict:
+    """
+    Process all protocols of the period, which are outdated according to
+    the build manifest (or all of them with force=True), without user
+    interaction.
+    With jobs > 1, the protocols are distributed over a pool of jobs worker
+    processes; the outputs are written by the workers as they finish.
+    Errors don't abort the run; the failed protocols are not recorded in the
+    manifest. Returns a dict mapping the indices of failed protocols to the
+    error messages.
+    """
+    file_data = load_period_data(period)
+    manifest = build_manifest.load_manifest(period)
+    indices = sorted(protocol['index']
+                     for filename, protocol in file_data.items()
+                     if os.path.splitext(filename)[1] == '.html')
+    if not force:
+        indices = build_manifest.outdated_protocols(
+            manifest, 'nltk', period, indices, SENTENCES_VERSION)
+
+    errors = {}
+    total_sentences = 0
+    done = 0
+    start = time.perf_counter()
+
+    def protocol_done(index, sentences, error) -> None:
+        nonlocal total_sentences, done
+        if error is not None:
+            logger.error(f'Processing {period}-{index} failed: {error}')
+            errors[index] = error
+            return
+        logger.info(f'Processed {period}-{index}: {sentences} sentences')
+        total_sentences += sentences
+        build_manifest.record_protocol(
+            manifest, 'nltk', period, index, SENTENCES_VERSION)
+        done += 1
+        if done % CHECKPOINT_INTERVAL == 0:
+            build_manifest.save_manifest(period, manifest)
+
+    try:
+        if jobs <= 1:
+            for index in indices:
+                protocol_done(*segment_protocol(period, index))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                    jobs, initializer=init_worker) as executor:
+                futures = [executor.submit(segment_protocol, period, index)
+                           for index in indices]
+                for future in concurrent.futures.as_completed(futures):
+                    protocol_done(*future.result())
+    finally:
+        build_manifest.save_manifest(period, manifest)
+
+    duration = time.perf_counter() - start
+    rate = total_sentences / duration if duration > 0 else 0.0
+    logger.info(f'Processed {done} protocols of period {period} in '
+                f'{duration:.1f}s: {total_sentences} sentences '
+                f'({rate:.0f} sentences/sec), {len(errors)} errors')
+    return errors
 
 
 def main():
-    period = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        index = int(sys.argv[2])
-        process_single_json_file(period, index)
+    """
+    Command line interface:
+    mk_paragraphs_to_sents.py [--jobs N] [--force] [--batch]
+                              [--log-level LEVEL] <period> [<index>]
+        With index, the protocol is processed interactively (with --batch,
+        it is saved without interaction instead), otherwise all outdated
+        protocols of the period are processed in batch mode.
+    """
+    global batch_mode
+    parser = argparse.ArgumentParser(
+        description='Resolve the paragraphs of protocols into sentences')
+    parser.add_argument('period', type=int)
+    parser.add_argument('index', type=int, nargs='?')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes')
+    parser.add_argument('--force', action='store_true',
+                        help='process protocols even if up to date')
+    batch.add_arguments(parser)
+    args = parser.parse_args()
+    batch.setup_logging(args.log_level)
+    batch_mode = args.batch or args.index is None
+
+    if args.index is None:
+        errors = process_whole_period(args.period, force=args.force,
+                                      jobs=args.jobs)
+        if errors:
+            sys.exit(1)
+    elif batch_mode:
+        process_protocol(args.period, args.index)
     else:
-        process_whole_period(period)
+        process_single_json_file(args.period, args.index)
 
 
 if __name__ == "__main__":
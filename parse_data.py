@@ -14,13 +14,21 @@ import sys
 import os
 import re
 import json
+import argparse
+import concurrent.futures
 import bs4
+import bs4.dammit
+from lxml import etree
 
 import load_data
+import protocol_store
+import build_manifest
+import agenda_and_speaker_list
 from settings import (
     BASE_URL,
     PROTOCOL_DIR,
     PROTOCOL_FILE_TEMPLATE,
+    TYPO_FIXES_FILE,
     )
 
 ### Globals
@@ -28,9 +36,18 @@ from settings import (
 # Verbosity
 verbose = 0
 
+# Version of the parser; increase when changing the parser in a way which
+# changes the output, so that build_manifest.py triggers a reparse.  See
+# parser_version() for the full version used in the build manifest.
+PARSER_VERSION = 1
+
 # Remove citation marks ?
 REMOVE_CITATION_MARKS = False
 
+# Parser backend to use: 'bs4' (BeautifulSoup) or 'lxml' (lxml tree, faster)
+PARSER_BACKEND = 'bs4'
+PARSER_BACKENDS = ('bs4', 'lxml')
+
 # REs for find_start() and find_end()
 BEGIN_RE = re.compile('Beginn:|Beginn \d\d[:\.]\d\d|Seite 3427')
 # "Seite 3427" - problem in 14-32
@@ -58,6 +75,7 @@ NON_SPEAKER_INTRO_RE = re.compile(
 
 # REs for parsing the speaker intros in parse_speaker_intro()
 NAME_DEF = '[\w\-‑.’\' ]+'
+NAME_GROUP = '(' + NAME_DEF + ')'
 SPEAKER_NAME_RE = re.compile(
     '(' + NAME_DEF + ')'                        # name
     '(?:\*\))? ?'                               # optional *) marker
@@ -134,6 +152,10 @@ TYPO_FIXES = {
     'Eiskirch (SPD):': 'Thomas Eiskirch (SPD):',
 }
 
+# Typo fix lookup tree used by typo_fixes(); this is set up by
+# setup_typo_fixes() at the end of the module
+TYPO_FIXES_TREE = None
+
 # REs for parsing names in parse_speaker_intro()
 PRESIDENT_RE = re.compile('((?:geschäftsführender? |alters|minister)?präsident(?:in)?) (.+)', re.I)
 VICE_PRESIDENT_RE = re.compile('((?:geschäftsführender? (?:erster? )|minister)?vizepräsident(?:in)?) (.+)', re.I)
@@ -144,6 +166,92 @@ MINISTER_RE = re.compile('((?:geschäftsführender? )?minister(?:in)?) (.+)', re
 assert SPEAKER_IS_CHAIR_RE.match('Vizepräsidentin Carina Gödecke: ') is not None
 assert SPEAKER_IS_CHAIR_RE.match('Präsident André Kuper: ') is not None
 
+# Helpers to combine the REs used in parse_speaker_intro()
+def lookahead_pattern(pattern, flags):
+
+    """ Return an optional lookahead for the RE pattern, which is
+        compiled with flags, followed by an empty group.
+
+        The empty group ends where the pattern match ends and is None, if
+        the pattern does not match.
+
+    """
+    scope = 'i' if flags & re.I else ''
+    return f'(?:(?=(?{scope}:{pattern})())|)'
+
+def combine_res(*regexes):
+
+    """ Combine regexes into a single RE, which tries to match each of
+        them at the start of a string in one pass.
+
+        Returns a tuple (combined RE, groups).  The combined RE always
+        matches.  groups has a (first, end) tuple of group indices per
+        regex: first is the index of the regex's first group in the
+        combined RE, end the index of an extra empty group, which is set
+        to '' and ends where the regex's match ends, if the regex
+        matched, and None otherwise.
+
+    """
+    parts = []
+    groups = []
+    first = 1
+    for regex in regexes:
+        parts.append(lookahead_pattern(regex.pattern, regex.flags))
+        groups.append((first, first + regex.groups))
+        first += regex.groups + 1
+    return re.compile(''.join(parts)), tuple(groups)
+
+def combine_speaker_res(non_speaker_regex, *regexes):
+
+    """ Combine non_speaker_regex and the speaker intro regexes into a
+        single RE.
+
+        All regexes have to start with the name group NAME_GROUP and be
+        compiled with re.I.  The name characters don't include any of
+        the characters which can follow the name in the regexes, so the
+        name group always matches the longest run of name characters at
+        the start of the text.  The combined RE therefore matches the
+        name only once and then tries the rest of each regex as
+        lookahead.
+
+        Returns a tuple (combined RE, groups).  groups has the group
+        index of the empty group which is set if non_speaker_regex
+        matches, followed by a (name, first, end) tuple for each of the
+        regexes: name is the index of the name group, first the index of
+        the regex's second group and end the index of the empty group set
+        if the regex matches, as described in combine_res().  The
+        combined RE does not match, if neither non_speaker_regex nor the
+        name group match.
+
+    """
+    non_speaker_end = non_speaker_regex.groups + 1
+    parts = []
+    groups = [non_speaker_end]
+    name = non_speaker_end + 1
+    first = name + 1
+    for regex in regexes:
+        assert regex.pattern.startswith(NAME_GROUP) and regex.flags & re.I
+        parts.append(lookahead_pattern(
+            regex.pattern[len(NAME_GROUP):], regex.flags))
+        groups.append((name, first, first + regex.groups - 1))
+        first += regex.groups
+    pattern = (f'(?:{non_speaker_regex.pattern})()|'
+               f'(?i:{NAME_GROUP})' + ''.join(parts))
+    return re.compile(pattern, non_speaker_regex.flags), tuple(groups)
+
+# Combined REs for parse_speaker_intro(); see there for the precedence
+SPEAKER_INTRO_RE, SPEAKER_INTRO_GROUPS = combine_speaker_res(
+    NON_SPEAKER_INTRO_RE,
+    SPEAKER_NAME_RE,
+    SPEAKER_PARTY_NAME_RE,
+    MINISTER_NAME_RE,
+    OTHER_ROLE_NAME_RE)
+SPEAKER_ROLE_RE, SPEAKER_ROLE_GROUPS = combine_res(
+    PRESIDENT_RE,
+    VICE_PRESIDENT_RE,
+    MINISTER_RE,
+    SPEAKER_IS_CHAIR_RE)
+
 # RE for clean_text()
 RE_CLEAN_TEXT = re.compile('[\s]+')
 
@@ -187,20 +295,97 @@ CITATION_CLASSES = lowercase_set(('zZitat', 'eZitat-Einrckung'))
 # Sets of speaker_roles
 CHAIR_ROLES = set(('president', 'vice-president'))
 
+# XPath expressions used by the lxml backend
+LXML_TEXT_NODES = etree.XPath('//text()')
+LXML_TAG_TEXT_NODES = etree.XPath('.//text()')
+LXML_TAG_TEXT = etree.XPath('string()')
+LXML_PARENT_P = etree.XPath('ancestor-or-self::p[1]')
+LXML_FOLLOWING_P = etree.XPath('following::p')
+LXML_P_WITH_CLASS = etree.XPath(
+    "//p[contains(concat(' ', normalize-space(@class), ' '), $class_name)]")
+
 ### Errors
 
 class ParserError(TypeError):
     pass
 
+class NonSpeakerIntroError(ParserError):
+    pass
+
 ###
 
-def create_parser(filename):
+def create_parser(filename, backend=PARSER_BACKEND):
+
+    """ Return the parsed document tree for the HTML file filename.
+
+        backend selects the type of tree: 'bs4' returns a BeautifulSoup
+        object, 'lxml' the root element of an lxml tree.
+
+    """
+    html = protocol_store.read(filename)
+    if backend == 'lxml':
+        return create_lxml_tree(html)
+    elif backend != 'bs4':
+        raise ValueError(f'Unknown parser backend: {backend!r}')
     # Note: Older HTML files are often encoded in Windows CP1252, not UTF-8,
     # so let BS4 figure out the encoding by looking at the start of the file
-    with open(filename, 'rb') as f:
-        soup = bs4.BeautifulSoup(f, 'lxml')
+    soup = bs4.BeautifulSoup(html, 'lxml')
     return soup
 
+def create_lxml_tree(html):
+
+    """ Parse the bytes html using lxml and return the root element.
+
+        The encodings are tried in the same order as BS4 does when using
+        its lxml builder, so that both backends see the same text.
+
+    """
+    detector = bs4.dammit.EncodingDetector(html, is_html=True)
+    for encoding in detector.encodings:
+        parser = etree.HTMLParser(encoding=encoding)
+        try:
+            root = etree.fromstring(detector.markup, parser)
+        except (UnicodeDecodeError, LookupError, etree.ParserError):
+            continue
+        if root is not None:
+            return root
+    raise ParserError('Could not decode HTML document')
+
+def is_lxml_tree(soup):
+
+    """ Return True, if soup was created by the lxml backend.
+
+    """
+    return isinstance(soup, etree._Element)
+
+def all_paragraphs(soup):
+
+    """ Return a list of (text, classes) tuples for all p tags in soup.
+
+        soup may be a BS4 soup or an lxml tree.  text is the raw tag text,
+        classes the list of the tag's classes.  This is the input format
+        of agenda_and_speaker_list.parse_agenda().
+
+    """
+    if is_lxml_tree(soup):
+        return [(LXML_TAG_TEXT(tag), tag.get('class', '').split())
+                for tag in soup.iter('p')]
+    return [(tag.get_text(), tag.get('class') or [])
+            for tag in soup.find_all('p')]
+
+def parser_version():
+
+    """ Return the version of the parse stage for the build manifest.
+
+        This includes the agenda rules version and the typo fixes, since
+        both change the parser output.
+
+    """
+    typo_fixes_hash = load_data.content_hash(
+        json.dumps(TYPO_FIXES, sort_keys=True).encode('utf-8'))
+    return (f'{PARSER_VERSION}.{agenda_and_speaker_list.AGENDA_VERSION}'
+            f'-{typo_fixes_hash[:12]}')
+
 def find_all_classes(soup, tag_name='p', initial_set=None):
     s = initial_set or set()
     for tag in soup.find_all(tag_name):
@@ -209,7 +394,7 @@ def find_all_classes(soup, tag_name='p', initial_set=None):
 
 def find_classes_used_in_dir(dir='protocols/'):
     classes = set()
-    for filename in os.listdir(dir):
+    for filename in protocol_store.listdir(dir):
         if not filename.endswith('.html'):
             continue
         soup = create_parser(os.path.join(dir, filename))
@@ -244,19 +429,107 @@ def clean_tag_text(tag):
     text = tag.get_text().replace('\xad', '')
     return RE_CLEAN_TEXT.sub(' ', text).strip()
 
-def typo_fixes(text):
+def lxml_find_text(root, regex):
+
+    """ Return the first text node in the lxml tree root matching regex
+        or None.
+
+        This works like soup.find(text=regex) for BS4 trees.
+
+    """
+    for text in LXML_TEXT_NODES(root):
+        if regex.search(text) is not None:
+            return text
+    return None
+
+def lxml_text_parent(text):
+
+    """ Return the element containing the lxml text node text.
+
+    """
+    if text.is_tail:
+        return text.getparent().getparent()
+    return text.getparent()
+
+def load_typo_fixes(filename):
+
+    """ Load additional typo fixes from the JSON file filename.
+
+        The file must contain a JSON object mapping typos to fixes, in the
+        same way as TYPO_FIXES.
+
+    """
+    with open(filename, 'r', encoding='utf-8') as f:
+        fixes = json.load(f)
+    if not isinstance(fixes, dict):
+        raise ValueError(f'Typo fixes file {filename} must contain an object')
+    return fixes
+
+def build_typo_fixes_tree(fixes):
+
+    """ Build the prefix tree used by typo_fixes() for the dictionary
+        fixes.
+
+        The tree is made of nested dictionaries mapping characters to
+        subtrees.  The None key of a subtree holds the (position, typo,
+        fix) entry of the typo ending at that subtree, with position
+        being the position of the typo in fixes.
+
+    """
+    tree = {}
+    for position, (typo, fix) in enumerate(fixes.items()):
+        node = tree
+        for char in typo:
+            node = node.setdefault(char, {})
+        node[None] = (position, typo, fix)
+    return tree
+
+def setup_typo_fixes(filename=TYPO_FIXES_FILE):
+
+    """ Add the typo fixes from filename (if given) to TYPO_FIXES and
+        (re)build the lookup tree used by typo_fixes().
+
+        This has to be called after changing TYPO_FIXES.
+
+    """
+    global TYPO_FIXES_TREE
+    if filename:
+        TYPO_FIXES.update(load_typo_fixes(filename))
+    TYPO_FIXES_TREE = build_typo_fixes_tree(TYPO_FIXES)
+
+def typo_fixes(text, tree=None):
 
     """ Apply typo fixes to text and return the corrected text.
 
         The typos are matched against the start of the text and must
         match verbatim.
 
+        All typos matching the original text are applied in the order of
+        TYPO_FIXES.  Using the prefix tree, the cost only depends on the
+        length of the matching typos, not on the number of fixes.
+
     """
+    if tree is None:
+        tree = TYPO_FIXES_TREE
+
+    # Find all typos matching the start of text
+    node = tree
+    matches = []
+    if None in node:
+        matches.append(node[None])
+    for char in text:
+        node = node.get(char)
+        if node is None:
+            break
+        entry = node.get(None)
+        if entry is not None:
+            matches.append(entry)
+    if not matches:
+        return text
+
     # Replace
-    match = text.startswith
-    for typo, fix in TYPO_FIXES.items():
-        if match(typo):
-            text = fix + text[len(typo):]
+    for position, typo, fix in sorted(matches):
+        text = fix + text[len(typo):]
     return text
 
 def protocol_meta_data(period, index, soup):
@@ -264,12 +537,15 @@ def protocol_meta_data(period, index, soup):
     """ Return meta data to associate with the protocol
 
     """
-    tag = soup.find(text=DATE_RE)
-    if tag is None:
+    if is_lxml_tree(soup):
+        text = lxml_find_text(soup, DATE_RE)
+    else:
+        text = soup.find(text=DATE_RE)
+    if text is None:
         print (f'WARNING: Could not find protocol date in document')
         protocol_date = None
     else:
-        match = DATE_RE.search(tag.get_text())
+        match = DATE_RE.search(str(text))
         _, dd, mm, yyyy = match.groups()
         protocol_date = '%s-%s-%s' % (yyyy, mm, dd)
     protocol_title = 'Landtag NRW - Plenarprotokoll %i/%i' % (period, index)
@@ -329,6 +605,36 @@ def find_end(soup):
     protocol_end =  end_text.find_parent('p')
     return protocol_end
 
+def lxml_find_paragraph(root, class_name, regex):
+
+    """ Find the marker paragraph in the lxml tree root: the first p tag
+        using class_name if it contains text matching regex, or else the
+        p tag around the first text matching regex.
+
+        Returns None in case this cannot be found.
+
+        This implements find_start() and find_end() for the lxml backend.
+
+    """
+    # First try: look for correct class
+    tags = LXML_P_WITH_CLASS(root, class_name=f' {class_name} ')
+    if tags:
+        tag = tags[0]
+        for text in LXML_TAG_TEXT_NODES(tag):
+            if regex.search(text) is not None:
+                return tag
+        # Can't use this node
+
+    # Second try: look for text
+    text = lxml_find_text(root, regex)
+    if text is None:
+        return None
+    # Go back up to find the parent p tag; this may not find anything
+    tags = LXML_PARENT_P(lxml_text_parent(text))
+    if not tags:
+        return None
+    return tags[0]
+
 def parse_speaker_intro(speaker_tag, tag_text, meta_data=None):
 
     """ Parse the speaker_tag's tag_text from the protocol and return a
@@ -346,10 +652,38 @@ def parse_speaker_intro(speaker_tag, tag_text, meta_data=None):
 
         meta_data is added to the dictionary, if given.
 
+        Paragraphs matching NON_SPEAKER_INTRO_RE raise a
+        NonSpeakerIntroError, paragraphs without speaker name a
+        ParserError.
+
+        All REs are matched in a single pass using SPEAKER_INTRO_RE and
+        SPEAKER_ROLE_RE.  Precedence, if more than one RE matches:
+
+        - speaker_name and speech are taken from the last matching RE in
+          the order SPEAKER_NAME_RE, SPEAKER_PARTY_NAME_RE,
+          MINISTER_NAME_RE, OTHER_ROLE_NAME_RE; party, ministry and role
+          wording are taken from the RE providing them
+        - speaker_role and speaker_role_descr are taken from the last
+          matching RE in the order PRESIDENT_RE, VICE_PRESIDENT_RE,
+          MINISTER_RE applied to the name, falling back to the role
+          wording found by OTHER_ROLE_NAME_RE; a ministry always makes the
+          speaker a minister
+
     """
+    (non_speaker,
+     name_only,
+     party_name,
+     minister_name,
+     other_role_name) = SPEAKER_INTRO_GROUPS
+    match = SPEAKER_INTRO_RE.match(tag_text)
+    if match is None:
+        raise ParserError('Could not match speaker name: %r' % tag_text)
+    group = match.group
+
     # Catch common errors
-    if NON_SPEAKER_INTRO_RE.match(tag_text) is not None:
-        raise ParserError('Paragraph is not a true speaker intro: %r' % tag_text)
+    if group(non_speaker) is not None:
+        raise NonSpeakerIntroError(
+            'Paragraph is not a true speaker intro: %r' % tag_text)
 
     # Match speaker declarations
     speaker_name = None
@@ -358,55 +692,58 @@ def parse_speaker_intro(speaker_tag, tag_text, meta_data=None):
     speaker_role = None
     speaker_role_descr = None
     speech = None
-    match = SPEAKER_NAME_RE.match(tag_text)
-    if match is not None:
-        speaker_name = match.group(1)
-        speech = tag_text[match.end():]
-    match = SPEAKER_PARTY_NAME_RE.match(tag_text)
-    if match is not None:
-        speaker_name = match.group(1)
-        speaker_party = match.group(2)
+    name, first, end = name_only
+    if group(end) is not None:
+        speaker_name = group(name)
+        speech = tag_text[match.end(end):]
+    name, first, end = party_name
+    if group(end) is not None:
+        speaker_name = group(name)
+        speaker_party = group(first)
         speaker_party = speaker_party.strip('([]) ')
-        speech = tag_text[match.end():]
-    match = MINISTER_NAME_RE.match(tag_text)
-    if match is not None:
-        speaker_name = match.group(1)
-        speaker_ministry = match.group(2)
-        speech = tag_text[match.end():]
-    match = OTHER_ROLE_NAME_RE.match(tag_text)
-    if match is not None:
-        speaker_name = match.group(1)
-        speaker_role_descr = match.group(2)
+        speech = tag_text[match.end(end):]
+    name, first, end = minister_name
+    if group(end) is not None:
+        speaker_name = group(name)
+        speaker_ministry = group(first)
+        speech = tag_text[match.end(end):]
+    name, first, end = other_role_name
+    if group(end) is not None:
+        speaker_name = group(name)
+        speaker_role_descr = group(first)
         if verbose > 1:
             print (f'  Found other speaker role: {tag_text!r}')
-        speech = tag_text[match.end():]
+        speech = tag_text[match.end(end):]
 
     if speaker_name is None:
         raise ParserError('Could not match speaker name: %r' % tag_text)
 
     # Parse role and remove from name
+    president, vice_president, minister, chair = SPEAKER_ROLE_GROUPS
     full_speaker_name = speaker_name
-    match = PRESIDENT_RE.match(full_speaker_name)
-    if match is not None:
+    match = SPEAKER_ROLE_RE.match(full_speaker_name)
+    group = match.group
+    first, end = president
+    if group(end) is not None:
         speaker_role = 'president'
-        speaker_role_descr = match.group(1)
-        speaker_name = match.group(2)
-    match = VICE_PRESIDENT_RE.match(full_speaker_name)
-    if match is not None:
+        speaker_role_descr = group(first)
+        speaker_name = group(first + 1)
+    first, end = vice_president
+    if group(end) is not None:
         speaker_role = 'vice-president'
-        speaker_role_descr = match.group(1)
-        speaker_name = match.group(2)
-    match = MINISTER_RE.match(full_speaker_name)
-    if match is not None:
+        speaker_role_descr = group(first)
+        speaker_name = group(first + 1)
+    first, end = minister
+    if group(end) is not None:
         speaker_role = 'minister'
-        speaker_role_descr = match.group(1)
-        speaker_name = match.group(2)
+        speaker_role_descr = group(first)
+        speaker_name = group(first + 1)
     if speaker_ministry is not None:
         speaker_role = 'minister'
     if speaker_role_descr is not None and speaker_role is None:
         speaker_role = 'other'
     if (speaker_role in CHAIR_ROLES and
-        SPEAKER_IS_CHAIR_RE.match(full_speaker_name) is not None):
+        group(chair[1]) is not None):
         speaker_is_chair = True
     else:
         speaker_is_chair = False
@@ -463,9 +800,12 @@ def parse_citation_paragraph(speech_tag, tag_text, meta_data=None):
         d.update(meta_data)
     return d
 
-def parse_protocol(soup):
+def bs4_protocol_paragraphs(soup):
 
-    """ Parse the protocol HTML soup
+    """ Iterate over the protocol paragraphs in the BS4 soup.
+
+        Yields (tag, classes, text) tuples for all p tags between the
+        start and end of the protocol.
 
     """
     # Find start of protocol in HTML
@@ -478,6 +818,56 @@ def parse_protocol(soup):
     if not protocol_end:
         raise ParserError('Could not find end of protocol')
 
+    for tag in protocol_start.find_all_next('p'):
+
+        # Detect end of protocol
+        if tag == protocol_end:
+            return
+        yield tag, tag.get('class'), tag.get_text()
+
+    raise ParserError(f'Could not find end tag in protocol')
+
+def lxml_protocol_paragraphs(root):
+
+    """ Iterate over the protocol paragraphs in the lxml tree root.
+
+        Yields the same (tag, classes, text) tuples as
+        bs4_protocol_paragraphs(), with tag being an lxml element.
+
+    """
+    # Find start of protocol in HTML
+    protocol_start = lxml_find_paragraph(root, 'bBeginn', BEGIN_RE)
+    if protocol_start is None:
+        raise ParserError('Could not find start of protocol')
+
+    # Find end of protocol in HTML
+    protocol_end = lxml_find_paragraph(root, 'sSchluss', END_RE)
+    if protocol_end is None:
+        raise ParserError('Could not find end of protocol')
+
+    for tag in LXML_FOLLOWING_P(protocol_start):
+
+        # Detect end of protocol; BS4 compares tags by value, but the
+        # first equal tag after the start is always the end tag itself
+        if tag is protocol_end:
+            return
+        yield tag, tag.get('class', '').split(), LXML_TAG_TEXT(tag)
+
+    raise ParserError('Could not find end tag in protocol')
+
+def parse_protocol(soup):
+
+    """ Parse the protocol HTML soup
+
+        soup may be a BS4 soup or an lxml tree, as returned by
+        create_parser().
+
+    """
+    if is_lxml_tree(soup):
+        protocol_paragraphs = lxml_protocol_paragraphs(soup)
+    else:
+        protocol_paragraphs = bs4_protocol_paragraphs(soup)
+
     # Scan all protocol paragraphs
     paragraphs = []
     protocol_meta_data = {}
@@ -486,20 +876,15 @@ def parse_protocol(soup):
     previous_speaker = None
     p_counter = 1
     speaker_section_counter = None
-    start_tag = protocol_start
 
-    for tag in start_tag.find_all_next('p'):
-
-        # Detect end of protocol
-        if tag == protocol_end:
-            break
+    for tag, tag_classes, tag_text in protocol_paragraphs:
 
         # Find "Word" style class and convert to lower case for matching
-        p_classes = set((x.lower() for x in tag.get('class')))
+        p_classes = set((x.lower() for x in tag_classes))
         #print (f'Found tag classes {p_classes}: {tag}')
 
         # Get clean tag text (without any HTML tags)
-        tag_text = clean_tag_text(tag)
+        tag_text = clean_text(tag_text)
 
         # Skip empty paragraphs and page numbering
         if not tag_text:
@@ -520,7 +905,8 @@ def parse_protocol(soup):
                 paragraph = parse_speaker_intro(tag, tag_text, protocol_meta_data)
             except ParserError as error:
                 # False speaker change
-                if verbose > 1 or NON_SPEAKER_INTRO_RE.match(tag_text) is None:
+                if (verbose > 1 or
+                    not isinstance(error, NonSpeakerIntroError)):
                     # Only report
                     print (f'WARNING: Speaker intro paragraph without speaker information: '
                            f'{error}')
@@ -583,51 +969,181 @@ def parse_protocol(soup):
         p_counter += 1
         speaker_section_counter += 1
 
-    else:
-        raise ParserError(f'Could not find end tag in protocol')
-
     if not paragraphs:
         print (f'WARNING: No paragraphs parsed for this protocol !!!')
     return paragraphs
 
-def process_protocol(period, index):
+def process_protocol(period, index, backend=PARSER_BACKEND):
 
     html_filename = os.path.join(
         PROTOCOL_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'html'))
 
     # Parse file
-    soup = create_parser(html_filename)
+    soup = create_parser(html_filename, backend)
     data = parse_protocol(soup)
 
-    # Add protocol meta data
+    # Add protocol meta data and the agenda, using the same parse tree
     protocol = protocol_meta_data(period, index, soup)
+    protocol['agenda'] = agenda_and_speaker_list.parse_agenda(
+        all_paragraphs(soup), interactive=False)
+    protocol['agenda_version'] = agenda_and_speaker_list.AGENDA_VERSION
     protocol['content'] = data
 
     # Dump data as JSON
     json_filename = os.path.splitext(html_filename)[0] + '.json'
-    json.dump(protocol, open(json_filename, 'w', encoding='utf-8'))
+    protocol_store.dump_json(protocol, json_filename)
+
+def parse_protocol_safely(period, index, backend=PARSER_BACKEND):
+
+    """ Parse protocol period-index using process_protocol().
+
+        Returns None on success and the error message in case of a
+        ParserError.  This is used as worker function for parallel runs.
+
+    """
+    try:
+        process_protocol(period, index, backend)
+    except ParserError as error:
+        return str(error)
+    return None
+
+def process_period(period, indices, jobs=1, backend=PARSER_BACKEND):
+
+    """ Parse the protocols with the given indices of period.
+
+        With jobs > 1, the protocols are parsed in a pool of jobs worker
+        processes.  ParserErrors don't abort the run, but are collected
+        and returned as dictionary mapping protocol index to error
+        message.
+
+    """
+    errors = {}
+    if jobs <= 1:
+        for index in indices:
+            print ('-' * 72)
+            print (f'Parsing {period}-{index}')
+            error = parse_protocol_safely(period, index, backend)
+            if error is not None:
+                print (f'ERROR: {error}')
+                errors[index] = error
+        return errors
+
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = {
+            executor.submit(parse_protocol_safely, period, index, backend):
+                index
+            for index in indices}
+        for future in concurrent.futures.as_completed(futures):
+            index = futures[future]
+            error = future.result()
+            if error is not None:
+                print (f'Parsing {period}-{index} failed: {error}')
+                errors[index] = error
+            elif verbose:
+                print (f'Parsed {period}-{index}')
+    return errors
+
+def update_period(period, indices, jobs=1, backend=PARSER_BACKEND,
+                  force=False):
+
+    """ Parse those protocols with the given indices of period, which are
+        outdated according to the build manifest (or all of them, if force
+        is true) and record the parsed protocols in the manifest.
+
+        Returns a tuple (parsed indices, errors) with errors as returned
+        by process_period().  Protocols failing to parse are not recorded,
+        so they are parsed again in the next run.
+
+    """
+    manifest = build_manifest.load_manifest(period)
+    version = parser_version()
+    if not force:
+        indices = build_manifest.outdated_protocols(
+            manifest, 'parse', period, indices, version)
+    errors = process_period(period, indices, jobs=jobs, backend=backend)
+    for index in indices:
+        if index not in errors:
+            build_manifest.record_protocol(
+                manifest, 'parse', period, index, version)
+    build_manifest.save_manifest(period, manifest)
+    return indices, errors
+
+def print_error_report(period, indices, errors):
+
+    """ Print a summary of the parser errors returned by process_period().
+
+    """
+    print ('=' * 72)
+    print (f'Parsed {len(indices) - len(errors)} of {len(indices)} '
+           f'protocols of period {period}')
+    for index, error in sorted(errors.items()):
+        print (f' {period}-{index}: {error}')
 
 def main():
 
-    period = int(sys.argv[1])
-    if len(sys.argv) > 2:
+    """ Command line interface:
+
+        parse_data.py [--changed] [--force] [--jobs N] [--backend B]
+                      <period> [<index>]
+
+        Parses all protocols of the period or just the one with index.
+        Protocols which are up to date according to the build manifest
+        are skipped, unless --force is given.
+        With --changed, only the protocols flagged as new or changed by
+        the downloader are considered and their flag is cleared afterwards.
+        With --jobs, the protocols are parsed in N parallel processes.
+        --backend selects the HTML parser backend (bs4 or lxml).
+
+    """
+    parser = argparse.ArgumentParser(
+        description='Parse NRW Landtag protocols of a period')
+    parser.add_argument('period', type=int)
+    parser.add_argument('index', type=int, nargs='?')
+    parser.add_argument('--changed', action='store_true',
+                        help='only parse new or changed protocols')
+    parser.add_argument('--force', action='store_true',
+                        help='parse protocols even if up to date')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of parallel parser processes')
+    parser.add_argument('--backend', choices=PARSER_BACKENDS,
+                        default=PARSER_BACKEND,
+                        help='HTML parser backend')
+    args = parser.parse_args()
+
+    period = args.period
+    if args.index is not None:
         # Process just one document
-        index = int(sys.argv[2])
-        process_protocol(period, index)
+        process_protocol(period, args.index, args.backend)
+        return
+
+    data = load_data.load_period_data(period)
+    if args.changed:
+        # Process documents updated by the last download
+        protocols = load_data.changed_protocols(data)
     else:
         # Process all available documents
-        data = load_data.load_period_data(period)
-        for filename, protocol in sorted(data.items()):
-            if os.path.splitext(filename)[1] != '.html':
-                continue
-            index = protocol['index']
-            print ('-' * 72)
-            print (f'Parsing {period}-{index}: {filename}')
-            process_protocol(period, index)
+        protocols = [
+            (filename, protocol)
+            for filename, protocol in sorted(data.items())
+            if os.path.splitext(filename)[1] == '.html']
+    all_indices = [protocol['index'] for filename, protocol in protocols]
+    indices, errors = update_period(period, all_indices, jobs=args.jobs,
+                                    backend=args.backend, force=args.force)
+    if len(indices) < len(all_indices):
+        print (f'Skipped {len(all_indices) - len(indices)} up to date '
+               f'protocols')
+    if args.changed:
+        for filename, protocol in protocols:
+            if protocol['index'] not in errors:
+                protocol['changed'] = False
+        load_data.save_period_data(period, data)
+    print_error_report(period, indices, errors)
 
 ###
 
+setup_typo_fixes()
+
 if __name__ == '__main__':
     if 0:
         classes = find_classes_used_in_dir('protocols/')
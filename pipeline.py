@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+    Run the processing stages for the protocols of a period as one
+    pipeline.
+
+    The stages form a DAG of per protocol tasks:
+
+        parse -> nltk -> bert
+              -> feed
+                 nltk -> tagger (whole period)
+
+    The tasks are run in a pool of worker processes.  A task is scheduled
+    as soon as the task of its upstream stage for the same protocol has
+    finished, so e.g. protocol 17-5 can be processed by the NLTK stage,
+    while 17-6 is still being parsed.  Tasks which are up to date
+    according to the build manifest (see build_manifest.py) are skipped.
+    The manifest is only updated by the runner process.
+
+    Command line interface:
+
+    pipeline.py [--stages S,...] [--jobs N] [--force] [--download]
+                <period> [<index> ...]
+
+        Runs the stages S (default: parse,nltk) for the given protocols
+        of the period (default: all downloaded protocols).  Stages whose
+        upstream stage is not selected use the existing upstream outputs.
+        With --download, new protocols are downloaded first.
+
+"""
+import os
+import sys
+import time
+import argparse
+import importlib
+import collections
+import concurrent.futures
+
+import load_data
+import build_manifest
+from settings import CHECKPOINT_INTERVAL
+
+### Globals
+
+# Verbosity
+verbose = 0
+
+# Pipeline stages: upstream stage, module implementing the stage, function
+# running the stage for a protocol (or a whole period) and attribute of the
+# module giving the stage version (called if callable)
+Stage = collections.namedtuple(
+    'Stage', ('upstream', 'module', 'function', 'version'))
+STAGES = {
+    'parse': Stage(None, 'parse_data', 'process_protocol', 'parser_version'),
+    'nltk': Stage('parse', 'mk_paragraphs_to_sents', 'process_protocol',
+                  'SENTENCES_VERSION'),
+    'bert': Stage('nltk', 'sentiment_speech_analysis_w_bert',
+                  'process_protocol', 'SENTIMENT_VERSION'),
+    'feed': Stage('parse', 'feed_opensearch', 'process_protocol',
+                  'FEED_VERSION'),
+    'tagger': Stage('nltk', 'tagger_speech_analysis', 'tag_and_save_period',
+                    'TAGGER_VERSION'),
+}
+
+# Stages processing a whole period instead of single protocols
+PERIOD_STAGES = {'tagger'}
+
+# Stages run by default
+DEFAULT_STAGES = ('parse', 'nltk')
+
+###
+
+class SerialExecutor(concurrent.futures.Executor):
+
+    """ Executor running the submitted functions immediately in the
+        current process; used for jobs=1.
+
+    """
+    def submit(self, function, *args, **kws):
+        future = concurrent.futures.Future()
+        try:
+            future.set_result(function(*args, **kws))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+class StageStats:
+
+    """ Counters and timings of a pipeline stage.
+
+    """
+    def __init__(self, stage):
+        self.stage = stage
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.first_start = None
+        self.last_end = None
+
+    def started(self, timestamp):
+        if self.first_start is None:
+            self.first_start = timestamp
+
+    def finished(self, timestamp, duration=0.0):
+        self.last_end = timestamp
+        self.busy_time += duration
+
+    def wall_time(self):
+        if self.first_start is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    def throughput(self):
+        wall_time = self.wall_time()
+        if not wall_time:
+            return 0.0
+        return self.done / wall_time
+
+def stage_module(stage):
+
+    """ Import and return the module implementing stage.
+
+        The modules are only imported when needed, since some of them
+        load large models or external tools.
+
+    """
+    return importlib.import_module(STAGES[stage].module)
+
+def stage_version(stage):
+
+    """ Return the version of stage for the build manifest.
+
+    """
+    version = getattr(stage_module(stage), STAGES[stage].version)
+    if callable(version):
+        version = version()
+    return version
+
+def run_task(stage, period, index):
+
+    """ Run stage for protocol period-index (index is None for period
+        stages) and return the time it took.
+
+        This is run in the worker processes.
+
+    """
+    start = time.perf_counter()
+    module = stage_module(stage)
+    if hasattr(module, 'batch_mode'):
+        # Stages never wait for user input
+        module.batch_mode = True
+    function = getattr(module, STAGES[stage].function)
+    if stage in PERIOD_STAGES:
+        function(period)
+    else:
+        function(period, index)
+    return time.perf_counter() - start
+
+def task_files(stage, period, index, indices):
+
+    """ Return the (inputs, outputs) file lists of a task.
+
+    """
+    if stage in PERIOD_STAGES:
+        return build_manifest.tagger_files(period, indices)
+    return build_manifest.stage_files(stage, period, index)
+
+def task_name(stage, period, index):
+    if index is None:
+        return f'{stage} {period}'
+    return f'{stage} {period}-{index}'
+
+def run_pipeline(period, indices, stages=DEFAULT_STAGES, jobs=1,
+                 force=False):
+
+    """ Run the stages for the protocols indices of period.
+
+        Up to jobs tasks are run in parallel worker processes.  Up to date
+        tasks are skipped, unless force is true.
+
+        Returns a dictionary mapping the stages to their StageStats.
+
+    """
+    for stage in stages:
+        if stage not in STAGES:
+            raise ValueError(f'Unknown pipeline stage: {stage!r}')
+    stages = [stage for stage in STAGES if stage in stages]
+    manifest = build_manifest.load_manifest(period)
+    versions = {stage: stage_version(stage) for stage in stages}
+    stats = {stage: StageStats(stage) for stage in stages}
+
+    # Downstream stages of each stage; stages without selected upstream
+    # stage are the roots of the DAG
+    downstream = collections.defaultdict(list)
+    roots = []
+    for stage in stages:
+        upstream = STAGES[stage].upstream
+        if upstream in stages:
+            downstream[upstream].append(stage)
+        else:
+            roots.append(stage)
+
+    # Number of unfinished upstream tasks of the period stages
+    waiting = {stage: len(indices) if STAGES[stage].upstream in stages else 0
+               for stage in stages if stage in PERIOD_STAGES}
+    upstream_failed = set()
+
+    ready = collections.deque()
+    for stage in roots:
+        if stage in PERIOD_STAGES:
+            continue
+        for index in indices:
+            ready.append((stage, index))
+    for stage, count in waiting.items():
+        if not count:
+            ready.append((stage, None))
+
+    if jobs > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(jobs)
+    else:
+        executor = SerialExecutor()
+    running = {}
+    completed = 0
+
+    def task_finished(stage, index):
+        # Schedule the downstream tasks of a finished (or skipped) task;
+        # these are run first, to get protocols through the pipeline fast
+        for next_stage in downstream[stage]:
+            if next_stage in PERIOD_STAGES:
+                waiting[next_stage] -= 1
+                if not waiting[next_stage]:
+                    ready.appendleft((next_stage, None))
+            else:
+                ready.appendleft((next_stage, index))
+
+    def task_failed(stage, index):
+        # The downstream tasks of a failed task are never run, but counted
+        # as failed; period stages depending on it are not run either, once
+        # all their upstream tasks are finished or failed
+        for next_stage in downstream[stage]:
+            if next_stage in PERIOD_STAGES:
+                upstream_failed.add(next_stage)
+                waiting[next_stage] -= 1
+                if not waiting[next_stage]:
+                    ready.appendleft((next_stage, None))
+            else:
+                print (f'Not running {task_name(next_stage, period, index)}: '
+                       f'upstream task failed')
+                stats[next_stage].failed += 1
+                task_failed(next_stage, index)
+
+    try:
+        while ready or running:
+            # Submit ready tasks, up to the number of workers
+            while ready and len(running) < max(jobs, 1):
+                stage, index = ready.popleft()
+                key = build_manifest.PERIOD_KEY if index is None else index
+                inputs, outputs = task_files(stage, period, index, indices)
+                if stage in upstream_failed:
+                    print (f'Not running {task_name(stage, period, index)}: '
+                           f'upstream tasks failed')
+                    stats[stage].failed += 1
+                    continue
+                if not force and build_manifest.is_up_to_date(
+                        manifest, stage, key, inputs, outputs,
+                        versions[stage]):
+                    stats[stage].skipped += 1
+                    task_finished(stage, index)
+                    continue
+                if verbose:
+                    print (f'Starting {task_name(stage, period, index)}')
+                stats[stage].started(time.perf_counter())
+                future = executor.submit(run_task, stage, period, index)
+                running[future] = (stage, index, key, inputs, outputs)
+
+            # Wait for tasks to finish
+            done, not_done = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage, index, key, inputs, outputs = running.pop(future)
+                try:
+                    duration = future.result()
+                except Exception as error:
+                    print (f'ERROR: {task_name(stage, period, index)} '
+                           f'failed: {error}')
+                    stats[stage].failed += 1
+                    stats[stage].finished(time.perf_counter())
+                    task_failed(stage, index)
+                    continue
+                stats[stage].done += 1
+                stats[stage].finished(time.perf_counter(), duration)
+                build_manifest.record(manifest, stage, key, inputs, outputs,
+                                      versions[stage])
+                completed += 1
+                if completed % CHECKPOINT_INTERVAL == 0:
+                    build_manifest.save_manifest(period, manifest)
+                task_finished(stage, index)
+    finally:
+        executor.shutdown()
+        build_manifest.save_manifest(period, manifest)
+    return stats
+
+def print_stats(stats):
+
+    """ Print the per stage statistics returned by run_pipeline().
+
+    """
+    print ('=' * 72)
+    print (f'{"stage":8s} {"done":>6s} {"skipped":>8s} {"failed":>7s} '
+           f'{"wall s":>9s} {"busy s":>9s} {"tasks/s":>8s}')
+    for stage, stage_stats in stats.items():
+        print (f'{stage:8s} {stage_stats.done:6d} {stage_stats.skipped:8d} '
+               f'{stage_stats.failed:7d} {stage_stats.wall_time():9.2f} '
+               f'{stage_stats.busy_time:9.2f} '
+               f'{stage_stats.throughput():8.2f}')
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Run the NRW Landtag protocol processing pipeline')
+    parser.add_argument('period', type=int)
+    parser.add_argument('indices', type=int, nargs='*')
+    parser.add_argument('--stages', default=','.join(DEFAULT_STAGES),
+                        help='comma separated list of stages to run '
+                             f'({", ".join(STAGES)})')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes')
+    parser.add_argument('--force', action='store_true',
+                        help='run tasks even if up to date')
+    parser.add_argument('--download', action='store_true',
+                        help='download new protocols first')
+    args = parser.parse_args()
+
+    period = args.period
+    if args.download:
+        data = load_data.load_period_data(period)
+        try:
+            load_data.download_period(period, data=data, discover=True)
+        finally:
+            load_data.save_period_data(period, data)
+    indices = args.indices or build_manifest.period_indices(period)
+    if not indices:
+        print (f'No protocols found for period {period}')
+        sys.exit(1)
+    stats = run_pipeline(period, indices, args.stages.split(','),
+                         jobs=args.jobs, force=args.force)
+    print_stats(stats)
+
+###
+
+if __name__ == '__main__':
+    main()
@@ -5,39 +5,21 @@
     Written by Marc-Andre Lemburg, Nov 2021
 
 """
-import json
 import feed_opensearch
-
-QUERY = json.dumps(
-    {
-        'size': 10000,
-        'query': {
-            'match': {
-                'speaker_role': {'query': 'president', 'operator': 'or'},
-                'speaker_role': {'query': 'vice-president', 'operator': 'or'},
-            }
-        },
-        'collapse': {
-            'field' : 'speaker_name.keyword'
-        },
-    }
-)
+import speaker_directory
 
 def find_all_speaker_names(os_index_name=feed_opensearch.INDEX_NAME):
-    with feed_opensearch.opensearch_client() as client:
-        result = client.search(
-            QUERY,
-            index=os_index_name,
-            )
-        #print (f'result={result!r}')
-        names = [
-            hit['_source']
-            for hit in result['hits']['hits']
-        ]
-        return sorted(names, key=lambda x: x['speaker_name'])
+
+    """ Return the speaker_directory entries of all presidents and
+        vice-presidents, sorted by speaker name.
+
+    """
+    return speaker_directory.find_speakers(
+        speaker_directory.PRESIDENT_ROLES, os_index_name=os_index_name)
 
 if __name__ == '__main__':
-    speakers = find_all_speaker_names()
-    for data in speakers:
+    client = feed_opensearch.shared_client()
+    for data in speaker_directory.iter_speakers(
+            client, speaker_directory.PRESIDENT_ROLES):
         print (f'{data["speaker_name"]!r} ({data["speaker_role"]!r}: {data["speaker_role_descr"]!r}) '
                f'({data["protocol_period"]}-{data["protocol_index"]}): {data!r}')
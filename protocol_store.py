@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+    Storage layer for protocol files.
+
+    Protocol files (downloaded documents as well as the JSON files written
+    by the processing stages) are addressed by their plain file name, e.g.
+    protocols/protocol-17-1.html; the same holds for the period output
+    files of the tagger stage, e.g. protocols/tagger/tagged_period-17.json.
+    On disk, they may be stored as is, compressed using gzip (.gz) or zstd
+    (.zst), or as member of a zip archive holding all files of a period in
+    the same directory.  Reads find the file transparently; writes use the
+    PROTOCOL_COMPRESSION setting.
+
+    Command line interface:
+
+    protocol_store.py migrate [--compression C] [--archive] [<dir> ...]
+
+        Convert the protocol files in the given directories (default: all
+        protocol directories) to compression C (gzip, zstd or none) and
+        optionally pack them into one archive per period.
+
+"""
+import os
+import re
+import io
+import gzip
+import json
+import zipfile
+import tempfile
+import argparse
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from settings import (
+    PROTOCOL_DIR,
+    PROTOCOL_FILE_TEMPLATE,
+    ARCHIVE_FILE_TEMPLATE,
+    PROTOCOL_COMPRESSION,
+    NLTK_DIR,
+    BERT_DIR,
+    TAGGER_DIR,
+    TAGGER_FILE_TEMPLATE,
+    )
+
+### Globals
+
+# Verbosity
+verbose = 0
+
+# File name suffixes used for the supported compressions
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# Suffix of temporary files written by write_atomic()
+TEMP_SUFFIX = '.tmp'
+
+# RE matching protocol file names; groups: period, index, extension
+PROTOCOL_FILE_RE = re.compile(
+    re.escape(PROTOCOL_FILE_TEMPLATE)
+    .replace('%i', r'(\d+)')
+    .replace('%s', r'(\w+)') + '$')
+
+# RE matching the names of files with the output for a whole period (e.g.
+# of the tagger stage); group: period
+PERIOD_FILE_RE = re.compile(
+    re.escape(TAGGER_FILE_TEMPLATE).replace('%i', r'(\d+)') + '$')
+
+# REs matching the names of files managed by the store; the first group
+# is the period
+STORE_FILE_RES = (PROTOCOL_FILE_RE, PERIOD_FILE_RE)
+
+# RE matching period archive names; group: period
+ARCHIVE_FILE_RE = re.compile(
+    re.escape(ARCHIVE_FILE_TEMPLATE).replace('%i', r'(\d+)') + '$')
+
+# Open archives: archive filename -> (mtime, ZipFile)
+_archives = {}
+_archives_lock = threading.Lock()
+
+### Errors
+
+class StoreError(ValueError):
+    pass
+
+###
+
+def match_store_file(name):
+
+    """ Return the match of the file name name (without directory) with
+        one of STORE_FILE_RES, or None for files not managed by the store.
+
+    """
+    for file_re in STORE_FILE_RES:
+        match = file_re.match(name)
+        if match is not None:
+            return match
+    return None
+
+def compress(content, compression):
+
+    """ Compress the bytes content using compression.
+
+        compression may be None, for no compression.
+
+    """
+    if compression is None:
+        return content
+    elif compression == 'gzip':
+        # Use a fixed mtime, so that the result only depends on content
+        return gzip.compress(content, mtime=0)
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise StoreError('zstd compression needs the zstandard package')
+        return zstandard.ZstdCompressor().compress(content)
+    raise StoreError(f'Unknown compression: {compression!r}')
+
+def decompress(content, compression):
+
+    """ Decompress the bytes content, which were compressed using
+        compression.
+
+    """
+    if compression is None:
+        return content
+    elif compression == 'gzip':
+        return gzip.decompress(content)
+    elif compression == 'zstd':
+        if zstandard is None:
+            raise StoreError('zstd compression needs the zstandard package')
+        return zstandard.ZstdDecompressor().decompress(content)
+    raise StoreError(f'Unknown compression: {compression!r}')
+
+def write_atomic(filename, content):
+
+    """ Write the bytes content to filename atomically.
+
+        The content is written to a temporary file in the same directory,
+        which then replaces filename, so that a crash never leaves a
+        partially written file behind.
+
+    """
+    dirname, basename = os.path.split(filename)
+    fd, temp_filename = tempfile.mkstemp(
+        dir=dirname or '.', prefix='.' + basename + '.', suffix=TEMP_SUFFIX)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+    except BaseException:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        raise
+
+def archive_filename(filename):
+
+    """ Return the name of the period archive which can hold filename.
+
+        Returns None for files which are neither protocol files nor period
+        output files.
+
+    """
+    dirname, basename = os.path.split(filename)
+    match = match_store_file(basename)
+    if match is None:
+        return None
+    period = int(match.group(1))
+    return os.path.join(dirname, ARCHIVE_FILE_TEMPLATE % period)
+
+def open_archive(filename):
+
+    """ Return the open ZipFile for the archive filename, or None if the
+        archive does not exist.
+
+        Archives are kept open and reopened when modified on disk.
+
+    """
+    try:
+        mtime = os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _archives_lock:
+        cached = _archives.get(filename)
+        if cached is not None:
+            if cached[0] == mtime:
+                return cached[1]
+            cached[1].close()
+        archive = zipfile.ZipFile(filename, 'r')
+        _archives[filename] = (mtime, archive)
+        return archive
+
+def close_archives():
+
+    """ Close all open archives.
+
+    """
+    with _archives_lock:
+        for mtime, archive in _archives.values():
+            archive.close()
+        _archives.clear()
+
+def stored_filename(filename):
+
+    """ Return the (filename, compression) tuple of the file storing
+        filename on disk, or (None, None) if there is no such file.
+
+        Archive members are not taken into account.
+
+    """
+    if os.path.exists(filename):
+        return filename, None
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if os.path.exists(filename + suffix):
+            return filename + suffix, compression
+    return None, None
+
+def archive_member(filename):
+
+    """ Return the (archive, member name) tuple for filename, if filename
+        is stored in its period archive, (None, None) otherwise.
+
+    """
+    archive = open_archive(archive_filename(filename) or '')
+    if archive is None:
+        return None, None
+    name = os.path.basename(filename)
+    try:
+        archive.getinfo(name)
+    except KeyError:
+        return None, None
+    return archive, name
+
+def exists(filename):
+
+    """ Return True, if filename is available in the store.
+
+    """
+    if stored_filename(filename)[0] is not None:
+        return True
+    return archive_member(filename)[0] is not None
+
+def signature(filename):
+
+    """ Return a signature of the stored file filename, which changes
+        whenever the file is changed, without reading it: the stored
+        file name with its size, modification time and inode, or for
+        archive members the archive and member name with the size and
+        CRC of the member.
+
+        Raises FileNotFoundError, if the file is not available.
+
+    """
+    path, compression = stored_filename(filename)
+    if path is not None:
+        stat = os.stat(path)
+        return [path, stat.st_size, stat.st_mtime_ns, stat.st_ino]
+    archive, name = archive_member(filename)
+    if archive is not None:
+        info = archive.getinfo(name)
+        return [archive.filename, name, info.file_size, info.CRC]
+    raise FileNotFoundError(f'Protocol file not found: {filename}')
+
+def read(filename):
+
+    """ Return the (uncompressed) bytes content of filename.
+
+        Raises FileNotFoundError, if the file is not available.
+
+    """
+    path, compression = stored_filename(filename)
+    if path is not None:
+        with open(path, 'rb') as f:
+            return decompress(f.read(), compression)
+    archive, name = archive_member(filename)
+    if archive is not None:
+        return archive.read(name)
+    raise FileNotFoundError(f'Protocol file not found: {filename}')
+
+def write(filename, content, compression=PROTOCOL_COMPRESSION):
+
+    """ Store the bytes content under filename, using compression.
+
+        Other stored variants of the file are removed, so that reads
+        always return the new content.  Entries in period archives are
+        shadowed by the written file.
+
+    """
+    suffix = COMPRESSION_SUFFIXES.get(compression, '')
+    write_atomic(filename + suffix, compress(content, compression))
+    for other_suffix in [''] + list(COMPRESSION_SUFFIXES.values()):
+        if other_suffix != suffix and os.path.exists(filename + other_suffix):
+            os.remove(filename + other_suffix)
+
+def remove(filename):
+
+    """ Remove all stored variants of filename, except archive members.
+
+    """
+    for suffix in [''] + list(COMPRESSION_SUFFIXES.values()):
+        if os.path.exists(filename + suffix):
+            os.remove(filename + suffix)
+
+def load_json(filename):
+
+    """ Load the JSON data stored under filename.
+
+    """
+    return json.loads(read(filename).decode('utf-8'))
+
+def dump_json(data, filename, compression=PROTOCOL_COMPRESSION):
+
+    """ Store data as JSON under filename.
+
+    """
+    write(filename, json.dumps(data).encode('utf-8'), compression)
+
+def listdir(dirname):
+
+    """ Return the sorted list of plain protocol and period output file
+        names available in dirname, without directory.
+
+        Compressed files and archive members are reported under their
+        plain file name.
+
+    """
+    names = set()
+    for name in os.listdir(dirname):
+        path = os.path.join(dirname, name)
+        if name.startswith('.'):
+            continue
+        for suffix in COMPRESSION_SUFFIXES.values():
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        if match_store_file(name) is not None:
+            names.add(name)
+        elif ARCHIVE_FILE_RE.match(name) is not None:
+            names.update(open_archive(path).namelist())
+    return sorted(names)
+
+def migrate(dirname, compression=PROTOCOL_COMPRESSION, archive=False):
+
+    """ Convert all protocol files in dirname to compression.
+
+        If archive is true, all files are moved into one archive per
+        period instead, using zip deflate compression.  Existing archive
+        members are kept, unless shadowed by a file on disk.
+
+        Returns the number of migrated files.
+
+    """
+    names = listdir(dirname)
+    if not archive:
+        for name in names:
+            filename = os.path.join(dirname, name)
+            path, current = stored_filename(filename)
+            if path is None or current == compression:
+                # Only in archive or nothing to do
+                continue
+            if verbose:
+                print (f'Compressing {filename} using {compression}')
+            write(filename, read(filename), compression)
+        return len(names)
+
+    # Group files by period archive
+    periods = {}
+    for name in names:
+        filename = os.path.join(dirname, name)
+        periods.setdefault(archive_filename(filename), []).append(filename)
+    for archive_name, filenames in sorted(periods.items()):
+        if verbose:
+            print (f'Packing {len(filenames)} files into {archive_name}')
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as new:
+            for filename in filenames:
+                new.writestr(os.path.basename(filename), read(filename))
+        write_atomic(archive_name, buffer.getvalue())
+        for filename in filenames:
+            remove(filename)
+    close_archives()
+    return len(names)
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='Manage the compressed protocol store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser(
+        'migrate', help='convert existing protocol directories')
+    migrate_parser.add_argument(
+        '--compression', choices=['gzip', 'zstd', 'none'],
+        default=PROTOCOL_COMPRESSION or 'none')
+    migrate_parser.add_argument(
+        '--archive', action='store_true',
+        help='pack files into one archive per period')
+    migrate_parser.add_argument(
+        'dirs', nargs='*',
+        default=[PROTOCOL_DIR, NLTK_DIR, BERT_DIR, TAGGER_DIR])
+    args = parser.parse_args()
+
+    compression = args.compression
+    if compression == 'none':
+        compression = None
+    for dirname in args.dirs:
+        if not os.path.isdir(dirname):
+            continue
+        count = migrate(dirname, compression, archive=args.archive)
+        print (f'Migrated {count} files in {dirname}')
+
+###
+
+if __name__ == '__main__':
+    main()
@@ -3,18 +3,30 @@
 Check out the single sentences of each speech for sentiments using the
 sentiment-bert.
 """
-import json
 import os
 import sys
 import time
 
 from load_data import load_period_data
+import batch
+import build_manifest
+import protocol_store
 from settings import (
     PROTOCOL_FILE_TEMPLATE,
     NLTK_DIR,
     BERT_DIR,
     )
 
+# Version of the sentiment analysis; increase when changing the output, so
+# that build_manifest.py triggers a rebuild of the BERT files
+SENTIMENT_VERSION = 1
+
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
+
+# Sentiment model, loaded on first use by sentiment_model()
+_sentiment_model = None
+
 
 def load_json_file_nltk(period: str, index: str) -> dict:
     """
@@ -24,8 +36,7 @@ def load_json_file_nltk(period: str, index: str) -> dict:
         NLTK_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        session = json.load(json_file)
+    session = protocol_store.load_json(json_filename)
 
     return session
 
@@ -38,8 +49,7 @@ def load_json_file_bert(period: str, index: str) -> dict:
         BERT_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        session = json.load(json_file)
+    session = protocol_store.load_json(json_filename)
 
     return session
 
@@ -51,7 +61,7 @@ def save_json_protocol_bert(period, index, protocol):
     filename = os.path.join(
         BERT_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
-    json.dump(protocol, open(filename, 'w', encoding='utf-8'))
+    protocol_store.dump_json(protocol, filename)
 
 
 def show_session(session: dict) -> None:
@@ -100,12 +110,22 @@ def walk_through_session_w_sentiments(session: dict) -> None:
                 continue_()
 
 
+def sentiment_model():
+    """
+    Return the sentiment model; it is only loaded once per process.
+    """
+    global _sentiment_model
+    if _sentiment_model is None:
+        from germansentiment import SentimentModel
+        _sentiment_model = SentimentModel()
+    return _sentiment_model
+
+
 def collect_speech_sentiments(session: dict) -> dict:
     start_time = time.time()
     print("start time:", time.ctime(start_time))
 
-    from germansentiment import SentimentModel
-    model = SentimentModel()
+    model = sentiment_model()
 
     session_with_sentiments = {}
     speeches_w_sentiments = []
@@ -144,24 +164,47 @@ def collect_speech_sentiments(session: dict) -> dict:
     return session_with_sentiments
 
 
-def process_whole_period_bert(period) -> None:
-    file_data = load_period_data(period)
+def process_protocol(period, index) -> None:
+    """
+    Add the sentiments to protocol period-index and save the result (used
+    by pipeline.py).
+    """
+    session = load_json_file_nltk(period, index)
+    session_w_sentiments = collect_speech_sentiments(session)
+    save_json_protocol_bert(period, index, session_w_sentiments)
+
 
-    for filename, protocol in sorted(file_data.items()):
-        if os.path.splitext(filename)[1] != '.html':
-            continue
-        index = protocol['index']
-        file_name = os.path.splitext(filename)[0] + '.json'
-        file_name = file_name.split('/')[-1]
-        file_name = os.path.join(NLTK_DIR, file_name)
+def process_whole_period_bert(period, force: bool = False) -> None:
+    """
+    Process all protocols of the period, which are outdated according to
+    the build manifest (or all of them with force=True).
+    """
+    file_data = load_period_data(period)
+    manifest = build_manifest.load_manifest(period)
+    indices = sorted(protocol['index']
+                     for filename, protocol in file_data.items()
+                     if os.path.splitext(filename)[1] == '.html')
+    if not force:
+        indices = build_manifest.outdated_protocols(
+            manifest, 'bert', period, indices, SENTIMENT_VERSION)
+
+    for index in indices:
+        file_name = os.path.join(
+            NLTK_DIR,
+            PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
         print('-' * 72)
         print(f'Processing {period}-{index}: {file_name}')
         session = load_json_file_nltk(period, index)
         session_w_sentiments = collect_speech_sentiments(session)
         save_json_protocol_bert(period, index, session_w_sentiments)
+        build_manifest.record_protocol(
+            manifest, 'bert', period, index, SENTIMENT_VERSION)
+        build_manifest.save_manifest(period, manifest)
 
 
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
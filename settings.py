@@ -19,15 +19,56 @@ PROTOCOL_FILE_TEMPLATE = 'protocol-%i-%i.%s'
 NLTK_DIR = os.path.join(PROTOCOL_DIR, 'nltk')
 BERT_DIR = os.path.join(PROTOCOL_DIR, 'bert')
 TAGGER_DIR = os.path.join(PROTOCOL_DIR, 'tagger')
+AGENDA_CACHE_DIR = os.path.join(PROTOCOL_DIR, 'agenda-cache')
+
+# Gzip compressed NDJSON bulk files exported by feed_opensearch.py, per
+# protocol or per period
+BULK_EXPORT_DIR = os.path.join(PROTOCOL_DIR, 'bulk')
+BULK_FILE_TEMPLATE = 'bulk-%i-%i.ndjson.gz'
+BULK_PERIOD_FILE_TEMPLATE = 'bulk-%i.ndjson.gz'
+
+# Compression for newly stored protocol files: None, 'gzip' or 'zstd' (the
+# latter needs the zstandard package); see protocol_store.py
+PROTOCOL_COMPRESSION = None
+
+# Archive holding all protocol files of a period in a directory
+ARCHIVE_FILE_TEMPLATE = 'protocols-%i.zip'
 username = get_username()
 TREETAGGER_DIR = f'/home/{username}/nltk_data/tree_tagger'
 
+# Optional JSON file with additional typo fixes for parse_data.py, mapping
+# the typo found at the start of a paragraph to its correction
+TYPO_FIXES_FILE = None
+
 # Period download data
 PERIOD_FILE_TEMPLATE = 'period-%i.json'
 
+# Last protocol index found per extension by the download discovery, kept
+# apart from the period download data
+DISCOVERY_FILE_TEMPLATE = 'discovery-%i.json'
+
+# Build manifest of a period, see build_manifest.py
+BUILD_MANIFEST_TEMPLATE = 'build-%i.json'
+
+# Output of the tagger stage for a period (in TAGGER_DIR)
+TAGGER_FILE_TEMPLATE = 'tagged_period-%i.json'
+
+# Save the period data after every n downloaded files
+CHECKPOINT_INTERVAL = 25
+
 # Max. number of download failures
 MAX_FAILURES = 10
 
+# Number of parallel download threads
+DOWNLOAD_WORKERS = 4
+
+# Max. number of concurrent requests per host
+MAX_HOST_CONNECTIONS = 4
+
+# Number of indices to check beyond the last protocol found when probing
+# for the end of a period (protocols are sometimes missing)
+DISCOVERY_LOOKAHEAD = 2
+
 # ## OpenSearch
 
 # Hosts to connect to
@@ -37,3 +78,21 @@ OPENSEARCH_HOSTS = [
 
 # Login for OS in the format userid:password
 OPENSEARCH_AUTH = os.environ.get('OPENSEARCH_AUTH', 'admin:admin')
+
+# Bulk indexing: number of parallel bulk requests, max. number of requests
+# sent or queued at any time and max. size of a request in documents and
+# bytes
+BULK_WORKERS = 4
+BULK_MAX_IN_FLIGHT = 8
+BULK_CHUNK_DOCS = 500
+BULK_CHUNK_BYTES = 5 * 2**20
+
+# Bulk requests rejected by OS (429/503) are retried up to BULK_MAX_RETRIES
+# times, with exponential backoff (in seconds)
+BULK_MAX_RETRIES = 5
+BULK_INITIAL_BACKOFF = 1
+BULK_MAX_BACKOFF = 60
+
+# File storing the fingerprints of the documents fed to OS per period (in
+# PROTOCOL_DIR), used for delta indexing
+FEED_FINGERPRINTS_TEMPLATE = 'feed-fingerprints-%i.json'
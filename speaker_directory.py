@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+    Directory of the speakers found in the OpenSearch index.
+
+    The speakers are read using a composite aggregation, which is paged
+    through using its after_key, so that arbitrarily many speakers can be
+    listed with bounded memory and without loading any document sources.
+
+    Command line interface:
+
+    speaker_directory.py [--presidents] [--period N]
+
+        List all speakers (or only presidents and vice-presidents) with
+        their number of paragraphs and protocols.
+
+"""
+import argparse
+import collections
+
+import feed_opensearch
+
+### Globals
+
+# Verbosity
+verbose = 0
+
+# Number of composite aggregation buckets to fetch per request
+PAGE_SIZE = 1000
+
+# Roles of the session chairs
+PRESIDENT_ROLES = ('president', 'vice-president')
+
+# Fields aggregated per speaker; the fields of the speaker must come first,
+# since the buckets of a speaker have to be adjacent
+SPEAKER_FIELDS = (
+    'speaker_name',
+    'speaker_party',
+    'speaker_role',
+    'speaker_role_descr',
+    'protocol_period',
+    'protocol_index',
+)
+
+###
+
+def speaker_query(roles=None, period=None):
+
+    """ Return the OS query selecting the paragraphs of speakers with one
+        of the given roles in period (default: all roles and periods).
+
+    """
+    filters = []
+    if roles:
+        filters.append({'terms': {'speaker_role': list(roles)}})
+    if period is not None:
+        filters.append({'term': {'protocol_period': period}})
+    if not filters:
+        return {'match_all': {}}
+    return {'bool': {'filter': filters}}
+
+def speaker_buckets(client, query, os_index_name=feed_opensearch.INDEX_NAME,
+                    page_size=PAGE_SIZE):
+
+    """ Generator yielding the composite aggregation buckets of the
+        paragraphs matching query, one per distinct combination of the
+        SPEAKER_FIELDS, ordered by these.
+
+        The buckets are fetched in pages of page_size buckets.
+
+    """
+    composite = {
+        'size': page_size,
+        'sources': [
+            {field: {'terms': {
+                'field': field,
+                # The speaker name is always set
+                'missing_bucket': field != 'speaker_name',
+            }}}
+            for field in SPEAKER_FIELDS],
+    }
+    while True:
+        body = {
+            'size': 0,
+            'query': query,
+            'aggs': {'speakers': {'composite': composite}},
+        }
+        result = client.search(body=body, index=os_index_name)
+        aggregation = result['aggregations']['speakers']
+        if verbose:
+            print (f'Fetched {len(aggregation["buckets"])} speaker buckets')
+        yield from aggregation['buckets']
+        after_key = aggregation.get('after_key')
+        if after_key is None or not aggregation['buckets']:
+            break
+        composite['after'] = after_key
+
+def speaker_entry(name, buckets):
+
+    """ Return the directory entry for the speaker name, given the
+        composite aggregation buckets of the speaker.
+
+    """
+    parties = collections.Counter()
+    roles = collections.Counter()
+    protocols = set()
+    for bucket in buckets:
+        key = bucket['key']
+        count = bucket['doc_count']
+        parties[key['speaker_party']] += count
+        roles[(key['speaker_role'], key['speaker_role_descr'])] += count
+        protocols.add((key['protocol_period'], key['protocol_index']))
+    role, role_descr = roles.most_common(1)[0][0]
+    first_protocol = min(protocols)
+    return {
+        'speaker_name': name,
+        'speaker_party': parties.most_common(1)[0][0],
+        'speaker_parties': sorted(party for party in parties if party),
+        'speaker_role': role,
+        'speaker_role_descr': role_descr,
+        'paragraphs': sum(parties.values()),
+        'protocols': len(protocols),
+        'protocol_period': first_protocol[0],
+        'protocol_index': first_protocol[1],
+        'last_protocol': max(protocols),
+    }
+
+def iter_speakers(client, roles=None, period=None,
+                  os_index_name=feed_opensearch.INDEX_NAME,
+                  page_size=PAGE_SIZE):
+
+    """ Generator yielding the directory entries of all speakers with one
+        of the given roles in period (default: all) in the OS index,
+        ordered by speaker name.
+
+        The entries are dictionaries with the speaker_name, the most
+        frequent speaker_party, speaker_role and speaker_role_descr, all
+        speaker_parties, the number of paragraphs and protocols, the
+        first protocol (protocol_period, protocol_index) and the
+        last_protocol as (period, index) tuple.
+
+    """
+    name = None
+    buckets = []
+    for bucket in speaker_buckets(client, speaker_query(roles, period),
+                                  os_index_name, page_size):
+        bucket_name = bucket['key']['speaker_name']
+        if bucket_name != name:
+            if buckets:
+                yield speaker_entry(name, buckets)
+            name = bucket_name
+            buckets = []
+        buckets.append(bucket)
+    if buckets:
+        yield speaker_entry(name, buckets)
+
+def find_speakers(roles=None, period=None,
+                  os_index_name=feed_opensearch.INDEX_NAME):
+
+    """ Return the list of directory entries of all speakers with one of
+        the given roles in period (default: all), see iter_speakers().
+
+    """
+    client = feed_opensearch.shared_client()
+    return list(iter_speakers(client, roles, period, os_index_name))
+
+def main():
+
+    parser = argparse.ArgumentParser(
+        description='List the speakers found in the OpenSearch index')
+    parser.add_argument('--presidents', action='store_true',
+                        help='only list presidents and vice-presidents')
+    parser.add_argument('--period', type=int,
+                        help='only list speakers of this period')
+    args = parser.parse_args()
+
+    roles = PRESIDENT_ROLES if args.presidents else None
+    client = feed_opensearch.shared_client()
+    for data in iter_speakers(client, roles, args.period):
+        print (f'{data["speaker_name"]!r} ({data["speaker_party"]!r}): '
+               f'{data["paragraphs"]} paragraphs in '
+               f'{data["protocols"]} protocols')
+
+###
+
+if __name__ == '__main__':
+    main()
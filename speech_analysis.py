@@ -31,7 +31,6 @@ inventory:
 
 
 """
-import json
 import nltk
 import os
 import sys
@@ -41,6 +40,8 @@ import treetaggerwrapper
 from collections import defaultdict
 
 from load_data import load_period_data
+import batch
+import protocol_store
 from settings import (
     PROTOCOL_FILE_TEMPLATE,
     NLTK_DIR,
@@ -49,6 +50,8 @@ from settings import (
     TREETAGGER_DIR,
     )
 
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
 
 tree_tagger = treetaggerwrapper.TreeTagger(TAGLANG='de', TAGDIR=TREETAGGER_DIR)
 
@@ -61,8 +64,7 @@ def load_json_file_nltk(period: str, index: str) -> dict:
         NLTK_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        session = json.load(json_file)
+    session = protocol_store.load_json(json_filename)
 
     return session
 
@@ -75,8 +77,7 @@ def load_json_file_bert(period: str, index: str) -> dict:
         BERT_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        session = json.load(json_file)
+    session = protocol_store.load_json(json_filename)
 
     return session
 
@@ -88,7 +89,7 @@ def save_json_protocol_bert(period, index, protocol):
     filename = os.path.join(
         BERT_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
-    json.dump(protocol, open(filename, 'w', encoding='utf-8'))
+    protocol_store.dump_json(protocol, filename)
 
 
 def save_json_speakers_tagger(period, speakers):
@@ -99,7 +100,7 @@ def save_json_speakers_tagger(period, speakers):
     filename = os.path.join(
         TAGGER_DIR,
         f"tagged_period-{period}.json")
-    json.dump(speakers, open(filename, 'w', encoding='utf-8'))
+    protocol_store.dump_json(speakers, filename)
 
 
 def show_session(session: dict) -> None:
@@ -324,6 +325,8 @@ def process_whole_period_bert(period) -> None:
 
 
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Segmentation of the paragraphs of a session into speeches.
+
+The agenda gives for each topic the lineup of the notified speakers, who are
+expected to take the floor in this order. segment_speeches() walks the
+paragraphs of a session once, follows the lineup and yields the speeches as
+SpeechSpan tuples with the flow indices of their paragraphs.
+Interruptions like applause, questions or the chair are edited out.
+
+The notified speaker list is built once per session and walked by position,
+instead of being sliced after each speaker.
+
+inventory:
+    - mk_notified_speaker_list(agenda: dict) -> list
+    - mk_topic_positions(speakers: list) -> list
+    - speaker_is_in_lineup(speaker: str, lineup: list) -> bool
+    - segment_speeches(paragraphs: Iterable, agenda: dict,
+                       interposed: bool) -> Iterator[SpeechSpan]
+    - is_speech(paragraph: dict) -> bool
+    - is_not_interposed_question(text: str) -> bool
+"""
+from collections import namedtuple
+from typing import Iterable, Iterator
+
+
+# Entry of the notified speaker list starting a new topic
+TOPIC_MARKER = "new topic ;;; "
+
+# A speech: the topic during the speech, the lineup entry of the speaker (or
+# the speaker's name, if the speaker took the floor out of order), the
+# speaker's name in the paragraphs, the flow indices of the paragraphs and
+# whether the speech was ended by the next speaker or the chair (False for a
+# speech still running at the end of the session)
+SpeechSpan = namedtuple('SpeechSpan', ['topic',
+                                       'speaker',
+                                       'speaker_name',
+                                       'flow_indices',
+                                       'complete'])
+
+
+def mk_notified_speaker_list(agenda: dict) -> list:
+    speakers = []
+    for key, val in agenda.items():
+        speakers.append(f"{TOPIC_MARKER}{key}")
+        speaker_list = val
+        for speaker in speaker_list:
+            speakers.append(speaker)
+
+    return speakers
+
+
+def mk_topic_positions(speakers: list) -> list:
+    """
+    Return for each entry of the mk_notified_speaker_list() speakers the
+    topic it starts, or None for the entries of the lineups.
+    """
+    return [speaker[len(TOPIC_MARKER):]
+            if speaker.startswith(TOPIC_MARKER) else None
+            for speaker in speakers]
+
+
+def speaker_is_in_lineup(speaker: str, lineup: list) -> bool:
+    for name in lineup:
+        if speaker in name:
+            return True
+    return False
+
+
+def segment_speeches(paragraphs: Iterable[dict],
+                     agenda: dict,
+                     interposed: bool = True) -> Iterator[SpeechSpan]:
+    """
+    Generator yielding the speeches of the session as SpeechSpan tuples.
+    The paragraphs are consumed once, in the order of their flow indices.
+    Using the speaker_list from agenda is needed to recognize if a paragraph
+    is part of a speech or just a question coming from another member of
+    parliament. This also allows to assign each speaker and his/her speech to
+    its topic.
+    With interposed=True, a speaker of the current lineup, who takes the
+    floor out of order with a speech (not a question), starts a new speech;
+    otherwise only the notified speakers in the order of the lineup do.
+    If this happens before the first notified speaker, an empty span
+    (speaker None, no flow indices) is yielded first.
+    The last speech is yielded with complete=False, unless it was ended.
+    The notified speaker list is walked by position, the next listed speaker
+    is None at its end.
+    """
+    speakers = mk_notified_speaker_list(agenda)
+    topics = mk_topic_positions(speakers)
+    last_position = len(speakers) - 1
+    next_topic = topics[0]
+    current_topic = next_topic  # current topic is both first and next topic
+    current_lineup = agenda[current_topic]
+
+    # first speaker will be "next" speaker in list
+    current_speaker = None
+    speaker_name = None
+    flow_indices = []
+    end_of_session = False
+
+    # the first entry was first topic
+    position = 1
+    next_listed_speaker = speakers[1] if last_position > 0 else None
+
+    for paragraph in paragraphs:
+        flow_index = paragraph['flow_index']
+        speaker = paragraph['speaker_name']
+        if current_speaker and speaker in current_speaker:
+            # same speaker for same topic
+            flow_indices.append(flow_index)
+            end_of_session = False
+        elif current_topic != next_topic:
+            if next_listed_speaker and speaker in next_listed_speaker:
+                # first speaker for new topic
+                yield SpeechSpan(current_topic, current_speaker,
+                                 speaker_name, flow_indices, True)
+                flow_indices = [flow_index]
+                current_topic = next_topic
+                current_lineup = agenda[current_topic]
+                current_speaker = next_listed_speaker
+                speaker_name = speaker
+                position += 1
+                next_listed_speaker = (speakers[position]
+                                       if position <= last_position else None)
+            elif next_topic and next_listed_speaker is None:
+                end_of_session = True
+            elif not next_topic and not next_listed_speaker and paragraph['speaker_is_chair']:  # noqa
+                end_of_session = True
+        elif next_listed_speaker and speaker in next_listed_speaker:
+            # new speaker for same topic - for the first speaker there is
+            # no current_speaker
+            if current_speaker:
+                yield SpeechSpan(current_topic, current_speaker,
+                                 speaker_name, flow_indices, True)
+            flow_indices = [flow_index]
+            current_speaker = next_listed_speaker
+            speaker_name = speaker
+            position += 1
+            if position > last_position:
+                next_listed_speaker = None
+                next_topic = None
+            else:
+                if topics[position] is not None:
+                    next_topic = topics[position]
+                    position += 1
+                next_listed_speaker = (speakers[position]
+                                       if position <= last_position else None)
+        elif next_listed_speaker and interposed:
+            if speaker_is_in_lineup(speaker, current_lineup):
+                # weed out questions w function "is_speech"
+                if is_speech(paragraph):
+                    text = paragraph["speech"]
+                    if is_not_interposed_question(text):
+                        yield SpeechSpan(current_topic, current_speaker,
+                                         speaker_name, flow_indices, True)
+                        flow_indices = [flow_index]
+                        current_speaker = speaker
+                        speaker_name = speaker
+
+    if current_speaker is not None:
+        yield SpeechSpan(current_topic, current_speaker, speaker_name,
+                         flow_indices, end_of_session)
+
+
+def is_speech(paragraph: dict) -> bool:
+    try:
+        if paragraph['speech'] is not None:
+            return True
+    except KeyError:
+        return False
+
+
+def is_not_interposed_question(text: str) -> bool:
+    """
+    To make sure that it's indeed a speech and not a question, a counter adds
+    the occurences of speech elements like addressing the chair, the colleagues
+    or the audience and lowering the weight if the text passage ends with a
+    question mark.
+    """
+    counter = 0
+    if text.endswith("?"):
+        counter -= 1
+    text = text.split()
+    for i, word in enumerate(text):
+        if "Herren!" in word:
+            counter += 1
+        elif "räsident" in word:
+            counter += 1
+        elif "Kolleginnen" in word:
+            counter += 1
+
+    if counter > 1:
+        return True
+    return False
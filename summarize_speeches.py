@@ -3,10 +3,11 @@
 Extractive summarization of speeches of single sessions. Compare with topics.
 https://becominghuman.ai/text-summarization-in-5-steps-using-nltk-65b21e352b65
 """
-import json
 import nltk
 import os
 import sys
+import logging
+import argparse
 import treetaggerwrapper
 
 from collections import defaultdict
@@ -14,6 +15,9 @@ from collections import namedtuple
 
 from nltk.corpus import stopwords
 
+from load_data import load_period_data
+import batch
+import protocol_store
 from settings import (
     PROTOCOL_FILE_TEMPLATE,
     NLTK_DIR,
@@ -23,6 +27,11 @@ from settings import (
 tree_tagger = treetaggerwrapper.TreeTagger(TAGLANG='de', TAGDIR=TREETAGGER_DIR)
 PARTIES = ["CDU", "FDP", "GRÜNE", "SPD", "AfD", "fraktionslos"]
 
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
+
+logger = logging.getLogger(__name__)
+
 
 def load_json_file_nltk(period: str, index: str) -> dict:
     """
@@ -32,8 +41,7 @@ def load_json_file_nltk(period: str, index: str) -> dict:
         NLTK_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        session = json.load(json_file)
+    session = protocol_store.load_json(json_filename)
 
     return session
 
@@ -258,6 +266,8 @@ def get_word_stems(sent: str) -> list:
 
 
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
@@ -307,6 +317,53 @@ def show_mops(mops: list, speeches: list) -> None:
             show_summary(speech, summary)
 
 
+def summarize_protocol(period, index) -> list:
+    """
+    Summarize all speeches of protocol period-index without user
+    interaction.
+    Returns a list of (speech, summary) tuples.
+    """
+    session = load_json_file_nltk(period, index)
+    speeches = mk_speeches(session)
+    summaries = []
+    for speech in speeches:
+        try:
+            summary = mk_summary(speech)
+        except ZeroDivisionError:
+            # no words left to score
+            logger.warning(f"Could not summarize speech of {speech.speaker} "
+                           f"on {speech.topic!r} in {period}-{index}")
+            continue
+        summaries.append((speech, summary))
+
+    return summaries
+
+
+def summarize_whole_period(period) -> dict:
+    """
+    Summarize the speeches of all protocols of the period without user
+    interaction. Errors don't abort the run.
+    Returns a dict mapping the protocol indices to the summarize_protocol()
+    results.
+    """
+    file_data = load_period_data(period)
+    indices = sorted(protocol['index']
+                     for filename, protocol in file_data.items()
+                     if os.path.splitext(filename)[1] == '.html')
+    summaries = {}
+    for index in indices:
+        try:
+            summaries[index] = summarize_protocol(period, index)
+        except Exception as error:
+            logger.error(f"Summarizing {period}-{index} failed: "
+                         f"{error.__class__.__name__}: {error}")
+            continue
+        logger.info(f"Summarized {len(summaries[index])} speeches "
+                    f"of {period}-{index}")
+
+    return summaries
+
+
 def show_results(topics: list, mops: list, speeches: list) -> None:
     print("Zusammenfassungen: 1 und 2")
     choice = input("1: Tagesordnungspunkte\n2: Redner\n3: Worthäufigkeiten\n4: Korrelationen\nAuswahl: ")  # noqa
@@ -322,15 +379,39 @@ def show_results(topics: list, mops: list, speeches: list) -> None:
 
 
 def main():
-    print()
-    period = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        index = int(sys.argv[2])
-        session = load_json_file_nltk(period, index)
+    """
+    Command line interface:
+    summarize_speeches.py [--batch] [--log-level LEVEL] <period> [<index>]
+        With index and not in batch mode, the summaries etc. are chosen
+        from a menu, otherwise all speeches of the protocol (or of all
+        protocols of the period) are summarized.
+    """
+    global batch_mode
+    parser = argparse.ArgumentParser(
+        description='Summarize the speeches of protocols')
+    parser.add_argument('period', type=int)
+    parser.add_argument('index', type=int, nargs='?')
+    batch.add_arguments(parser)
+    args = parser.parse_args()
+    batch.setup_logging(args.log_level)
+    batch_mode = args.batch
+
+    if args.index is None:
+        summaries = summarize_whole_period(args.period)
+    elif batch_mode:
+        summaries = {args.index: summarize_protocol(args.period, args.index)}
+    else:
+        print()
+        session = load_json_file_nltk(args.period, args.index)
         speeches = mk_speeches(session)
         topics = mk_topics(speeches)
         mops = mk_mops(speeches)
         show_results(topics, mops, speeches)
+        return
+
+    for index, protocol_summaries in summaries.items():
+        for speech, summary in protocol_summaries:
+            show_summary(speech, summary)
 
 
 if __name__ == "__main__":
@@ -2,24 +2,38 @@
 """
 
 """
-import json
 import nltk
 import os
 import sys
+import logging
+import argparse
 import treetaggerwrapper
 
 from collections import defaultdict
-from pprint import pprint
+from pprint import pformat
 
 from load_data import load_period_data
+import batch
+import build_manifest
+import protocol_store
 from settings import (
     PROTOCOL_FILE_TEMPLATE,
     NLTK_DIR,
     TAGGER_DIR,
+    TAGGER_FILE_TEMPLATE,
     TREETAGGER_DIR,
     )
 
 
+# Version of the tagger stats; increase when changing the output, so that
+# build_manifest.py triggers a rebuild of the tagger file
+TAGGER_VERSION = 1
+
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
+
+logger = logging.getLogger(__name__)
+
 tree_tagger = treetaggerwrapper.TreeTagger(TAGLANG='de', TAGDIR=TREETAGGER_DIR)
 
 
@@ -31,8 +45,7 @@ def load_json_file_nltk(period: str, index: str) -> dict:
         NLTK_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        session = json.load(json_file)
+    session = protocol_store.load_json(json_filename)
 
     return session
 
@@ -43,10 +56,9 @@ def load_json_file_tagged(period: str) -> dict:
     """
     json_filename = os.path.join(
         TAGGER_DIR,
-        f"tagged_period-{period}.json")
+        TAGGER_FILE_TEMPLATE % period)
 
-    with open(json_filename) as json_file:
-        speakers = json.load(json_file)
+    speakers = protocol_store.load_json(json_filename)
 
     return speakers
 
@@ -58,8 +70,8 @@ def save_json_speakers_tagger(period, speakers):
     """
     filename = os.path.join(
         TAGGER_DIR,
-        f"tagged_period-{period}.json")
-    json.dump(speakers, open(filename, 'w', encoding='utf-8'))
+        TAGGER_FILE_TEMPLATE % period)
+    protocol_store.dump_json(speakers, filename)
 
 
 def show_session(session: dict) -> None:
@@ -92,28 +104,24 @@ def tag_speeches(session: dict,
                 if protocol_no is None:
                     protocol_no = speech[1]
                 if protocol_no is None:
-                    print("No protocol_no!")
-                    print(speech[:5])
+                    logger.warning(f"No protocol_no: {speech[:5]}")
                     continue_()
                 speaker = speech[3]
                 party = speech[4]
                 if party:
                     owner = speaker + ";;;" + party
                 else:
-                    print("president?")
-                    print(speaker, party)
-                    print(speech)
+                    logger.warning(f"No party, president? {speaker}: "
+                                   f"{speech[:5]}")
                     continue_()
                     owner = speaker + ";;;"
                 speaker_speeches[owner] += 1
-                if 1:
-                    print()
-                    print("Datum:", speech[0])
-                    print("Protokollnr.:", speech[1])
-                    print("Tagesordnungspunkt:", speech[2])
-                    print("Redner:", speaker)
-                    print("Partei/Ministerium:", party)
-                    continue_()
+                logger.debug(f"Datum: {speech[0]}, "
+                             f"Protokollnr.: {speech[1]}, "
+                             f"Tagesordnungspunkt: {speech[2]}, "
+                             f"Redner: {speaker}, "
+                             f"Partei/Ministerium: {party}")
+                continue_()
                 text = speech[5]
                 for i, sent in enumerate(text):
                     sent_length = len(sent.split())
@@ -121,8 +129,8 @@ def tag_speeches(session: dict,
                     tokenized_sent = nltk.tokenize.word_tokenize(sent, language='german')  # noqa
                     tags = tree_tagger.tag_text(tokenized_sent, tagonly=True)
                     tags2 = treetaggerwrapper.make_tags(tags)
-                    if 1:
-                        pprint(tags2)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(pformat(tags2))
                     for tag in tags2:
                         if tag.pos in invalid_tag_pos:
                             pass
@@ -134,32 +142,53 @@ def tag_speeches(session: dict,
                             else:
                                 tag_lemma = tag.lemma
                             speaker_words[owner].append(tag_lemma)
-                if 1:
-                    continue_()
-
-    if 1:
-        for key, val in speaker_words.items():
-            print(key)
-            print("Wortschatz:", len(set(val)))
-            for k, v in speaker_speeches.items():
-                if key == k:
-                    print("Anzahl der Reden:", v)
-            for k, v in sent_lengths.items():
-                if key == k:
-                    print("Längster Satz:", max(v))
-                    print(f"Durchschnittliche Satzlänge: {sum(v)/len(v):.02f}")
-            print()
+                continue_()
 
     return speaker_words, speaker_speeches, sent_lengths
 
 
+def speaker_stats(speaker_words: dict,
+                  speaker_speeches: dict,
+                  sent_lengths: dict) -> dict:
+    """
+    Summarize the results of tag_speeches() per speaker: the vocabulary,
+    the number of speeches, the longest sentence and the average sentence
+    length.
+    """
+    speakers = {}
+    for key, val in speaker_words.items():
+        speakers[key] = {"Wortschatz": len(set(val))}
+        if key in speaker_speeches:
+            speakers[key]["Anzahl der Reden"] = speaker_speeches[key]
+        if key in sent_lengths:
+            v = sent_lengths[key]
+            speakers[key]["Längster Satz"] = max(v)
+            speakers[key]["Durchschnittliche Satzlänge"] = round(sum(v)/len(v), 2)  # noqa
+
+    return speakers
+
+
+def show_speaker_stats(speakers: dict) -> None:
+    for key, val in speakers.items():
+        print(key)
+        for k, v in val.items():
+            if k == "Durchschnittliche Satzlänge":
+                print(f"{k}: {v:.02f}")
+            else:
+                print(f"{k}: {v}")
+        print()
+
+
 def tag_whole_period(period) -> dict:
+    """
+    Tag the speeches of all protocols of the period.
+    Returns the speaker_stats() of the period.
+    """
     file_data = load_period_data(period)
 
     speaker_words = defaultdict(list)
     speaker_speeches = defaultdict(int)
     sent_lengths = defaultdict(list)
-    speakers = {}
 
     for filename, protocol in sorted(file_data.items()):
         if os.path.splitext(filename)[1] != '.html':
@@ -169,32 +198,53 @@ def tag_whole_period(period) -> dict:
         file_name = file_name.split('/')[-1]
         file_name = os.path.join(NLTK_DIR, file_name)
         session = load_json_file_nltk(period, index)
-        print('-' * 72)
-        print(f'Tagging {period}-{index}: {file_name}')
+        logger.info(f'Tagging {period}-{index}: {file_name}')
         speaker_words, speaker_speeches, sent_lengths = tag_speeches(session,
                                                                      speaker_words,  # noqa
                                                                      speaker_speeches,  # noqa
                                                                      sent_lengths)  # noqa
 
-    for key, val in speaker_words.items():
-        print(key)
-        print("Wortschatz:", len(set(val)))
-        speakers[key] = {"Wortschatz": len(set(val))}
-        for k, v in speaker_speeches.items():
-            if key == k:
-                print("Anzahl der Reden:", v)
-                speakers[key]["Anzahl der Reden"] = v
-        for k, v in sent_lengths.items():
-            if key == k:
-                print("Längster Satz:", max(v))
-                print(f"Durchschnittliche Satzlänge: {sum(v)/len(v):.02f}")
-                speakers[key]["Längster Satz"] = max(v)
-                speakers[key]["Durchschnittliche Satzlänge"] = round(sum(v)/len(v), 2)  # noqa
-        print()
+    speakers = speaker_stats(speaker_words, speaker_speeches, sent_lengths)
+    logger.info(f'Tagged the speeches of {len(speakers)} speakers '
+                f'in period {period}')
+    return speakers
 
+
+def tag_and_save_period(period) -> dict:
+    """
+    Tag the whole period and save the results (used by pipeline.py).
+    Returns the speaker_stats() of the period.
+    """
+    speakers = tag_whole_period(period)
+    save_json_speakers_tagger(period, speakers)
     return speakers
 
 
+def update_tagged_period(period, force: bool = False) -> bool:
+    """
+    Tag the whole period and save the results, unless the tagger file is
+    up to date according to the build manifest (or force=True).
+    Returns True, if the period was tagged.
+    """
+    file_data = load_period_data(period)
+    indices = sorted(protocol['index']
+                     for filename, protocol in file_data.items()
+                     if os.path.splitext(filename)[1] == '.html')
+    inputs, outputs = build_manifest.tagger_files(period, indices)
+    manifest = build_manifest.load_manifest(period)
+    if not force and build_manifest.is_up_to_date(
+            manifest, 'tagger', build_manifest.PERIOD_KEY,
+            inputs, outputs, TAGGER_VERSION):
+        logger.info(f"Tagger results for period {period} are up to date")
+        return False
+
+    tag_and_save_period(period)
+    build_manifest.record(manifest, 'tagger', build_manifest.PERIOD_KEY,
+                          inputs, outputs, TAGGER_VERSION)
+    build_manifest.save_manifest(period, manifest)
+    return True
+
+
 def show_general_stats_about_speakers(period) -> None:
     speakers = load_json_file_tagged(period)
     index = 1
@@ -323,40 +373,76 @@ def show_hi_low_avg_length_of_sentences(period) -> None:
 
 
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
 
 
-def show_results(period: str) -> None:
-    print()
-    choice = input("1: Stats für alle Redner\n2: Highscores\n3: Durchschnitte\nAuswahl: ")  # noqa
-    if choice == "1":
-        show_general_stats_about_speakers(period)
-    if choice == "2":
-        show_highscore_vocabulary(period)
-    if choice == "3":
-        show_hi_low_avg_length_of_sentences(period)
+# Results shown by show_results(), by menu choice
+RESULTS = {
+    "1": show_general_stats_about_speakers,
+    "2": show_highscore_vocabulary,
+    "3": show_hi_low_avg_length_of_sentences,
+}
 
 
-def main():
-    period = int(sys.argv[1])
+def show_results(period: str, choice: str = None) -> None:
+    """
+    Show the results chosen from the menu (1, 2 or 3); the user is only
+    asked for the choice, if not given and not in batch mode.
+    """
+    if choice is None:
+        if not batch.can_prompt(batch_mode):
+            logger.error("No results chosen for showing in batch mode")
+            return
+        print()
+        choice = input("1: Stats für alle Redner\n2: Highscores\n3: Durchschnitte\nAuswahl: ")  # noqa
+    if choice in RESULTS:
+        RESULTS[choice](period)
 
-    if len(sys.argv) > 2:
-        index = int(sys.argv[2])
-        session = load_json_file_nltk(period, index)
+
+def main():
+    """
+    Command line interface:
+    tagger_speech_analysis.py [--batch] [--log-level LEVEL] <period> <index>
+        Tag the speeches of a protocol and show the stats per speaker.
+    tagger_speech_analysis.py [--batch] [--log-level LEVEL] [--force]
+                              --tag <period>
+        Tag the whole period and save the results, if outdated.
+    tagger_speech_analysis.py [--batch] [--log-level LEVEL]
+                              [--show CHOICE] <period>
+        Show the saved results of the period (choice from the menu).
+    """
+    global batch_mode
+    parser = argparse.ArgumentParser(
+        description='Tag the speeches of protocols with TreeTagger')
+    parser.add_argument('period', type=int)
+    parser.add_argument('index', type=int, nargs='?')
+    parser.add_argument('--tag', action='store_true',
+                        help='tag the whole period and save the results')
+    parser.add_argument('--force', action='store_true',
+                        help='tag the period even if up to date')
+    parser.add_argument('--show', choices=sorted(RESULTS),
+                        help='results to show (default: ask)')
+    batch.add_arguments(parser)
+    args = parser.parse_args()
+    batch.setup_logging(args.log_level)
+    batch_mode = args.batch
+
+    if args.index is not None:
+        session = load_json_file_nltk(args.period, args.index)
         if 0:
             show_session(session)
-        if 1:
-            speaker_words = defaultdict(list)
-            speaker_speeches = defaultdict(int)
-            sent_lengths = defaultdict(list)
-            tag_speeches(session, speaker_words, speaker_speeches, sent_lengths)  # noqa
-    elif 0:
-        speakers = tag_whole_period(period)
-        save_json_speakers_tagger(period, speakers)
-    elif 1:
-        show_results(period)
+        speaker_words, speaker_speeches, sent_lengths = tag_speeches(
+            session, defaultdict(list), defaultdict(int), defaultdict(list))
+        show_speaker_stats(speaker_stats(speaker_words, speaker_speeches,
+                                         sent_lengths))
+    elif args.tag:
+        update_tagged_period(args.period, force=args.force)
+    else:
+        show_results(args.period, args.show)
 
 
 if __name__ == "__main__":
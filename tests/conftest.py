@@ -1,4 +1,10 @@
 # https://stackoverflow.com/a/35394239/6597765
+import os
+import shutil
+
+import pytest
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
 
 pytest_plugins = [
     'plugins.initial_plugin',
@@ -31,3 +37,15 @@ def pytest_unconfigure(config):
     """
     called before test process is exited.
     """
+
+
+@pytest.fixture
+def fixture_protocols(tmp_path, monkeypatch):
+    """
+    Copy the fixture protocols to a temporary "protocols" directory and run
+    the test from its parent directory.
+    """
+    shutil.copytree(os.path.join(FIXTURE_DIR, 'protocols'),
+                    tmp_path / 'protocols')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / 'protocols'
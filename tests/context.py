@@ -14,3 +14,16 @@ sys.path.append(
 from agenda_and_speaker_list import (  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
     mk_agenda_list_w_speakers,
 )  # pylint: disable=unused-import  # noqa
+import load_data  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import protocol_store  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import parse_data  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import mk_paragraphs_to_sents  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import agenda_and_speaker_list  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import build_manifest  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import pipeline  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import feed_opensearch  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import speaker_directory  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import batch  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import speech_segmentation  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import visualize_agenda_and_speakers  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
+import collect_speeches  # type: ignore # isort:skip # noqa # pylint: disable=unused-import, wrong-import-position
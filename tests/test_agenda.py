@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 """Tests for agenda_and_speaker_list.py"""
 from context import mk_agenda_list_w_speakers
+from context import agenda_and_speaker_list
 
 
 def test_agenda_is_dict():
@@ -27,3 +28,55 @@ def test_agenda_has_one_item_w_numbering():
     assert len(agenda) == 1
     for k, v in agenda.items():
         assert k[0].isnumeric()
+
+
+def test_agenda_cache(fixture_protocols, monkeypatch):
+    stats = {'hits': 0, 'misses': 0}
+    monkeypatch.setattr(agenda_and_speaker_list, 'cache_stats', stats)
+    agenda = mk_agenda_list_w_speakers(17, 1)
+    assert len(agenda) == 2
+    assert (fixture_protocols / 'agenda-cache' / 'protocol-17-1.json').exists()
+    assert mk_agenda_list_w_speakers(17, 1) == agenda
+    assert stats == {'hits': 1, 'misses': 1}
+
+    # Changed HTML invalidates the entry
+    html_file = fixture_protocols / 'protocol-17-1.html'
+    html_file.write_bytes(html_file.read_bytes().replace(
+        b'Bodo L\xc3\xb6ttgen (CDU) 5', b'Bodo L\xc3\xb6ttgen (CDU) 9'))
+    agenda = mk_agenda_list_w_speakers(17, 1)
+    assert 'Bodo Löttgen (CDU) 9' in agenda['1 Gesetz zur Stärkung der Kommunen']
+    assert stats == {'hits': 1, 'misses': 2}
+
+    # So do changed agenda rules
+    monkeypatch.setattr(agenda_and_speaker_list, 'AGENDA_VERSION',
+                        agenda_and_speaker_list.AGENDA_VERSION + 1)
+    assert mk_agenda_list_w_speakers(17, 1) == agenda
+    assert mk_agenda_list_w_speakers(17, 1) == agenda
+    assert stats == {'hits': 2, 'misses': 3}
+
+
+def test_agenda_cache_hit_does_not_read_html(fixture_protocols, monkeypatch):
+    stats = {'hits': 0, 'misses': 0}
+    monkeypatch.setattr(agenda_and_speaker_list, 'cache_stats', stats)
+    agenda = mk_agenda_list_w_speakers(17, 1)
+    html_reads = []
+    read = agenda_and_speaker_list.protocol_store.read
+
+    def counting_read(filename):
+        if filename.endswith('.html'):
+            html_reads.append(filename)
+        return read(filename)
+
+    monkeypatch.setattr(agenda_and_speaker_list.protocol_store, 'read',
+                        counting_read)
+    assert mk_agenda_list_w_speakers(17, 1) == agenda
+    assert html_reads == []
+    assert stats == {'hits': 1, 'misses': 1}
+
+    # A touched HTML file is hashed once, but the agenda is not rebuilt
+    html_file = fixture_protocols / 'protocol-17-1.html'
+    html_file.write_bytes(html_file.read_bytes())
+    assert mk_agenda_list_w_speakers(17, 1) == agenda
+    assert mk_agenda_list_w_speakers(17, 1) == agenda
+    assert len(html_reads) == 1
+    assert stats == {'hits': 3, 'misses': 1}
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for batch.py"""
+import argparse
+import io
+import logging
+
+from context import batch
+
+
+class Terminal(io.StringIO):
+    """
+    Stand-in for stdin connected to a terminal.
+    """
+    def isatty(self):
+        return True
+
+
+def test_can_prompt(monkeypatch):
+    monkeypatch.setattr('sys.stdin', Terminal())
+    assert batch.can_prompt(False)
+    assert not batch.can_prompt(True)
+    # e.g. run from cron
+    monkeypatch.setattr('sys.stdin', io.StringIO())
+    assert not batch.can_prompt(False)
+    monkeypatch.setattr('sys.stdin', None)
+    assert not batch.can_prompt(False)
+
+
+def test_add_arguments():
+    parser = argparse.ArgumentParser()
+    batch.add_arguments(parser)
+    args = parser.parse_args([])
+    assert (args.batch, args.log_level) == (False, batch.LOG_LEVEL)
+    args = parser.parse_args(['--batch', '--log-level', 'off'])
+    assert (args.batch, args.log_level) == (True, 'off')
+
+
+def test_setup_logging_off(caplog):
+    logger = logging.getLogger('test_batch')
+    try:
+        batch.setup_logging('off')
+        logger.error('hidden')
+        assert not caplog.records
+    finally:
+        batch.setup_logging('warning')
+    logger.error('shown')
+    assert [record.message for record in caplog.records] == ['shown']
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for build_manifest.py"""
+from context import build_manifest
+from context import parse_data
+
+
+def test_manifest_records_hashes(fixture_protocols):
+    manifest = {}
+    assert build_manifest.outdated_protocols(
+        manifest, 'parse', 17, [1], 1) == [1]
+    parse_data.process_protocol(17, 1)
+    build_manifest.record_protocol(manifest, 'parse', 17, 1, 1)
+    build_manifest.save_manifest(17, manifest)
+
+    manifest = build_manifest.load_manifest(17)
+    entry = manifest['parse']['1']
+    assert entry['version'] == '1'
+    assert list(entry['inputs']) == ['protocols/protocol-17-1.html']
+    assert list(entry['outputs']) == ['protocols/protocol-17-1.json']
+    assert build_manifest.outdated_protocols(
+        manifest, 'parse', 17, [1], 1) == []
+    assert build_manifest.outdated_protocols(
+        manifest, 'parse', 17, [1], 2) == [1]
+
+    # Changed outputs are rebuilt as well
+    (fixture_protocols / 'protocol-17-1.json').unlink()
+    assert build_manifest.outdated_protocols(
+        manifest, 'parse', 17, [1], 1) == [1]
+
+
+def test_incremental_parse(fixture_protocols, monkeypatch):
+    indices, errors = parse_data.update_period(17, [1, 3])
+    assert indices == [1, 3]
+    assert list(errors) == [3]
+
+    # Failed protocols are retried, parsed ones are skipped
+    indices, errors = parse_data.update_period(17, [1, 3])
+    assert indices == [3]
+
+    # Changed inputs
+    html_file = fixture_protocols / 'protocol-17-1.html'
+    html_file.write_bytes(html_file.read_bytes() + b'\n')
+    indices, errors = parse_data.update_period(17, [1, 3])
+    assert indices == [1, 3]
+
+    # Changed parser
+    monkeypatch.setattr(parse_data, 'PARSER_VERSION',
+                        parse_data.PARSER_VERSION + 1)
+    assert parse_data.update_period(17, [1])[0] == [1]
+    assert parse_data.update_period(17, [1])[0] == []
+    assert parse_data.update_period(17, [1], force=True)[0] == [1]
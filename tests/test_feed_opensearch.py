@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for feed_opensearch.py"""
+import json
+
+import opensearchpy
+from opensearchpy.serializer import JSONSerializer
+
+from context import build_manifest
+from context import feed_opensearch
+from context import parse_data
+from context import protocol_store
+
+
+class RecordingIndices:
+    def __init__(self):
+        self.templates = []
+        self.settings = {}
+        self.calls = []
+
+    def put_index_template(self, name, body):
+        self.templates.append(name)
+
+    def exists(self, index):
+        return index in self.settings
+
+    def create(self, index):
+        self.calls.append('create')
+        self.settings[index] = {'number_of_replicas': '1'}
+
+    def get_settings(self, index):
+        return {index: {'settings': {'index': dict(self.settings[index])}}}
+
+    def put_settings(self, index, body):
+        self.calls.append(dict(body['index']))
+        for name, value in body['index'].items():
+            if value is None:
+                self.settings[index].pop(name, None)
+            else:
+                self.settings[index][name] = value
+
+    def refresh(self, index):
+        self.calls.append('refresh')
+
+
+class RecordingTransport:
+    serializer = JSONSerializer()
+
+
+class RecordingClient:
+    """
+    Local stand-in for the OpenSearch client, which records the bulk
+    requests and fails the documents with IDs in fail_ids.
+    """
+    def __init__(self, fail_ids=(), reject_requests=0, reject_ids=()):
+        self.reject_requests = reject_requests
+        self.reject_ids = set(reject_ids)
+        self.indices = RecordingIndices()
+        self.transport = RecordingTransport()
+        self.fail_ids = set(fail_ids)
+        self.requests = []
+        self.documents = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def bulk(self, body, **kws):
+        if self.reject_requests:
+            self.reject_requests -= 1
+            raise opensearchpy.TransportError(429, 'rejected', {})
+        lines = iter(body.decode('utf-8').splitlines())
+        items = []
+        for action in lines:
+            op_type, meta = next(iter(json.loads(action).items()))
+            if op_type == 'delete':
+                status = 200 if self.documents.pop(meta['_id'], None) else 404
+                items.append({op_type: {'_id': meta['_id'], 'status': status}})
+                continue
+            source = next(lines)
+            if meta['_id'] in self.reject_ids:
+                # Rejected once
+                self.reject_ids.remove(meta['_id'])
+                items.append({op_type: {'_id': meta['_id'], 'status': 429}})
+                continue
+            if meta['_id'] in self.fail_ids:
+                items.append({op_type: {'_id': meta['_id'], 'status': 400,
+                                        'error': 'rejected'}})
+                continue
+            self.documents[meta['_id']] = json.loads(source)
+            items.append({op_type: {'_id': meta['_id'], 'status': 201}})
+        self.requests.append(len(items))
+        return {'errors': bool(self.fail_ids), 'items': items}
+
+
+def parse_protocols(fixture_protocols):
+    parse_data.process_protocol(17, 1)
+    # Protocol without paragraphs
+    protocol = protocol_store.load_json(
+        str(fixture_protocols / 'protocol-17-1.json'))
+    protocol['protocol_index'] = 2
+    protocol['content'] = []
+    protocol_store.dump_json(
+        protocol, str(fixture_protocols / 'protocol-17-2.json'))
+    return len(protocol_store.load_json(
+        str(fixture_protocols / 'protocol-17-1.json'))['content'])
+
+
+def test_feed_protocols_tracks_protocols(fixture_protocols):
+    count = parse_protocols(fixture_protocols)
+    client = RecordingClient()
+    results = list(feed_opensearch.feed_protocols(
+        client, 17, [2, 1, 2, 1], workers=4, chunk_docs=3))
+    assert results == [(2, []), (1, []), (2, []), (1, [])]
+    assert sum(client.requests) == 2 * count
+    assert client.documents['p-17-1-1']['protocol_index'] == 1
+
+
+def test_process_period_uses_one_client(fixture_protocols, monkeypatch):
+    count = parse_protocols(fixture_protocols)
+    clients = []
+
+    def recording_client():
+        clients.append(RecordingClient(fail_ids=['p-17-1-1']))
+        return clients[-1]
+
+    monkeypatch.setattr(feed_opensearch, 'opensearch_client',
+                        recording_client)
+    failed = feed_opensearch.process_period(17, indices=[1, 2])
+    assert failed == [1]
+    assert len(clients) == 1
+    client = clients[0]
+    assert client.indices.templates == [feed_opensearch.INDEX_NAME]
+    assert len(client.documents) == count - 1
+
+    # Only failed protocols are fed again
+    manifest = build_manifest.load_manifest(17)
+    assert list(manifest['feed']) == ['2']
+    clients.clear()
+    feed_opensearch.process_period(17, indices=[1, 2])
+    assert len(clients[0].documents) == count - 1
+
+
+def test_process_protocol_registers_template_once(fixture_protocols):
+    parse_protocols(fixture_protocols)
+    client = RecordingClient()
+    feed_opensearch.process_protocol(17, 1, client=client)
+    feed_opensearch.process_protocol(17, 2, client=client)
+    assert client.indices.templates == [feed_opensearch.INDEX_NAME]
+
+
+def test_parallel_bulk_chunks_and_retries(fixture_protocols):
+    count = parse_protocols(fixture_protocols)
+    client = RecordingClient(reject_requests=1,
+                             reject_ids=['p-17-1-2', 'p-17-1-20'])
+    stats = feed_opensearch.BulkStats()
+    results = list(feed_opensearch.feed_protocols(
+        client, 17, [1], stats=stats, workers=1, chunk_docs=5,
+        initial_backoff=0))
+    assert results == [(1, [])]
+    assert len(client.documents) == count
+    assert max(client.requests) == 5
+    assert stats.docs == count
+    assert stats.failed == 0
+    assert stats.rejected == 5 + 2
+    assert stats.retried == 5 + 2
+
+
+def test_chunk_bulk_actions_limits_bytes():
+    actions = [{'_index': 'test', '_id': str(i), 'text': 'x' * 100}
+               for i in range(10)]
+    chunks = list(feed_opensearch.chunk_bulk_actions(
+        actions, chunk_docs=4, chunk_bytes=300))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2, 2, 2]
+    chunks = list(feed_opensearch.chunk_bulk_actions(
+        actions, chunk_docs=4, chunk_bytes=10))
+    assert [len(chunk) for chunk in chunks] == [1] * 10
+    assert b''.join(chunks[0]).splitlines()[0] == (
+        b'{"index":{"_index":"test","_id":"0"}}')
+
+
+def test_bulk_load_settings_are_restored(fixture_protocols, monkeypatch):
+    parse_protocols(fixture_protocols)
+    client = RecordingClient(fail_ids=['p-17-1-1'])
+    monkeypatch.setattr(feed_opensearch, 'opensearch_client', lambda: client)
+    feed_opensearch.process_period(17, indices=[1], bulk_load=True)
+    assert client.indices.calls == [
+        'create',
+        {'refresh_interval': '-1', 'number_of_replicas': 0},
+        {'refresh_interval': None, 'number_of_replicas': '1'},
+        'refresh',
+    ]
+    assert client.indices.settings[feed_opensearch.INDEX_NAME] == {
+        'number_of_replicas': '1'}
+
+    # Settings are restored on errors as well
+    client.indices.calls.clear()
+    client.reject_requests = 1
+    try:
+        feed_opensearch.process_period(
+            17, indices=[1], bulk_load=True, max_retries=0)
+    except opensearchpy.TransportError:
+        pass
+    else:
+        assert False, 'rejected request not reported'
+    assert client.indices.calls[-2:] == [
+        {'refresh_interval': None, 'number_of_replicas': '1'},
+        'refresh',
+    ]
+
+
+def test_delta_feed_sends_changes_only(fixture_protocols, monkeypatch):
+    count = parse_protocols(fixture_protocols)
+    client = RecordingClient()
+    monkeypatch.setattr(feed_opensearch, 'opensearch_client', lambda: client)
+    feed_opensearch.process_period(17, indices=[1], delta=True)
+    assert len(client.documents) == count
+
+    # Nothing is sent for unchanged protocols
+    client.requests.clear()
+    feed_opensearch.process_period(17, indices=[1], delta=True, force=True)
+    assert client.requests == []
+
+    # Changed paragraphs are sent, removed ones deleted
+    filename = str(fixture_protocols / 'protocol-17-1.json')
+    protocol = protocol_store.load_json(filename)
+    protocol['content'][0]['speech'] = 'Geändert'
+    del protocol['content'][-1]
+    protocol_store.dump_json(protocol, filename)
+    stats = feed_opensearch.BulkStats()
+    fingerprints = feed_opensearch.load_fingerprints(17)
+    results = list(feed_opensearch.feed_protocols(
+        client, 17, [1], stats=stats, fingerprints=fingerprints, delta=True))
+    assert results == [(1, [])]
+    assert client.requests == [2]
+    assert (stats.new, stats.changed, stats.unchanged, stats.deleted) == (
+        0, 1, count - 2, 1)
+    assert client.documents['p-17-1-1']['speech'] == 'Geändert'
+    assert len(client.documents) == count - 1
+    assert len(fingerprints[feed_opensearch.INDEX_NAME]['1']) == count - 1
+
+
+def test_delta_feed_resends_after_version_change(fixture_protocols,
+                                                 monkeypatch):
+    count = parse_protocols(fixture_protocols)
+    client = RecordingClient()
+    monkeypatch.setattr(feed_opensearch, 'opensearch_client', lambda: client)
+    feed_opensearch.process_period(17, indices=[1], delta=True)
+
+    # All paragraphs are sent again to another OS index
+    client.documents.clear()
+    feed_opensearch.process_period(17, indices=[1], delta=True, force=True,
+                                   os_index_name='test')
+    assert len(client.documents) == count
+
+    # ... and after a version change, also unchanged ones
+    monkeypatch.setattr(feed_opensearch, 'FEED_VERSION',
+                        feed_opensearch.FEED_VERSION + 1)
+    client.documents.clear()
+    feed_opensearch.process_period(17, indices=[1], delta=True)
+    assert len(client.documents) == count
+    client.requests.clear()
+    feed_opensearch.process_period(17, indices=[1], delta=True, force=True)
+    assert client.requests == []
+
+    # Removed paragraphs are still deleted after a version change
+    filename = str(fixture_protocols / 'protocol-17-1.json')
+    protocol = protocol_store.load_json(filename)
+    del protocol['content'][-1]
+    protocol_store.dump_json(protocol, filename)
+    monkeypatch.setattr(feed_opensearch, 'FEED_VERSION',
+                        feed_opensearch.FEED_VERSION + 1)
+    stats = feed_opensearch.BulkStats()
+    fingerprints = feed_opensearch.load_fingerprints(17)
+    results = list(feed_opensearch.feed_protocols(
+        client, 17, [1], stats=stats, fingerprints=fingerprints, delta=True))
+    assert results == [(1, [])]
+    assert (stats.new, stats.changed, stats.unchanged, stats.deleted) == (
+        count - 1, 0, 0, 1)
+    assert len(client.documents) == count - 1
+
+
+def test_bulk_insert_lines_match_generator(fixture_protocols):
+    parse_protocols(fixture_protocols)
+    protocol = protocol_store.load_json(
+        str(fixture_protocols / 'protocol-17-1.json'))
+    # Paragraph attributes overriding global ones
+    protocol['content'][1]['protocol_title'] = 'Überschrieben'
+    protocol['content'].append({'flow_index': 99})
+    expected = [
+        (action['_id'], feed_opensearch.serialize_bulk_action(action))
+        for action in feed_opensearch.bulk_insert_generator(protocol, 'test')]
+    assert list(feed_opensearch.bulk_insert_lines(protocol, 'test')) == (
+        expected)
+
+
+def test_export_and_replay(fixture_protocols, tmp_path):
+    count = parse_protocols(fixture_protocols)
+    client = RecordingClient()
+    list(feed_opensearch.feed_protocols(client, 17, [1, 2]))
+
+    dirname = str(tmp_path / 'bulk')
+    filenames = feed_opensearch.export_period(17, [1, 2], dirname)
+    assert [name[len(dirname) + 1:] for name in filenames] == [
+        'bulk-17-1.ndjson.gz', 'bulk-17-2.ndjson.gz']
+    replay_client = RecordingClient()
+    stats = feed_opensearch.BulkStats()
+    failed = feed_opensearch.replay_bulk_files(
+        replay_client, filenames, stats, chunk_docs=7)
+    assert failed == []
+    assert stats.docs == count
+    assert replay_client.documents == client.documents
+
+    filenames = feed_opensearch.export_period(
+        17, [1, 2], dirname, per_period=True)
+    assert len(list(feed_opensearch.read_bulk_file(filenames[0]))) == count
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for load_data.py"""
+import hashlib
+import http.server
+import threading
+
+import pytest
+import requests
+
+from context import load_data
+
+
+class ProtocolHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the fixture files of the stand-in Landtag server."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.rsplit('/', 1)[-1]
+        with server.lock:
+            server.requests.append(('GET', name))
+            server.connections.add(self.client_address)
+            if name in server.broken:
+                # Simulate a network failure
+                self.close_connection = True
+                return
+        body = server.files.get(name)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            with server.lock:
+                server.requests.append(('304', name))
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Wed, 01 Dec 2021 10:00:00 GMT')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        server = self.server
+        name = self.path.rsplit('/', 1)[-1]
+        with server.lock:
+            server.requests.append(('HEAD', name))
+        if not server.allow_head:
+            self.send_response(405)
+        elif name in server.files:
+            self.send_response(200)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), ProtocolHandler)
+    httpd.daemon_threads = True
+    httpd.files = {}
+    httpd.allow_head = True
+    httpd.broken = set()
+    httpd.requests = []
+    httpd.connections = set()
+    httpd.lock = threading.Lock()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def protocol_dir(tmp_path, monkeypatch, server):
+    host, port = server.server_address
+    monkeypatch.setattr(load_data, 'BASE_URL', f'http://{host}:{port}/')
+    monkeypatch.setattr(load_data, 'PROTOCOL_DIR', str(tmp_path))
+    monkeypatch.setattr(load_data, 'MAX_FAILURES', 3)
+    return tmp_path
+
+
+def add_protocols(server, period, indices, extension='html'):
+    for index in indices:
+        name = f'MMP{period}-{index}.{extension}'
+        server.files[name] = f'<html>{period}-{index}</html>'.encode()
+
+
+def test_concurrent_download_matches_sequential(server, protocol_dir):
+    add_protocols(server, 17, range(1, 25))
+    sequential = load_data.download_period(
+        17, extensions=('html',), workers=1)
+    for path in protocol_dir.iterdir():
+        path.unlink()
+    concurrent = load_data.download_period(
+        17, extensions=('html',), workers=8)
+    assert concurrent == sequential
+    assert sorted(v['index'] for v in concurrent.values()) == list(range(1, 25))
+    assert (protocol_dir / 'protocol-17-7.html').read_bytes() == \
+        b'<html>17-7</html>'
+
+
+def test_end_of_period_detection(server, protocol_dir):
+    # A gap of MAX_FAILURES missing protocols is tolerated, a longer one
+    # ends the period
+    add_protocols(server, 17, [1, 2, 6, 7, 12, 13])
+    data = load_data.download_period(17, extensions=('html',), workers=4)
+    assert sorted(v['index'] for v in data.values()) == [1, 2, 6, 7]
+    assert not (protocol_dir / 'protocol-17-12.html').exists()
+
+
+def test_existing_files_are_skipped(server, protocol_dir):
+    add_protocols(server, 17, range(1, 5))
+    data = load_data.download_period(17, extensions=('html',), workers=4)
+    del server.requests[:]
+    load_data.download_period(17, data=data, extensions=('html',), workers=4)
+    assert ('GET', 'MMP17-1.html') not in server.requests
+
+
+def test_connections_are_reused(server, protocol_dir):
+    add_protocols(server, 17, range(1, 40))
+    load_data.download_period(17, extensions=('html',), workers=4,
+                              max_connections=2)
+    assert len(server.connections) <= 2
+
+
+def test_manifest_records_validators(server, protocol_dir):
+    add_protocols(server, 17, range(1, 3))
+    data = load_data.download_period(17, extensions=('html',))
+    entry = data[str(protocol_dir / 'protocol-17-1.html')]
+    body = b'<html>17-1</html>'
+    assert entry['etag'] == '"%s"' % hashlib.md5(body).hexdigest()
+    assert entry['last_modified'] == 'Wed, 01 Dec 2021 10:00:00 GMT'
+    assert entry['size'] == len(body)
+    assert entry['sha256'] == hashlib.sha256(body).hexdigest()
+    assert entry['changed'] is True
+
+
+def test_refresh_uses_conditional_requests(server, protocol_dir):
+    add_protocols(server, 17, range(1, 6))
+    data = load_data.download_period(17, extensions=('html',), workers=2)
+    for entry in data.values():
+        entry['changed'] = False
+    server.files['MMP17-3.html'] = b'<html>17-3 corrected</html>'
+    del server.requests[:]
+
+    load_data.download_period(17, data=data, extensions=('html',),
+                              workers=2, refresh=True)
+    not_modified = sorted(name for status, name in server.requests
+                          if status == '304')
+    assert not_modified == ['MMP17-1.html', 'MMP17-2.html',
+                            'MMP17-4.html', 'MMP17-5.html']
+    changed = load_data.changed_protocols(data)
+    assert [entry['index'] for filename, entry in changed] == [3]
+    assert (protocol_dir / 'protocol-17-3.html').read_bytes() == \
+        b'<html>17-3 corrected</html>'
+
+
+@pytest.mark.parametrize('last', [0, 1, 37, 64, 150])
+def test_discover_last_index(server, protocol_dir, last):
+    add_protocols(server, 17, range(1, last + 1))
+    assert load_data.discover_last_index(17) == last
+    # Exponential plus binary search needs far fewer requests than a scan
+    assert len(server.requests) <= 20
+
+
+def test_discover_skips_small_gaps(server, protocol_dir):
+    add_protocols(server, 17, [1, 2, 3, 5, 6, 7, 8, 9, 10, 12])
+    assert load_data.discover_last_index(17) == 12
+
+
+def test_discover_without_head_support(server, protocol_dir):
+    server.allow_head = False
+    add_protocols(server, 17, range(1, 12))
+    assert load_data.discover_last_index(17) == 11
+
+
+def test_discover_downloads_missing_range(server, protocol_dir):
+    add_protocols(server, 17, range(1, 31))
+    data = load_data.download_period(17, extensions=('html',), discover=True)
+    assert load_data.load_discovery_data(17) == {'html': 30}
+    # The period data only holds file entries
+    assert all(name.endswith('.html') for name in data)
+
+    # Daily refresh: two new protocols were published
+    add_protocols(server, 17, [31, 32])
+    del server.requests[:]
+    load_data.download_period(17, data=data, extensions=('html',),
+                              discover=True)
+    downloads = [name for method, name in server.requests if method == 'GET']
+    assert downloads == ['MMP17-31.html', 'MMP17-32.html']
+    assert len(server.requests) <= 8
+    assert load_data.load_discovery_data(17) == {'html': 32}
+
+
+def test_load_period_data_drops_legacy_discovery(protocol_dir):
+    load_data.save_period_data(17, {'discovery': {'html': 30}})
+    assert load_data.load_period_data(17) == {}
+
+
+def test_checkpoints_survive_crash(server, protocol_dir):
+    add_protocols(server, 17, range(1, 20))
+    server.broken.add('MMP17-13.html')
+    with pytest.raises(requests.ConnectionError):
+        load_data.download_period(17, extensions=('html',), checkpoint=5)
+    data = load_data.load_period_data(17)
+    assert sorted(v['index'] for v in data.values()) == list(range(1, 11))
+    assert not [path for path in protocol_dir.iterdir()
+                if path.name.endswith(load_data.TEMP_SUFFIX)]
+
+
+def test_resume_rebuilds_entries_from_disk(server, protocol_dir):
+    add_protocols(server, 17, range(1, 20))
+    server.broken.add('MMP17-13.html')
+    with pytest.raises(requests.ConnectionError):
+        load_data.download_period(17, extensions=('html',), checkpoint=5)
+    server.broken.clear()
+    (protocol_dir / 'protocol-17-3.html').write_bytes(b'<html>trunc')
+    (protocol_dir / '.protocol-17-13.html.x.tmp').write_bytes(b'<ht')
+
+    data = load_data.load_period_data(17)
+    load_data.rebuild_period_data(17, data, extensions=('html',))
+    # Files 11 and 12 were written after the last checkpoint, file 3 is
+    # corrupt
+    assert sorted(v['index'] for v in data.values()) == \
+        [1, 2] + list(range(4, 13))
+    assert not (protocol_dir / '.protocol-17-13.html.x.tmp').exists()
+
+    del server.requests[:]
+    load_data.download_period(17, data=data, extensions=('html',))
+    downloads = sorted(int(name[6:-5]) for method, name in server.requests
+                       if method == 'GET' and name in server.files)
+    assert downloads == [3] + list(range(13, 20))
+    assert (protocol_dir / 'protocol-17-3.html').read_bytes() == \
+        b'<html>17-3</html>'
+
+
+def test_rebuild_skips_period_output_files(protocol_dir):
+    (protocol_dir / 'protocol-17-1.html').write_bytes(b'<html>17-1</html>')
+    (protocol_dir / 'tagged_period-17.json').write_bytes(b'[]')
+    data = load_data.rebuild_period_data(17)
+    assert list(data) == [str(protocol_dir / 'protocol-17-1.html')]
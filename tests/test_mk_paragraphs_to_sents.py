@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for mk_paragraphs_to_sents.py"""
+import io
+import random
+
+from context import agenda_and_speaker_list
+from context import mk_paragraphs_to_sents
+from context import protocol_store
+from context import parse_data
+from mk_paragraphs_to_sents import (
+    citation_end_in_sentence,
+    citation_start_in_sentence,
+    first_letter_of_sent_is_lower,
+    first_letter_of_sent_is_numeric,
+    sent_ends_w_abbr,
+    sent_ends_with_number,
+    sent_starts_w_word_that_can_be_numerated,
+)
+
+
+def reference_fill_indices_w_text(session, speeches):
+    """
+    Former implementation of fill_indices_w_text(), scanning the paragraphs
+    for each flow index and concatenating the texts.
+    """
+    paragraphs = session.content
+    updated_speech = {}
+    updated_speeches = []
+    token_speech = False
+    token_topic = False
+
+    for speech in speeches:
+        for key, val in speech.items():
+            if not key:
+                continue
+            elif "topic" in key:
+                token_topic = True
+                topic = val
+            else:
+                token_speech = True
+                indices = val
+                text = ""
+                for index in indices:
+                    paragraph = [p for p in paragraphs if p['flow_index'] == index][0]  # noqa
+                    if mk_paragraphs_to_sents.is_speech(paragraph):
+                        speech = paragraph['speech']
+                        text = text + speech + ' '
+                    elif mk_paragraphs_to_sents.is_citation(paragraph):
+                        speech = paragraph['citation']
+                        text = text + speech + ' '
+                updated_speech["speaker"] = paragraph["speaker_name"]
+                updated_speech["party"] = paragraph["speaker_party"]
+                if paragraph["speaker_party"] is None:
+                    updated_speech["ministry"] = paragraph["speaker_ministry"]
+                updated_speech["content"] = text.strip()
+
+            if token_topic and token_speech:
+                updated_speech["agenda_item"] = topic
+                updated_speeches.append(updated_speech)
+                updated_speech = {}
+                token_topic = False
+                token_speech = False
+
+    return updated_speeches
+
+
+def synthetic_session(paragraph_count, seed=1):
+    """
+    Return a session with paragraph_count paragraphs and its speech indices
+    in the format of collect_speech_indices().
+    """
+    rng = random.Random(seed)
+    speakers = [('André Kuper', None, None),
+                ('Herbert Reul', None, 'Ministerium des Innern'),
+                ('Josef Hovenjürgen', 'CDU', None),
+                ('Sven Wolf', 'SPD', None)]
+    content = []
+    speeches = []
+    flow_index = 1
+    topic = 0
+    while flow_index <= paragraph_count:
+        name, party, ministry = rng.choice(speakers)
+        indices = []
+        for i in range(rng.randint(1, 40)):
+            if flow_index > paragraph_count:
+                break
+            paragraph = {
+                'speaker_name': name,
+                'speaker_party': party,
+                'speaker_ministry': ministry,
+                'flow_index': flow_index,
+            }
+            kind = rng.random()
+            if kind < 0.8:
+                paragraph['speech'] = f'Satz {flow_index}. ' * rng.randint(1, 5)
+            elif kind < 0.9:
+                paragraph['citation'] = f'„Zitat {flow_index}“'
+            else:
+                paragraph['annotation'] = 'Beifall von der CDU'
+            content.append(paragraph)
+            indices.append(flow_index)
+            flow_index += 1
+        if rng.random() < 0.2:
+            topic += 1
+        speeches.append({f'topic_{topic}': f'TOP {topic}',
+                         name: indices})
+    session = mk_paragraphs_to_sents.mk_session({
+        'protocol_date': '2021-11-10',
+        'protocol_period': 17,
+        'protocol_index': 1,
+        'agenda': {},
+        'content': content,
+    })
+    return session, speeches
+
+
+def test_fill_indices_w_text_matches_reference():
+    for seed in range(5):
+        session, speeches = synthetic_session(500, seed)
+        assert mk_paragraphs_to_sents.fill_indices_w_text(
+            session, speeches) == reference_fill_indices_w_text(
+                session, speeches)
+
+
+def test_paragraphs_by_flow_index_keeps_first():
+    paragraphs = [{'flow_index': 1, 'speech': 'a'},
+                  {'flow_index': 2, 'speech': 'b'},
+                  {'flow_index': 1, 'speech': 'c'}]
+    flow_index_map = mk_paragraphs_to_sents.paragraphs_by_flow_index(
+        paragraphs)
+    assert flow_index_map[1]['speech'] == 'a'
+    assert flow_index_map[2]['speech'] == 'b'
+
+
+# Former recursive implementations of the sentence repair stages
+
+
+def reference_reconnect_sents_w_lower_first_letter(sentences: list) -> list:
+    corrected_sentences = []
+    token = True
+    for i, sent in enumerate(sentences):
+        if token and first_letter_of_sent_is_lower(sent):
+            sent_before = sentences[i-1]
+            if sent_before.endswith('?') or sent_before.endswith("?“ "):
+                sent_before = sent_before[:-1]
+            reconnected_sent = sent_before.strip() + ' ' + sent.strip()
+            if len(corrected_sentences) > 0:
+                del corrected_sentences[-1]
+            corrected_sentences.append(reconnected_sent)
+            token = False
+        else:
+            corrected_sentences.append(sent)
+
+    if not token:
+        corrected_sentences = reference_reconnect_sents_w_lower_first_letter(corrected_sentences)  # noqa
+
+    return corrected_sentences
+
+
+def reference_split_sents_w_citation_start(sentences: list) -> list:
+    corrected_sentences = []
+    for i, sent in enumerate(sentences):
+        if citation_start_in_sentence(sent):
+            sents = sent.split(": „")
+            sent_quote = sents[0] + ":"
+            quote_start = "„" + sents[-1]
+            corrected_sentences.append(sent_quote)
+            corrected_sentences.append(quote_start)
+        else:
+            corrected_sentences.append(sent)
+
+    return corrected_sentences
+
+
+def reference_split_sents_w_citation_end(sentences: list) -> list:
+    corrected_sentences = []
+    for i, sent in enumerate(sentences):
+        if citation_end_in_sentence(sent):
+            if ".“ " in sent:
+                sents = sent.split(".“ ")
+            else:
+                sents = sent.split("?“ ")
+
+            quote_end = sents[0] + ".“"
+            new_sent = sents[-1]
+            corrected_sentences.append(quote_end)
+            corrected_sentences.append(new_sent)
+        else:
+            corrected_sentences.append(sent)
+
+    return corrected_sentences
+
+
+def reference_reconnect_sents_w_first_letter_is_numeric(sentences: list) -> list:  # noqa
+    corrected_sentences = []
+    token = True
+    for i, sent in enumerate(sentences):
+        if first_letter_of_sent_is_numeric(sent):
+            sent_before = sentences[i-1]
+            if token and sent_before and sent_ends_w_abbr(sent_before):
+                reconnected_sent = sent_before.strip() + ' ' + sent.strip()
+                del corrected_sentences[-1]
+                corrected_sentences.append(reconnected_sent)
+                token = False
+            else:
+                corrected_sentences.append(sent)
+        else:
+            corrected_sentences.append(sent)
+
+    if not token:
+        corrected_sentences = reference_reconnect_sents_w_first_letter_is_numeric(corrected_sentences)  # noqa
+
+    return corrected_sentences
+
+
+def reference_reconnect_sents_w_first_word_can_be_numerated(sentences: list) -> list:  # noqa
+    corrected_sentences = []
+    token = True
+    for i, sent in enumerate(sentences):
+        if sent_starts_w_word_that_can_be_numerated(sent):
+            sent_before = sentences[i-1]
+            if token and sent_ends_with_number(sent_before):
+                reconnected_sent = sent_before.strip() + ' ' + sent.strip()
+                del corrected_sentences[-1]
+                corrected_sentences.append(reconnected_sent)
+                token = False
+            else:
+                corrected_sentences.append(sent)
+        else:
+            corrected_sentences.append(sent)
+
+    if not token:
+        corrected_sentences = reference_reconnect_sents_w_first_word_can_be_numerated(corrected_sentences)  # noqa
+
+    return corrected_sentences
+
+
+def reference_repair_sents(sentences):
+    sentences = reference_reconnect_sents_w_first_letter_is_numeric(sentences)  # noqa
+    sentences = reference_reconnect_sents_w_first_word_can_be_numerated(sentences)  # noqa
+    sentences = reference_split_sents_w_citation_start(sentences)
+    sentences = reference_split_sents_w_citation_end(sentences)
+    return sentences
+
+
+SENTENCE_PARTS = [
+    'Das kostet ca.', '3 Mio. Euro.', 'Das steht in Art.', '5 GG.',
+    'Wir sind in der 17.', 'Wahlperiode.', 'Das ist das 3.', 'Mal.',
+    'Kapitel 2 regelt das.', 'und das ist gut.', '… aber nicht alles.',
+    'Er sagte: „Das ist falsch.“ Dann ging er.', 'Warum?“ Keiner weiß es.',
+    'Ist das so?', 'Sie sagen: „Nein', 'Herr Präsident!', '12 Leute.',
+    'Sitzung, die heute stattfindet.', 'Co.', 'KG ist gut.',
+]
+
+
+def sentence_corpus(count, seed=2):
+    """
+    Return count random sentence lists, as produced by sent_tokenize.
+    """
+    rng = random.Random(seed)
+    return [[rng.choice(SENTENCE_PARTS) for i in range(rng.randint(1, 30))]
+            for j in range(count)]
+
+
+def test_repair_sents_matches_reference():
+    compared = 0
+    for sentences in sentence_corpus(2000):
+        try:
+            expected = reference_repair_sents(sentences)
+        except IndexError:
+            # The former implementation fails for a first sentence, which
+            # has to be reconnected to the sentence before
+            continue
+        if first_letter_of_sent_is_lower(expected[0]):
+            # A first sentence starting w a lower letter was reconnected
+            # to the last sentence or recursed endlessly
+            continue
+        expected = reference_reconnect_sents_w_lower_first_letter(expected)
+        assert list(mk_paragraphs_to_sents.repair_sents(sentences)) == (
+            expected)
+        compared += 1
+    assert compared > 1000
+
+
+def test_repair_sents_handles_long_speeches():
+    # The former implementation recursed once per reconnect
+    sentences = ['Das kostet ca.', '3 Mio. Euro', 'und mehr.'] * 2000
+    repaired = list(mk_paragraphs_to_sents.repair_sents(sentences))
+    assert repaired == ['Das kostet ca. 3 Mio. Euro und mehr.'] * 2000
+    assert list(mk_paragraphs_to_sents.repair_sents(
+        ['und dann', 'Schluss.'])) == ['und dann', 'Schluss.']
+
+
+class FakeSentTokenizer:
+    """
+    Stand-in for the Punkt tokenizer, splitting at full stops.
+    """
+    def tokenize(self, text):
+        return [sent.strip() + '.' for sent in text.split('.') if sent.strip()]
+
+
+def test_process_whole_period(fixture_protocols, monkeypatch):
+    parse_data.process_protocol(17, 1)
+    (fixture_protocols / 'nltk').mkdir(exist_ok=True)
+    monkeypatch.setattr(mk_paragraphs_to_sents, '_sent_tokenizer',
+                        FakeSentTokenizer())
+    monkeypatch.setattr(mk_paragraphs_to_sents, 'load_period_data',
+                        lambda period: {'protocol-17-1.html': {'index': 1},
+                                        'protocol-17-3.html': {'index': 3}})
+
+    # Protocol 17-3 wasn't parsed, but doesn't abort the run
+    errors = mk_paragraphs_to_sents.process_whole_period(17)
+    assert list(errors) == [3]
+    assert (fixture_protocols / 'nltk' / 'protocol-17-1.json').exists()
+    index, sentences, error = mk_paragraphs_to_sents.segment_protocol(17, 1)
+    assert (index, error) == (1, None)
+    assert sentences > 0
+
+    # Only the failed protocol is retried
+    monkeypatch.setattr(mk_paragraphs_to_sents, 'segment_protocol',
+                        lambda period, index: (index, 0, 'failed'))
+    assert mk_paragraphs_to_sents.process_whole_period(17) == {3: 'failed'}
+
+
+def test_continue_never_blocks_in_batch_mode(monkeypatch):
+    class Terminal(io.StringIO):
+        def isatty(self):
+            return True
+
+    prompts = []
+    monkeypatch.setattr('sys.stdin', Terminal())
+    monkeypatch.setattr('builtins.input', lambda prompt: prompts.append(
+        prompt) or '')
+    mk_paragraphs_to_sents.continue_()
+    assert len(prompts) == 1
+
+    monkeypatch.setattr(mk_paragraphs_to_sents, 'batch_mode', True)
+    mk_paragraphs_to_sents.continue_()
+    assert len(prompts) == 1
+
+
+def write_protocol_wo_agenda(protocols, index):
+    """
+    Write a protocol without agenda, whose JSON file has a stale agenda.
+    """
+    (protocols / f'protocol-17-{index}.html').write_text(
+        '<html><body><p class="MsoNormal">Nichts</p></body></html>',
+        encoding='utf-8')
+    protocol_store.dump_json({
+        'protocol_period': 17,
+        'protocol_index': index,
+        'agenda_version': 0,
+        'content': [],
+        }, str(protocols / f'protocol-17-{index}.json'))
+
+
+def test_load_stale_agenda_in_batch_mode(fixture_protocols, monkeypatch):
+    class Terminal(io.StringIO):
+        def isatty(self):
+            return True
+
+    def no_input(prompt=''):
+        raise AssertionError('waiting for user input')
+
+    write_protocol_wo_agenda(fixture_protocols, 9)
+    monkeypatch.setattr('sys.stdin', Terminal())
+    monkeypatch.setattr('builtins.input', no_input)
+    monkeypatch.setattr(mk_paragraphs_to_sents, 'batch_mode', True)
+    data = mk_paragraphs_to_sents.load_json_file(17, 9)
+    assert data['agenda'] is None
+
+
+def test_process_whole_period_never_prompts(fixture_protocols, monkeypatch):
+    class Terminal(io.StringIO):
+        def isatty(self):
+            return True
+
+    def no_input(prompt=''):
+        # also called in the (forked) worker processes
+        (fixture_protocols / 'prompted').touch()
+        raise EOFError
+
+    write_protocol_wo_agenda(fixture_protocols, 9)
+    (fixture_protocols / 'nltk').mkdir(exist_ok=True)
+    monkeypatch.setattr('sys.stdin', Terminal())
+    monkeypatch.setattr('builtins.input', no_input)
+    monkeypatch.setattr(mk_paragraphs_to_sents, '_sent_tokenizer',
+                        FakeSentTokenizer())
+    monkeypatch.setattr(mk_paragraphs_to_sents, 'load_period_data',
+                        lambda period: {'protocol-17-9.html': {'index': 9}})
+    monkeypatch.setattr(agenda_and_speaker_list, 'batch_mode', False)
+    for jobs in (1, 2):
+        mk_paragraphs_to_sents.process_whole_period(17, force=True,
+                                                    jobs=jobs)
+        assert not (fixture_protocols / 'prompted').exists()
+
+
+def test_process_single_json_file_in_batch_mode(fixture_protocols,
+                                                monkeypatch):
+    parse_data.process_protocol(17, 1)
+    monkeypatch.setattr(mk_paragraphs_to_sents, '_sent_tokenizer',
+                        FakeSentTokenizer())
+    monkeypatch.setattr(mk_paragraphs_to_sents, 'batch_mode', True)
+    monkeypatch.setattr('builtins.input', None)
+    session = mk_paragraphs_to_sents.process_single_json_file(17, 1)
+    assert (session['period'], session['index']) == (17, 1)
+    assert session['content']
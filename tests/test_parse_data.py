@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for parse_data.py"""
+import json
+import os
+import random
+
+import pytest
+
+from context import parse_data
+from context import mk_paragraphs_to_sents
+from conftest import FIXTURE_DIR
+
+INDICES = [(17, 1), (16, 2), (17, 3)]
+
+
+FIXTURE_PROTOCOLS = sorted(
+    os.listdir(os.path.join(FIXTURE_DIR, 'protocols')))
+
+# Markup variants: comments, nested tags, entities and a start marker in
+# tail text, which needs the fallback search
+EDGE_CASE_HTML = '''<html><body>
+<p class="MsoNormal">Düsseldorf, 01.02.2020</p>
+<p class="MsoNormal"><b>Sitzung</b> Beginn: 10:00 Uhr</p>
+<p class="rRednerkopf"><b>Präsident</b> André Kuper<!-- Kommentar -->:
+ Guten&nbsp;Morgen!</p>
+<p class="aStandardabsatz">Erster<span> <i>Absatz</i></span>
+ mit&#173;Trennung.</p>
+<p class="kKlammer x">(Beifall)</p>
+<p class="sSchluss">Schluss: 12:00 Uhr</p>
+<p class="aStandardabsatz">Nach dem Ende.</p>
+</body></html>'''.encode('utf-8')
+
+
+def reference_typo_fixes(text, fixes):
+    # Original implementation of parse_data.typo_fixes()
+    match = text.startswith
+    for typo, fix in fixes.items():
+        if match(typo):
+            text = fix + text[len(typo):]
+    return text
+
+
+def reference_parse_speaker_intro(tag_text):
+    # Original implementation of parse_data.parse_speaker_intro(), using a
+    # separate match for each RE
+    pd = parse_data
+    if pd.NON_SPEAKER_INTRO_RE.match(tag_text) is not None:
+        raise pd.ParserError(
+            'Paragraph is not a true speaker intro: %r' % tag_text)
+    speaker_name = None
+    speaker_party = None
+    speaker_ministry = None
+    speaker_role = None
+    speaker_role_descr = None
+    speech = None
+    match = pd.SPEAKER_NAME_RE.match(tag_text)
+    if match is not None:
+        speaker_name = match.group(1)
+        speech = tag_text[match.end():]
+    match = pd.SPEAKER_PARTY_NAME_RE.match(tag_text)
+    if match is not None:
+        speaker_name = match.group(1)
+        speaker_party = match.group(2).strip('([]) ')
+        speech = tag_text[match.end():]
+    match = pd.MINISTER_NAME_RE.match(tag_text)
+    if match is not None:
+        speaker_name = match.group(1)
+        speaker_ministry = match.group(2)
+        speech = tag_text[match.end():]
+    match = pd.OTHER_ROLE_NAME_RE.match(tag_text)
+    if match is not None:
+        speaker_name = match.group(1)
+        speaker_role_descr = match.group(2)
+        speech = tag_text[match.end():]
+    if speaker_name is None:
+        raise pd.ParserError('Could not match speaker name: %r' % tag_text)
+    full_speaker_name = speaker_name
+    match = pd.PRESIDENT_RE.match(full_speaker_name)
+    if match is not None:
+        speaker_role = 'president'
+        speaker_role_descr = match.group(1)
+        speaker_name = match.group(2)
+    match = pd.VICE_PRESIDENT_RE.match(full_speaker_name)
+    if match is not None:
+        speaker_role = 'vice-president'
+        speaker_role_descr = match.group(1)
+        speaker_name = match.group(2)
+    match = pd.MINISTER_RE.match(full_speaker_name)
+    if match is not None:
+        speaker_role = 'minister'
+        speaker_role_descr = match.group(1)
+        speaker_name = match.group(2)
+    if speaker_ministry is not None:
+        speaker_role = 'minister'
+    if speaker_role_descr is not None and speaker_role is None:
+        speaker_role = 'other'
+    speaker_is_chair = bool(
+        speaker_role in pd.CHAIR_ROLES and
+        pd.SPEAKER_IS_CHAIR_RE.match(full_speaker_name) is not None)
+    return dict(
+        speaker_name=pd.clean_text(speaker_name),
+        speaker_party=pd.clean_text(speaker_party),
+        speaker_ministry=pd.clean_text(speaker_ministry),
+        speaker_role=speaker_role,
+        speaker_role_descr=speaker_role_descr,
+        speaker_is_chair=speaker_is_chair,
+        speech=pd.clean_text(speech))
+
+
+def speaker_intro_corpus(count, seed=3):
+    """
+    Return count speaker intro lines, combining the name, role and party
+    variants found in the protocols (including the known typos).
+    """
+    rng = random.Random(seed)
+    roles = ['', 'Präsident ', 'Präsidentin ', 'Vizepräsident ',
+             'Vizepräsidentin ', 'Alterspräsident ', 'Ministerpräsident ',
+             'Ministerpräsidentin ', 'Minister ', 'Ministerin ',
+             'Geschäftsführende Präsidentin ', 'Erster Vizepräsident ',
+             'geschäftsführender erster Vizepräsident ', 'Abgeordneter ']
+    names = ['André Kuper', 'Carina Gödecke', 'Dr. Gerhard Papke',
+             'Herbert Reul', 'Sigrid Beer', 'Dr. Joachim Stamp',
+             'Anne-José Paulsen', 'Brigitte D’moch-Schweren',
+             'Susana dos Santos Herrmann', "O'Neill", 'Reul',
+             'Hannelore Kraft', 'Norbert Walter-Borjans']
+    markers = ['', '*)', '*) ']
+    suffixes = ['', ' (SPD)', ' (CDU)', ' [FDP]', ' (GRÜNE]', ' SPD)',
+                ' (PIRATEN', ' (AfD) ', ' (fraktionslos)',
+                ', Minister des Innern', ', Ministerin für Schule und Bildung',
+                ', Finanzminister', ', Präsident des Landesrechnungshofs',
+                ',*) Minister für Arbeit, Gesundheit und Soziales',
+                ' (Sprecher der Kommission)', ' (CDU) (Sprecher der Kommission)']
+    ends = [': ', ':', ' : ', ' ', '']
+    speeches = ['', 'Vielen Dank.', 'Herr Präsident! Meine Damen und Herren!',
+                '(SPD): Zwischenruf', 'Minister: das stimmt nicht.']
+    prefixes = [''] * 30 + ['Ich ', 'Frau ', '(', '– ', 'a', 'Vielen Dank ',
+                           'Erstens: ']
+    lines = list(parse_data.TYPO_FIXES) + \
+        list(parse_data.TYPO_FIXES.values())
+    while len(lines) < count:
+        lines.append(''.join((
+            rng.choice(prefixes), rng.choice(roles), rng.choice(names),
+            rng.choice(markers), rng.choice(suffixes), rng.choice(ends),
+            rng.choice(speeches))))
+    return lines
+
+
+def parse_intro_or_error(function, tag_text):
+    try:
+        return function(tag_text)
+    except parse_data.ParserError as error:
+        return str(error)
+
+
+def parse_with_backend(html, backend):
+    soup = parse_data.create_lxml_tree(html) if backend == 'lxml' else \
+        parse_data.bs4.BeautifulSoup(html, 'lxml')
+    try:
+        return (parse_data.protocol_meta_data(17, 1, soup),
+                parse_data.parse_protocol(soup))
+    except parse_data.ParserError as error:
+        return str(error)
+
+
+def read_outputs(protocol_dir):
+    return {path.name: path.read_bytes()
+            for path in sorted(protocol_dir.glob('*.json'))}
+
+
+def test_process_protocol(fixture_protocols):
+    parse_data.process_protocol(17, 1)
+    protocol = json.loads(
+        (fixture_protocols / 'protocol-17-1.json').read_text())
+    assert protocol['protocol_date'] == '2017-07-12'
+    content = protocol['content']
+    assert [p['flow_index'] for p in content] == list(range(1, 29))
+    assert content[4]['speaker_name'] == 'Herbert Reul'
+    assert content[4]['speaker_role'] == 'minister'
+    assert content[7]['speech'] == 'Wir werden das gemeinsam schaffen. ' \
+                                   'Vielen Dank.'
+
+
+def test_agenda_is_stored_in_protocol(fixture_protocols):
+    parse_data.process_protocol(17, 1, backend='lxml')
+    protocol = json.loads(
+        (fixture_protocols / 'protocol-17-1.json').read_text())
+    assert protocol['agenda'] == {
+        '1 Gesetz zur Stärkung der Kommunen': [
+            'Minister Herbert Reul 3',
+            'Thomas Kutschaty (SPD) 4',
+            'Bodo Löttgen (CDU) 5'],
+        '2 Aktuelle Stunde zur Lage der Schulen': [
+            'Sigrid Beer (GRÜNE) 6',
+            'Yvonne Gebauer, Ministerin für Schule und Bildung 7'],
+    }
+
+
+def test_stored_agenda_is_used_downstream(fixture_protocols, monkeypatch):
+    parse_data.process_protocol(17, 1)
+
+    def reparse(period, index):
+        raise AssertionError('HTML parsed again')
+    monkeypatch.setattr(mk_paragraphs_to_sents, 'mk_agenda_list_w_speakers',
+                        reparse)
+    data = mk_paragraphs_to_sents.load_json_file(17, 1)
+    assert len(data['agenda']) == 2
+
+
+def test_period_errors_are_collected(fixture_protocols):
+    errors = parse_data.process_period(17, [1, 3])
+    assert errors == {3: 'Could not find end of protocol'}
+    assert (fixture_protocols / 'protocol-17-1.json').exists()
+
+
+def test_parallel_parse_is_identical(fixture_protocols):
+    serial_errors = {}
+    for period, index in INDICES:
+        serial_errors.update(parse_data.process_period(period, [index]))
+    serial = read_outputs(fixture_protocols)
+    for path in fixture_protocols.glob('*.json'):
+        path.unlink()
+
+    parallel_errors = {}
+    for period in (16, 17):
+        indices = [index for p, index in INDICES if p == period]
+        parallel_errors.update(
+            parse_data.process_period(period, indices, jobs=2))
+    assert read_outputs(fixture_protocols) == serial
+    assert parallel_errors == serial_errors
+
+
+@pytest.mark.parametrize('filename', FIXTURE_PROTOCOLS)
+def test_lxml_backend_matches_bs4(filename):
+    with open(os.path.join(FIXTURE_DIR, 'protocols', filename), 'rb') as f:
+        html = f.read()
+    assert parse_with_backend(html, 'lxml') == \
+        parse_with_backend(html, 'bs4')
+
+
+def test_lxml_backend_edge_cases():
+    result = parse_with_backend(EDGE_CASE_HTML, 'lxml')
+    assert result == parse_with_backend(EDGE_CASE_HTML, 'bs4')
+    meta_data, paragraphs = result
+    assert meta_data['protocol_date'] == '2020-02-01'
+    assert [p.get('speech') or p.get('annotation') for p in paragraphs] == [
+        'Guten Morgen!', 'Erster Absatz mitTrennung.', 'Beifall']
+
+
+def test_typo_fixes_match_reference():
+    fixes = parse_data.TYPO_FIXES
+    rng = random.Random(42)
+    pieces = list(fixes) + list(fixes.values()) + ['', ' ', 'Ich ', ': ']
+    texts = [''.join(rng.choice(pieces)[:rng.randint(0, 60)]
+                     for i in range(rng.randint(1, 3)))
+             for i in range(5000)]
+    for text in texts:
+        assert parse_data.typo_fixes(text) == \
+            reference_typo_fixes(text, fixes), text
+
+
+def test_typo_fixes_chains():
+    # All fixes matching the original text are applied in order
+    fixes = {
+        '': 'x',
+        'xab': 'b',
+        'a': 'ab',
+        'abc': 'a',
+        'ab': 'abc',
+        'b': 'a',
+    }
+    tree = parse_data.build_typo_fixes_tree(fixes)
+    rng = random.Random(7)
+    for i in range(2000):
+        text = ''.join(rng.choice('abcx') for j in range(rng.randint(0, 5)))
+        assert parse_data.typo_fixes(text, tree) == \
+            reference_typo_fixes(text, fixes), text
+
+
+def test_typo_fixes_file(tmp_path, monkeypatch):
+    filename = tmp_path / 'typos.json'
+    filename.write_text(json.dumps({'Hendrik Wüst CDU):':
+                                    'Hendrik Wüst (CDU):'}))
+    monkeypatch.setattr(parse_data, 'TYPO_FIXES',
+                        dict(parse_data.TYPO_FIXES))
+    monkeypatch.setattr(parse_data, 'TYPO_FIXES_TREE', None)
+    parse_data.setup_typo_fixes(str(filename))
+    assert parse_data.typo_fixes('Hendrik Wüst CDU): Text') == \
+        'Hendrik Wüst (CDU): Text'
+    assert parse_data.typo_fixes('Carina Gödeke: Text') == \
+        'Carina Gödecke: Text'
+
+
+def test_speaker_intro_matches_reference(capsys):
+    for tag_text in speaker_intro_corpus(20000):
+        result = parse_intro_or_error(
+            lambda text: parse_data.parse_speaker_intro(None, text), tag_text)
+        assert result == parse_intro_or_error(
+            reference_parse_speaker_intro, tag_text), tag_text
+
+
+def test_non_speaker_intro_error():
+    with pytest.raises(parse_data.NonSpeakerIntroError):
+        parse_data.parse_speaker_intro(None, 'Ich danke Ihnen: Ja.')
+    with pytest.raises(parse_data.ParserError) as error:
+        parse_data.parse_speaker_intro(None, 'Keine Angabe')
+    assert not isinstance(error.value, parse_data.NonSpeakerIntroError)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for pipeline.py"""
+import json
+import os
+
+from context import build_manifest
+from context import pipeline
+
+# Version of the test stage "count"
+COUNT_VERSION = 1
+
+# Protocols processed by the test stage
+counted = []
+
+
+def count_paragraphs(period, index):
+    """
+    Test stage: write the number of paragraphs of the parsed protocol.
+    """
+    filename = os.path.join('protocols', f'protocol-{period}-{index}')
+    with open(filename + '.json', encoding='utf-8') as f:
+        data = json.load(f)
+    with open(filename + '.txt', 'w', encoding='utf-8') as f:
+        f.write(str(len(data['content'])))
+    counted.append(index)
+
+
+def add_count_stage(monkeypatch):
+    monkeypatch.setitem(pipeline.STAGES, 'count', pipeline.Stage(
+        'parse', __name__, 'count_paragraphs', 'COUNT_VERSION'))
+    monkeypatch.setitem(build_manifest.STAGE_FILES, 'count', (
+        [('protocols', 'json')], [('protocols', 'txt')]))
+    counted.clear()
+
+
+def test_pipeline_runs_downstream_stages(fixture_protocols, monkeypatch):
+    add_count_stage(monkeypatch)
+    stats = pipeline.run_pipeline(17, [1, 3], ['parse', 'count'])
+    assert (stats['parse'].done, stats['parse'].failed) == (1, 1)
+    # count is not run for the protocol, which could not be parsed
+    assert (stats['count'].done, stats['count'].failed) == (1, 1)
+    assert counted == [1]
+    assert (fixture_protocols / 'protocol-17-1.txt').exists()
+    assert not (fixture_protocols / 'protocol-17-3.txt').exists()
+
+    manifest = build_manifest.load_manifest(17)
+    assert list(manifest['parse']) == ['1']
+    assert list(manifest['count']) == ['1']
+
+
+def test_pipeline_skips_up_to_date_tasks(fixture_protocols, monkeypatch):
+    add_count_stage(monkeypatch)
+    pipeline.run_pipeline(17, [1], ['parse', 'count'])
+    counted.clear()
+
+    stats = pipeline.run_pipeline(17, [1], ['parse', 'count'])
+    assert (stats['parse'].done, stats['parse'].skipped) == (0, 1)
+    assert (stats['count'].done, stats['count'].skipped) == (0, 1)
+    assert counted == []
+
+    # Changed downstream outputs are rebuilt, without reparsing
+    (fixture_protocols / 'protocol-17-1.txt').unlink()
+    stats = pipeline.run_pipeline(17, [1], ['parse', 'count'])
+    assert stats['parse'].skipped == 1
+    assert stats['count'].done == 1
+    assert counted == [1]
+
+    stats = pipeline.run_pipeline(17, [1], ['parse', 'count'], force=True)
+    assert stats['parse'].done == 1
+    assert stats['count'].done == 1
+
+
+def test_pipeline_does_not_run_tasks_after_failures(fixture_protocols,
+                                                    monkeypatch):
+    ran = []
+
+    def run_task(stage, period, index):
+        ran.append((stage, index))
+        if (stage, index) in (('parse', 5), ('nltk', 3)):
+            raise RuntimeError('stage failed')
+        return 0.0
+
+    monkeypatch.setattr(pipeline, 'run_task', run_task)
+    monkeypatch.setattr(pipeline, 'stage_version', lambda stage: 1)
+    stats = pipeline.run_pipeline(17, [1, 3, 5],
+                                  ['parse', 'nltk', 'bert', 'tagger'],
+                                  force=True)
+    assert ('bert', 3) not in ran
+    assert ('nltk', 5) not in ran and ('bert', 5) not in ran
+    assert ('tagger', None) not in ran
+    assert ('bert', 1) in ran
+    assert (stats['parse'].done, stats['parse'].failed) == (2, 1)
+    assert (stats['nltk'].done, stats['nltk'].failed) == (1, 2)
+    assert (stats['bert'].done, stats['bert'].failed) == (1, 2)
+    assert (stats['tagger'].done, stats['tagger'].failed) == (0, 1)
+
+
+def test_pipeline_rejects_unknown_stages(fixture_protocols):
+    try:
+        pipeline.run_pipeline(17, [1], ['parse', 'unknown'])
+    except ValueError:
+        pass
+    else:
+        assert False, 'unknown stage accepted'
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for protocol_store.py"""
+import zlib
+
+import pytest
+
+from context import protocol_store
+
+COMPRESSIONS = [None, 'gzip']
+if protocol_store.zstandard is not None:
+    COMPRESSIONS.append('zstd')
+
+
+@pytest.fixture(autouse=True)
+def close_archives():
+    yield
+    protocol_store.close_archives()
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_roundtrip(tmp_path, compression):
+    filename = str(tmp_path / 'protocol-17-1.html')
+    content = b'<html>' + b'Beifall bei der SPD ' * 100 + b'</html>'
+    protocol_store.write(filename, content, compression)
+    assert protocol_store.exists(filename)
+    assert protocol_store.read(filename) == content
+    assert protocol_store.listdir(str(tmp_path)) == ['protocol-17-1.html']
+
+
+def test_write_replaces_other_variants(tmp_path):
+    filename = str(tmp_path / 'protocol-17-1.json')
+    protocol_store.dump_json({'version': 1}, filename, None)
+    protocol_store.dump_json({'version': 2}, filename, 'gzip')
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ['protocol-17-1.json.gz']
+    assert protocol_store.load_json(filename) == {'version': 2}
+
+
+def test_missing_file(tmp_path):
+    filename = str(tmp_path / 'protocol-17-1.html')
+    assert not protocol_store.exists(filename)
+    with pytest.raises(FileNotFoundError):
+        protocol_store.read(filename)
+
+
+def test_signature(tmp_path):
+    filename = str(tmp_path / 'protocol-17-1.html')
+    protocol_store.write(filename, b'17-1', 'gzip')
+    signature = protocol_store.signature(filename)
+    assert protocol_store.signature(filename) == signature
+    protocol_store.write(filename, b'17-1 corrected', 'gzip')
+    assert protocol_store.signature(filename) != signature
+
+    protocol_store.migrate(str(tmp_path), archive=True)
+    signature = protocol_store.signature(filename)
+    assert signature[-2:] == [len(b'17-1 corrected'),
+                              zlib.crc32(b'17-1 corrected')]
+    with pytest.raises(FileNotFoundError):
+        protocol_store.signature(str(tmp_path / 'protocol-17-2.html'))
+
+
+def test_migrate_to_compression(tmp_path):
+    for index in range(1, 4):
+        (tmp_path / f'protocol-17-{index}.html').write_bytes(b'x' * index)
+    (tmp_path / 'period-17.json').write_text('{}')
+    assert protocol_store.migrate(str(tmp_path), 'gzip') == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        'period-17.json', 'protocol-17-1.html.gz',
+        'protocol-17-2.html.gz', 'protocol-17-3.html.gz']
+    assert protocol_store.read(str(tmp_path / 'protocol-17-2.html')) == b'xx'
+
+
+def test_migrate_to_archive(tmp_path):
+    for period, index in [(16, 1), (17, 1), (17, 2)]:
+        protocol_store.write(str(tmp_path / f'protocol-{period}-{index}.html'),
+                             b'%i-%i' % (period, index), 'gzip')
+    protocol_store.migrate(str(tmp_path), archive=True)
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ['protocols-16.zip', 'protocols-17.zip']
+    assert protocol_store.listdir(str(tmp_path)) == [
+        'protocol-16-1.html', 'protocol-17-1.html', 'protocol-17-2.html']
+    filename = str(tmp_path / 'protocol-17-2.html')
+    assert protocol_store.read(filename) == b'17-2'
+
+    # Files written later shadow the archive members
+    protocol_store.write(filename, b'17-2 corrected')
+    assert protocol_store.read(filename) == b'17-2 corrected'
+
+
+@pytest.mark.parametrize('archive', [False, True])
+def test_migrate_period_files(tmp_path, archive):
+    filename = str(tmp_path / 'tagged_period-17.json')
+    protocol_store.dump_json({'speakers': 1}, filename, None)
+    assert protocol_store.listdir(str(tmp_path)) == ['tagged_period-17.json']
+    assert protocol_store.migrate(str(tmp_path), 'gzip', archive) == 1
+    if archive:
+        assert [p.name for p in tmp_path.iterdir()] == ['protocols-17.zip']
+    else:
+        assert [p.name for p in tmp_path.iterdir()] == [
+            'tagged_period-17.json.gz']
+    assert protocol_store.exists(filename)
+    assert protocol_store.load_json(filename) == {'speakers': 1}
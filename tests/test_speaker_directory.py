@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for speaker_directory.py"""
+import collections
+
+from context import speaker_directory
+
+PARAGRAPHS = [
+    # speaker_name, speaker_party, speaker_role, speaker_role_descr,
+    # protocol_period, protocol_index
+    ('André Kuper', None, 'president', 'Präsident', 17, 1),
+    ('André Kuper', None, 'president', 'Präsident', 17, 1),
+    ('André Kuper', None, 'president', 'Präsident', 17, 2),
+    ('Carina Gödecke', None, 'vice-president', 'Vizepräsidentin', 17, 2),
+    ('Herbert Reul', None, 'minister', 'Minister', 17, 1),
+    ('Josef Hovenjürgen', 'CDU', 'mp', None, 16, 5),
+    ('Josef Hovenjürgen', 'CDU', 'mp', None, 17, 1),
+    ('Josef Hovenjürgen', 'CDU', 'mp', None, 17, 1),
+]
+
+
+class CompositeClient:
+    """
+    Stand-in for the OpenSearch client, which answers composite
+    aggregation searches over PARAGRAPHS.
+    """
+    def __init__(self):
+        self.searches = 0
+
+    def search(self, body, index):
+        self.searches += 1
+        composite = body['aggs']['speakers']['composite']
+        fields = [next(iter(source)) for source in composite['sources']]
+        assert fields == list(speaker_directory.SPEAKER_FIELDS)
+        query = body['query']
+        roles = None
+        if 'bool' in query:
+            roles = query['bool']['filter'][0]['terms']['speaker_role']
+        counts = collections.Counter(
+            p for p in PARAGRAPHS if roles is None or p[2] in roles)
+
+        def sort_key(key):
+            # Missing values sort first
+            return [(value is not None, value) for value in key]
+
+        keys = sorted(counts, key=sort_key)
+        after = composite.get('after')
+        if after is not None:
+            after = sort_key([after[field] for field in fields])
+            keys = [key for key in keys if sort_key(key) > after]
+        buckets = [
+            {'key': dict(zip(fields, key)), 'doc_count': counts[key]}
+            for key in keys[:composite['size']]]
+        result = {'buckets': buckets}
+        if buckets:
+            result['after_key'] = buckets[-1]['key']
+        return {'aggregations': {'speakers': result}}
+
+
+def test_iter_speakers_pages_through_buckets():
+    client = CompositeClient()
+    speakers = list(speaker_directory.iter_speakers(client, page_size=2))
+    assert client.searches == 4
+    assert [data['speaker_name'] for data in speakers] == [
+        'André Kuper', 'Carina Gödecke', 'Herbert Reul', 'Josef Hovenjürgen']
+    kuper = speakers[0]
+    assert (kuper['paragraphs'], kuper['protocols']) == (3, 2)
+    assert (kuper['protocol_period'], kuper['protocol_index']) == (17, 1)
+    assert kuper['last_protocol'] == (17, 2)
+    hovenjuergen = speakers[3]
+    assert hovenjuergen['speaker_party'] == 'CDU'
+    assert hovenjuergen['speaker_parties'] == ['CDU']
+    assert (hovenjuergen['paragraphs'], hovenjuergen['protocols']) == (3, 2)
+    assert (hovenjuergen['protocol_period'],
+            hovenjuergen['protocol_index']) == (16, 5)
+
+    # The page size doesn't change the result
+    assert list(speaker_directory.iter_speakers(client)) == speakers
+
+
+def test_iter_speakers_filters_roles():
+    client = CompositeClient()
+    speakers = list(speaker_directory.iter_speakers(
+        client, speaker_directory.PRESIDENT_ROLES))
+    assert [(data['speaker_name'], data['speaker_role_descr'])
+            for data in speakers] == [
+        ('André Kuper', 'Präsident'),
+        ('Carina Gödecke', 'Vizepräsidentin')]
@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Tests for speech_segmentation.py"""
+import random
+
+from context import collect_speeches
+from context import mk_paragraphs_to_sents
+from context import parse_data
+from context import speech_segmentation
+from context import visualize_agenda_and_speakers
+from speech_segmentation import (
+    is_not_interposed_question,
+    is_speech,
+    mk_notified_speaker_list,
+)
+
+
+# Former walkers of mk_paragraphs_to_sents.py and
+# visualize_agenda_and_speakers.py, replaced by segment_speeches()
+
+
+def reference_update_speeches(speech: dict,
+                    speeches: list,
+                    flow_indices: str,
+                    current_speaker: str,
+                    current_topic) -> list:
+
+    speech[current_speaker] = flow_indices
+    speech["topic"] = current_topic
+    speeches.append(speech)
+
+    return speeches
+
+
+def reference_collect_speech_indices(paragraphs: list, agenda: dict) -> list:
+    # initialize ######################
+    speech = {}
+    speeches = []
+    flow_indices = []
+    speakers = mk_notified_speaker_list(agenda)
+    first_topic = speakers[0]
+    next_topic = first_topic.split(" ;;; ")[-1]
+    current_topic = next_topic  # current topic is both first and next topic
+    end_of_session = False
+
+    current_speaker = None  # first speaker will be "next" speaker in list
+    speakers = speakers[1:]  # first entry was first topic
+
+    # if topic without speakers
+    if len(speakers) > 0:
+        next_listed_speaker = speakers[0]
+    else:
+        next_listed_speaker = None
+
+    # end of initialization ###########
+
+    for paragraph in paragraphs:
+        flow_index = paragraph['flow_index']
+        speaker = paragraph['speaker_name']
+        if current_speaker and speaker in current_speaker:
+            # same speaker for same topic
+            flow_indices.append(flow_index)
+            end_of_session = False
+        elif current_topic != next_topic:
+            if next_listed_speaker and speaker in next_listed_speaker:
+                # first speaker for new topic
+                # save the indices of last speaker
+                speeches = reference_update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
+
+                # reset
+                flow_indices = []
+                speech = {}
+
+                flow_indices.append(flow_index)
+                current_topic = next_topic
+                current_speaker = next_listed_speaker
+                # speech[current_speaker] = []
+                speakers = speakers[1:]
+                if speakers:
+                    next_listed_speaker = speakers[0]
+                else:
+                    next_listed_speaker = None
+            elif next_topic and next_listed_speaker is None:
+                if paragraph['speaker_is_chair']:
+                    end_of_session = True
+                elif speaker and speaker != current_speaker:
+                    # interposing question
+                    end_of_session = True
+                else:
+                    end_of_session = True
+            elif not next_topic and not next_listed_speaker and paragraph['speaker_is_chair']:  # noqa
+                end_of_session = True
+        elif next_listed_speaker and speaker in next_listed_speaker:
+            # new speaker for same topic
+            # save the indices of last speaker - for the first speaker there
+            # is no current_speaker, so this needs to be caught with "if"
+            if current_speaker:
+                speeches = reference_update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
+
+            # reset
+            flow_indices = []
+            speech = {}
+
+            current_speaker = next_listed_speaker
+            flow_indices.append(flow_index)
+            speakers = speakers[1:]
+            if speakers:
+                next_listed_speaker = speakers[0]
+                if "new topic" in next_listed_speaker:
+                    next_topic = next_listed_speaker.split(" ;;; ")[-1]
+                    speakers = speakers[1:]
+                    if speakers:
+                        next_listed_speaker = speakers[0]
+                    else:
+                        next_listed_speaker = None
+            else:
+                next_listed_speaker = None
+                next_topic = None
+        elif next_listed_speaker and speaker not in next_listed_speaker:
+            if reference_speaker_is_in_current_lineup(speaker, agenda, current_topic):
+                # weed out questions w function "is_speech"
+                if is_speech(paragraph):
+                    text = paragraph["speech"]
+                    if is_not_interposed_question(text):
+                        speeches = reference_update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
+                        # reset
+                        flow_indices = []
+                        speech = {}
+
+                        current_speaker = speaker
+                        flow_indices.append(flow_index)
+
+    if end_of_session:
+        speeches = reference_update_speeches(speech, speeches, flow_indices, current_speaker, current_topic)  # noqa
+
+    return speeches
+
+
+def reference_show_speech_indices(paragraphs: list, agenda: dict) -> None:
+    # initialize ######################
+    speakers = mk_notified_speaker_list(agenda)
+    first_topic = speakers[0]
+    next_topic = first_topic.split(" ;;; ")[-1]
+    current_topic = next_topic  # current topic is both first and next topic
+
+    current_speaker = None  # first speaker will be "next" speaker in list
+    speakers = speakers[1:]  # first entry was first topic
+
+    # if topic without speakers
+    if len(speakers) > 0:
+        next_listed_speaker = speakers[0]
+    else:
+        next_listed_speaker = None
+
+    # end of initialization ###########
+
+    print("show speech indices")
+    print(current_topic)
+
+    for paragraph in paragraphs:
+        flow_index = paragraph['flow_index']
+        speaker = paragraph['speaker_name']
+        if current_speaker and speaker in current_speaker:
+            # same speaker for same topic
+            print(flow_index, end=" ")
+        elif current_topic != next_topic:
+            if next_listed_speaker and speaker in next_listed_speaker:
+                current_topic = next_topic
+                print()
+                print(current_topic)
+                print(flow_index, end=" ")
+                current_speaker = next_listed_speaker
+                speakers = speakers[1:]
+                if speakers:
+                    next_listed_speaker = speakers[0]
+                else:
+                    next_listed_speaker = None
+        elif next_listed_speaker and speaker in next_listed_speaker:
+            # new speaker for same topic
+            current_speaker = next_listed_speaker
+            print(flow_index, end=" ")
+            speakers = speakers[1:]
+            if speakers:
+                next_listed_speaker = speakers[0]
+                if "new topic" in next_listed_speaker:
+                    next_topic = next_listed_speaker.split(" ;;; ")[-1]
+                    speakers = speakers[1:]
+                    if speakers:
+                        next_listed_speaker = speakers[0]
+                    else:
+                        next_listed_speaker = None
+            else:
+                next_listed_speaker = None
+                next_topic = None
+        elif next_listed_speaker and speaker not in next_listed_speaker:
+            if reference_speaker_is_in_current_lineup(speaker, agenda, current_topic):
+                # weed out questions w function "is_speech"
+                if is_speech(paragraph):
+                    text = paragraph["speech"]
+                    if is_not_interposed_question(text):
+                        current_speaker = speaker
+                        print(flow_index, end=" ")
+
+
+def reference_reduce_speaker_flow_to_notified_speakers(session,
+                                             speakers: list) -> None:
+
+    paragraphs = session.content
+    new_topic = speakers[0]
+    current_speaker = None
+
+    new_topic = new_topic.split(" ;;; ")[-1]
+    speakers = speakers[1:]
+
+    # if topic without speakers
+    if len(speakers) > 0:
+        next_listed_speaker = speakers[0]
+    else:
+        next_listed_speaker = None
+
+    print()
+    print("reduce speaker flow to notified speakers")
+    print()
+    print(new_topic)
+    current_topic = new_topic
+
+    for paragraph in paragraphs:
+        flow_index = paragraph['flow_index']
+        speaker = paragraph['speaker_name']
+        if current_speaker and speaker in current_speaker:
+            print(f"{flow_index}", end=" ")
+        elif current_topic != new_topic:
+            if next_listed_speaker and speaker in next_listed_speaker:
+                # first speaker for new topic
+                print()
+                print()
+                print(new_topic)
+                current_topic = new_topic
+                print()
+                print(f'{speaker} - flow_index: {flow_index}', end=" ")
+                current_speaker = next_listed_speaker
+                speakers = speakers[1:]
+                if speakers:
+                    next_listed_speaker = speakers[0]
+                else:
+                    next_listed_speaker = None
+        elif next_listed_speaker and speaker in next_listed_speaker:
+            # new speaker for same topic
+            print()
+            print(f'{speaker} - flow_index: {flow_index}', end=" ")
+            current_speaker = next_listed_speaker
+            speakers = speakers[1:]
+            if speakers:
+                next_listed_speaker = speakers[0]
+                if "new topic" in next_listed_speaker:
+                    new_topic = next_listed_speaker.split(" ;;; ")[-1]
+                    speakers = speakers[1:]
+                    if speakers:
+                        next_listed_speaker = speakers[0]
+                    else:
+                        next_listed_speaker = None
+            else:
+                next_listed_speaker = None
+
+    print()
+
+
+def reference_speaker_is_in_current_lineup(speaker: str, agenda: dict, topic) -> bool:
+    for name in agenda[topic]:
+        if speaker in name:
+            return True
+    return False
+
+
+# (speaker_name, lineup entry without number)
+NAMES = [
+    ('Herbert Reul', 'Minister Herbert Reul'),
+    ('Yvonne Gebauer', 'Yvonne Gebauer, Ministerin für Schule und Bildung'),
+    # a name contained in another one
+    ('Sven Wolf', 'Sven Wolf (SPD)'),
+    ('Sven Wolff', 'Sven Wolff (CDU)'),
+] + [
+    (f'{first} {last}', f'{first} {last} ({party})')
+    for first, last, party in zip(
+        ['Thomas', 'Bodo', 'Sigrid', 'Christof', 'Markus', 'Josef'] * 5,
+        ['Kutschaty', 'Löttgen', 'Beer', 'Rasche', 'Wagner'] * 6,
+        ['SPD', 'CDU', 'GRÜNE', 'FDP', 'AfD', 'CDU', 'SPD'] * 5)
+]
+CHAIRS = ['André Kuper', 'Carina Gödecke']
+SPEECH = 'Herr Präsident! Meine sehr geehrten Damen und Herren! Wir reden.'
+
+
+def synthetic_protocol(topic_count, seed=1,
+                       lineup_sizes=(0, 1, 1, 2, 3, 4)):
+    """
+    Return the paragraphs and agenda of a session with topic_count topics,
+    following the lineups with interruptions, questions and deviations.
+    The number of notified speakers per topic is chosen from lineup_sizes.
+    """
+    rng = random.Random(seed)
+    agenda = {}
+    entry_no = 3
+    for topic_no in range(1, topic_count + 1):
+        lineup = []
+        for name, entry in rng.sample(NAMES, rng.choice(lineup_sizes)):
+            lineup.append(f'{entry} {entry_no}')
+            entry_no += 1
+        agenda[f'{topic_no} Tagesordnungspunkt {topic_no}'] = lineup
+
+    paragraphs = []
+
+    def add(name, text, chair=False, kind='speech'):
+        paragraphs.append({
+            'flow_index': len(paragraphs) + 1,
+            'speaker_name': name,
+            'speaker_is_chair': chair,
+            kind: text,
+        })
+
+    chair = rng.choice(CHAIRS)
+    for topic, lineup in agenda.items():
+        add(chair, f'Ich rufe auf: {topic}', chair=True)
+        lineup = list(lineup)
+        if rng.random() < 0.1:
+            rng.shuffle(lineup)
+        for entry in lineup:
+            name = next(name for name, e in NAMES if entry.startswith(e))
+            if rng.random() < 0.05:
+                # speaker doesn't show up
+                continue
+            add(name, SPEECH)
+            for i in range(rng.randint(0, 8)):
+                kind = rng.random()
+                if kind < 0.5:
+                    add(name, 'Das ist so.')
+                elif kind < 0.6:
+                    add(None if rng.random() < 0.1 else rng.choice(CHAIRS),
+                        'Beifall', kind='annotation')
+                    paragraphs[-1]['speaker_name'] = name
+                elif kind < 0.75:
+                    add(chair, 'Gestatten Sie eine Zwischenfrage?',
+                        chair=True)
+                elif kind < 0.85:
+                    other = rng.choice(NAMES)[0]
+                    add(other, 'Ist das so?')
+                elif kind < 0.95:
+                    # out of order with a speech
+                    other = rng.choice(NAMES)[0]
+                    add(other, SPEECH if rng.random() < 0.5 else 'Ja.')
+                else:
+                    add(name, 'Kollegen!', kind='citation')
+            add(chair, 'Vielen Dank.', chair=True)
+        if rng.random() < 0.1:
+            chair = rng.choice(CHAIRS)
+    add(chair, 'Die Sitzung ist geschlossen.', chair=True)
+    return paragraphs, agenda
+
+
+class Session:
+    def __init__(self, paragraphs):
+        self.content = paragraphs
+
+
+def test_collect_speech_indices_matches_reference():
+    for seed in range(300):
+        paragraphs, agenda = synthetic_protocol(random.Random(seed).randint(
+            1, 12), seed)
+        assert mk_paragraphs_to_sents.collect_speech_indices(
+            paragraphs, agenda) == reference_collect_speech_indices(
+                paragraphs, agenda)
+
+
+def test_show_speech_indices_matches_reference(capsys):
+    for seed in range(100):
+        paragraphs, agenda = synthetic_protocol(8, seed)
+        reference_show_speech_indices(paragraphs, agenda)
+        expected = capsys.readouterr().out
+        visualize_agenda_and_speakers.show_speech_indices(paragraphs, agenda)
+        assert capsys.readouterr().out == expected
+
+
+def test_reduce_speaker_flow_matches_reference(capsys):
+    for seed in range(100):
+        paragraphs, agenda = synthetic_protocol(8, seed)
+        speakers = mk_notified_speaker_list(agenda)
+        reference_reduce_speaker_flow_to_notified_speakers(
+            Session(paragraphs), speakers)
+        expected = capsys.readouterr().out
+        visualize_agenda_and_speakers.reduce_speaker_flow_to_notified_speakers(
+            Session(paragraphs), speakers)
+        assert capsys.readouterr().out == expected
+
+
+def test_segment_speeches_on_protocol(fixture_protocols):
+    parse_data.process_protocol(17, 1)
+    data = mk_paragraphs_to_sents.load_json_file(17, 1)
+    spans = list(speech_segmentation.segment_speeches(
+        data['content'], data['agenda']))
+    assert spans
+    flow_indices = [index for span in spans for index in span.flow_indices]
+    assert flow_indices == sorted(set(flow_indices))
+    assert spans[0].speaker == 'Minister Herbert Reul 3'
+    assert spans[0].speaker_name == 'Herbert Reul'
+    assert mk_paragraphs_to_sents.collect_speech_indices(
+        data['content'], data['agenda']) == reference_collect_speech_indices(
+            data['content'], data['agenda'])
+
+
+def test_topic_positions_and_lineup():
+    agenda = {'1 A': ['Thomas Kutschaty (SPD) 4', 'Sven Wolff (CDU) 5'],
+              '2 B': [],
+              '3 C': ['Sven Wolf (SPD) 6', '']}
+    speakers = mk_notified_speaker_list(agenda)
+    assert speech_segmentation.mk_topic_positions(speakers) == [
+        '1 A', None, None, '2 B', '3 C', None, None]
+    assert speech_segmentation.speaker_is_in_lineup('Sven Wolf',
+                                                    agenda['3 C'])
+    assert not speech_segmentation.speaker_is_in_lineup('Thomas Kutschaty',
+                                                        agenda['3 C'])
+    assert not speech_segmentation.speaker_is_in_lineup('Sven Wolf',
+                                                        agenda['2 B'])
+
+
+def test_interposed_speech_checks():
+    assert is_speech({'speech': 'Ja.'})
+    assert not is_speech({'annotation': 'Beifall'})
+    assert is_not_interposed_question(SPEECH)
+    assert not is_not_interposed_question('Herr Präsident, ist das so?')
+
+
+def test_generate_speaker_flow_indices():
+    paragraphs, agenda = synthetic_protocol(8, 3)
+    flow = list(collect_speeches.generate_speaker_flow_indices(
+        Session(paragraphs), agenda))
+    assert flow
+    speakers = mk_notified_speaker_list(agenda)
+    for flow_indices in flow:
+        # each speech starts with a notified speaker
+        name = paragraphs[flow_indices[0] - 1]['speaker_name']
+        assert any(name in speaker for speaker in speakers)
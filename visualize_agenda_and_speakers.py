@@ -2,20 +2,36 @@
 """
 Visualize agenda and speakers.
 """
-import json
 import os
 import sys
+import logging
+import argparse
 
 from collections import namedtuple
 
+from agenda_and_speaker_list import AGENDA_VERSION
 from agenda_and_speaker_list import mk_agenda_list_w_speakers
+import batch
+import protocol_store
+from speech_segmentation import (
+    TOPIC_MARKER,
+    mk_notified_speaker_list,
+    segment_speeches,
+    )
 from settings import (
     PROTOCOL_DIR,
     PROTOCOL_FILE_TEMPLATE,
     )
 
+# Never wait for user input in continue_() (see batch.py)
+batch_mode = False
+
+logger = logging.getLogger(__name__)
+
 
 def continue_() -> None:
+    if not batch.can_prompt(batch_mode):
+        return
     inp = input("")
     if inp == "n":
         sys.exit()
@@ -29,11 +45,14 @@ def load_json_file(period: str, index: str) -> dict:
         PROTOCOL_DIR,
         PROTOCOL_FILE_TEMPLATE % (period, index, 'json'))
 
-    with open(json_filename) as json_file:
-        data = json.load(json_file)
+    data = protocol_store.load_json(json_filename)
 
-    agenda = mk_agenda_list_w_speakers(period, index)
-    data["agenda"] = agenda
+    # the agenda is stored by parse_data.py; older protocol files or
+    # agendas built with outdated rules are taken from the agenda cache
+    if data.get("agenda_version") != AGENDA_VERSION:
+        logger.debug(f"Rebuilding the agenda of {period}-{index}")
+        data["agenda"] = mk_agenda_list_w_speakers(
+            period, index, interactive=batch.can_prompt(batch_mode))
     return data
 
 
@@ -121,226 +140,135 @@ def visualize_speaker_flow(session: namedtuple) -> None:
             current_speaker = new_speaker
 
 
-def mk_notified_speaker_list(agenda: dict) -> list:
-    speakers = []
-    for key, val in agenda.items():
-        speakers.append(f"new topic ;;; {key}")
-        speaker_list = val
-        for speaker in speaker_list:
-            speakers.append(speaker)
-
-    return speakers
-
-
 def reduce_speaker_flow_to_notified_speakers(session: namedtuple,
                                              speakers: list) -> None:
-
-    paragraphs = session.content
-    new_topic = speakers[0]
-    current_speaker = None
-
-    new_topic = new_topic.split(" ;;; ")[-1]
-    speakers = speakers[1:]
-
-    # if topic without speakers
-    if len(speakers) > 0:
-        next_listed_speaker = speakers[0]
-    else:
-        next_listed_speaker = None
+    """
+    Show the flow indices of the speeches of the notified speakers in the
+    order of the lineup; speakers is the mk_notified_speaker_list() of the
+    agenda.
+    """
+    agenda = session_agenda(speakers)
+    current_topic = next(iter(agenda))
 
     print()
     print("reduce speaker flow to notified speakers")
     print()
-    print(new_topic)
-    current_topic = new_topic
+    print(current_topic)
 
-    for paragraph in paragraphs:
-        flow_index = paragraph['flow_index']
-        speaker = paragraph['speaker_name']
-        if current_speaker and speaker in current_speaker:
-            print(f"{flow_index}", end=" ")
-        elif current_topic != new_topic:
-            if next_listed_speaker and speaker in next_listed_speaker:
-                # first speaker for new topic
-                print()
-                print()
-                print(new_topic)
-                current_topic = new_topic
-                print()
-                print(f'{speaker} - flow_index: {flow_index}', end=" ")
-                current_speaker = next_listed_speaker
-                speakers = speakers[1:]
-                if speakers:
-                    next_listed_speaker = speakers[0]
-                else:
-                    next_listed_speaker = None
-        elif next_listed_speaker and speaker in next_listed_speaker:
-            # new speaker for same topic
+    for span in segment_speeches(session.content, agenda, interposed=False):
+        if not span.flow_indices:
+            continue
+        if span.topic != current_topic:
+            # first speaker for new topic
             print()
-            print(f'{speaker} - flow_index: {flow_index}', end=" ")
-            current_speaker = next_listed_speaker
-            speakers = speakers[1:]
-            if speakers:
-                next_listed_speaker = speakers[0]
-                if "new topic" in next_listed_speaker:
-                    new_topic = next_listed_speaker.split(" ;;; ")[-1]
-                    speakers = speakers[1:]
-                    if speakers:
-                        next_listed_speaker = speakers[0]
-                    else:
-                        next_listed_speaker = None
-            else:
-                next_listed_speaker = None
+            current_topic = span.topic
+            print()
+            print(current_topic)
+        print()
+        print(f'{span.speaker_name} - flow_index: {span.flow_indices[0]}',
+              end=" ")
+        for flow_index in span.flow_indices[1:]:
+            print(f"{flow_index}", end=" ")
 
     print()
 
 
+def session_agenda(speakers: list) -> dict:
+    """
+    Return the agenda with topics as keys and lineup of speakers as value for
+    the mk_notified_speaker_list() speakers.
+    """
+    agenda = {}
+    for speaker in speakers:
+        if speaker.startswith(TOPIC_MARKER):
+            topic = speaker[len(TOPIC_MARKER):]
+            agenda[topic] = []
+        else:
+            agenda[topic].append(speaker)
+
+    return agenda
+
+
 def show_speech_indices(paragraphs: list, agenda: dict) -> None:
     """
     Aim of show_speech_indices is to print all and only those indices of the
     paragraphs that are part of a speech.
     Interruptions like applause or questions are edited out.
-    Using the speaker_list from agenda is needed to recognize if a paragraph
-    is part of a speech or just a question coming from another member of
-    parliament.
-    This also allows to assign each speaker and his/her speech to its topic.
+    The speeches are segmented by speech_segmentation.segment_speeches(),
+    see there.
     """
-    # initialize ######################
-    speakers = mk_notified_speaker_list(agenda)
-    first_topic = speakers[0]
-    next_topic = first_topic.split(" ;;; ")[-1]
-    current_topic = next_topic  # current topic is both first and next topic
-
-    current_speaker = None  # first speaker will be "next" speaker in list
-    speakers = speakers[1:]  # first entry was first topic
-
-    # if topic without speakers
-    if len(speakers) > 0:
-        next_listed_speaker = speakers[0]
-    else:
-        next_listed_speaker = None
-
-    # end of initialization ###########
+    current_topic = next(iter(agenda))
 
     print("show speech indices")
     print(current_topic)
 
-    for paragraph in paragraphs:
-        flow_index = paragraph['flow_index']
-        speaker = paragraph['speaker_name']
-        if current_speaker and speaker in current_speaker:
-            # same speaker for same topic
-            print(flow_index, end=" ")
-        elif current_topic != next_topic:
-            if next_listed_speaker and speaker in next_listed_speaker:
-                current_topic = next_topic
-                print()
-                print(current_topic)
-                print(flow_index, end=" ")
-                current_speaker = next_listed_speaker
-                speakers = speakers[1:]
-                if speakers:
-                    next_listed_speaker = speakers[0]
-                else:
-                    next_listed_speaker = None
-        elif next_listed_speaker and speaker in next_listed_speaker:
-            # new speaker for same topic
-            current_speaker = next_listed_speaker
+    for span in segment_speeches(paragraphs, agenda):
+        if not span.flow_indices:
+            continue
+        if span.topic != current_topic:
+            current_topic = span.topic
+            print()
+            print(current_topic)
+        for flow_index in span.flow_indices:
             print(flow_index, end=" ")
-            speakers = speakers[1:]
-            if speakers:
-                next_listed_speaker = speakers[0]
-                if "new topic" in next_listed_speaker:
-                    next_topic = next_listed_speaker.split(" ;;; ")[-1]
-                    speakers = speakers[1:]
-                    if speakers:
-                        next_listed_speaker = speakers[0]
-                    else:
-                        next_listed_speaker = None
-            else:
-                next_listed_speaker = None
-                next_topic = None
-        elif next_listed_speaker and speaker not in next_listed_speaker:
-            if speaker_is_in_current_lineup(speaker, agenda, current_topic):
-                # weed out questions w function "is_speech"
-                if is_speech(paragraph):
-                    text = paragraph["speech"]
-                    if is_not_interposed_question(text):
-                        current_speaker = speaker
-                        print(flow_index, end=" ")
-
-
-def is_not_interposed_question(text: str) -> bool:
+
+
+# Views shown by process_single_json_file()
+VIEWS = ("agenda", "flow", "indices", "notified")
+
+
+def process_single_json_file(period, index, views=VIEWS) -> dict:
     """
-    To make sure that it's indeed a speech and not a question, a counter adds
-    the occurences of speech elements like addressing the chair, the colleagues
-    or the audience and lowering the weight if the text passage ends with a
-    question mark.
+    Show the views of protocol period-index, pausing after each view unless
+    in batch mode.
+    Returns the agenda with topics as keys and lineup of speakers as value.
     """
-    counter = 0
-    if text.endswith("?"):
-        counter -= 1
-    text = text.split()
-    for i, word in enumerate(text):
-        if "Herren!" in word:
-            counter += 1
-        elif "räsident" in word:
-            counter += 1
-        elif "Kolleginnen" in word:
-            counter += 1
-
-    if counter > 1:
-        return True
-    return False
-
-
-def is_speech(paragraph: dict) -> bool:
-    try:
-        if paragraph['speech'] is not None:
-            return True
-    except KeyError:
-        return False
-
-
-def speaker_is_in_current_lineup(speaker: str, agenda: dict, topic) -> bool:
-    for name in agenda[topic]:
-        if speaker in name:
-            return True
-    return False
-
-
-def process_single_json_file(period, index) -> None:
     data = load_json_file(period, index)
     session = mk_session(data)
     meta_session = (session.date, session.protocol_no, session.agenda)
     agenda = agenda_topics_and_speaker_list(meta_session, show=False)
     notified_speakers = mk_notified_speaker_list(agenda)
 
-    if 1:
+    if "agenda" in views:
         agenda_topics_and_speaker_list(meta_session, show=True)
         continue_()
 
-    if 1:
+    if "flow" in views:
         visualize_speaker_flow(session)
         print()
         continue_()
 
-    if 1:
+    if "indices" in views:
         paragraphs = session.content
         show_speech_indices(paragraphs, agenda)
         continue_()
 
-    if 1:
+    if "notified" in views:
         reduce_speaker_flow_to_notified_speakers(session, notified_speakers)
 
+    return agenda
+
 
 def main():
-    period = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        index = int(sys.argv[2])
-        process_single_json_file(period, index)
-    else:
-        print("Needs arguments for legislature period and protocol index!")
+    """
+    Command line interface:
+    visualize_agenda_and_speakers.py [--batch] [--log-level LEVEL]
+                                     [--view VIEW ...] <period> <index>
+        Show the agenda and speakers of the protocol (default: all views).
+    """
+    global batch_mode
+    parser = argparse.ArgumentParser(
+        description='Visualize the agenda and speakers of a protocol')
+    parser.add_argument('period', type=int)
+    parser.add_argument('index', type=int)
+    parser.add_argument('--view', choices=VIEWS, action='append',
+                        help='view to show (may be repeated)')
+    batch.add_arguments(parser)
+    args = parser.parse_args()
+    batch.setup_logging(args.log_level)
+    batch_mode = args.batch
+
+    process_single_json_file(args.period, args.index, args.view or VIEWS)
 
 
 if __name__ == "__main__":